@@ -0,0 +1 @@
+"""Benchmarks for the Drone Video to 3D add-on (see run_benchmarks.py)"""
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+"""Benchmark the add-on's data paths on synthetic inputs, without FFmpeg, COLMAP or a GPU
+
+Usage:
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --quick --baseline baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline baseline.json
+
+Trajectories of 1k to 1M samples, binary PLY clouds and ExifTool JSON are
+generated from a fixed seed; external tools are replaced by stub
+executables. With --baseline the run is compared against a stored result
+file and exits with status 1 when any benchmark got slower than the
+threshold allows.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+import numpy as np
+
+from benchmarks import synthetic
+from benchmarks.stub_tools import create_stub_tools, stub_environment
+from drone_video_to_3d.utils import gps_utils
+from drone_video_to_3d.utils import mesh_io
+from drone_video_to_3d.utils import trajectory
+from drone_video_to_3d.utils import telemetry_stream
+from drone_video_to_3d.utils.project_store import ProjectStore, GPS_RAW
+from drone_video_to_3d.utils.process_supervisor import get_supervisor, run_tool, shutdown_supervisor
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+QUICK_SIZES = (1000, 10000)
+
+# Slowdown (current / baseline median) reported as a regression, and the
+# absolute difference below which timing noise is ignored
+DEFAULT_THRESHOLD = 1.25
+NOISE_FLOOR = 0.002
+
+# Process launches per orchestration benchmark
+LAUNCHES = 16
+
+BENCHMARKS = []
+
+def benchmark(name, max_size=None, scaled=True):
+    """Register a benchmark; the function gets (size, workdir) and returns the callable to time
+
+    Benchmarks over per-frame dicts stop at max_size to keep memory
+    reasonable; unscaled benchmarks run once regardless of the sizes.
+    """
+    def register(function):
+        BENCHMARKS.append({"name": name, "function": function, "max_size": max_size, "scaled": scaled})
+        return function
+    return register
+
+@benchmark("gps.convert_to_cartesian")
+def bench_convert(size, workdir):
+    samples = synthetic.trajectory(size)
+    return lambda: gps_utils.convert_to_cartesian(samples["latitude"], samples["longitude"], samples["altitude"])
+
+@benchmark("gps.smooth_trajectory", max_size=100000)
+def bench_smooth(size, workdir):
+    data = synthetic.gps_data(synthetic.trajectory(size))
+    return lambda: gps_utils.smooth_gps_trajectory(data)
+
+@benchmark("gps.poses_csv", max_size=100000)
+def bench_poses_csv(size, workdir):
+    data = synthetic.gps_data(synthetic.trajectory(size))
+    output_file = os.path.join(workdir, "gps_poses.csv")
+    return lambda: gps_utils.generate_gps_poses_csv(data, output_file)
+
+@benchmark("gps.sensor_data_xml", max_size=100000)
+def bench_sensor_xml(size, workdir):
+    data = synthetic.gps_data(synthetic.trajectory(size))
+    output_file = os.path.join(workdir, "sensor_data.xml")
+    return lambda: gps_utils.generate_meshroom_sensor_data(data, output_file)
+
+@benchmark("store.write_and_export", max_size=100000)
+def bench_store(size, workdir):
+    samples = synthetic.trajectory(size)
+    data = synthetic.gps_data(samples)
+    names = sorted(data)
+    store_dir = os.path.join(workdir, "store")
+
+    def run():
+        shutil.rmtree(store_dir, ignore_errors=True)
+        with ProjectStore(store_dir) as store:
+            store.write_frames(names, samples["time"])
+            store.write_gps(data, GPS_RAW)
+            store.export_gps_poses_csv(os.path.join(store_dir, "gps_poses.csv"))
+            store.export_sensor_data_xml(os.path.join(store_dir, "sensor_data.xml"))
+    return run
+
+@benchmark("trajectory.simplify")
+def bench_simplify(size, workdir):
+    samples = synthetic.trajectory(size)
+    points = np.column_stack(trajectory.geodetic_to_ecef(samples["latitude"], samples["longitude"],
+                                                         samples["altitude"]))
+    return lambda: trajectory.simplify_to_budget(points, 2000)
+
+@benchmark("telemetry.parse_file", max_size=100000)
+def bench_parse_telemetry(size, workdir):
+    json_file = synthetic.write_exiftool_json(os.path.join(workdir, "telemetry.json"), synthetic.trajectory(size))
+    return lambda: telemetry_stream.parse_telemetry_file(json_file)
+
+@benchmark("ply.write")
+def bench_ply_write(size, workdir):
+    mesh = mesh_io.MeshBuffers(*_cloud(size))
+    output_file = os.path.join(workdir, "write.ply")
+    return lambda: mesh_io.write_ply(output_file, mesh)
+
+@benchmark("ply.read")
+def bench_ply_read(size, workdir):
+    input_file = mesh_io.write_ply(os.path.join(workdir, "fused.ply"), mesh_io.MeshBuffers(*_cloud(size)))
+    return lambda: mesh_io.read_ply(input_file)
+
+def _cloud(size):
+    vertices, normals, colors = synthetic.point_cloud(size)
+    return vertices, None, normals, colors
+
+@benchmark("subprocess.sequential_launches", scaled=False)
+def bench_sequential(size, workdir):
+    def run():
+        for _ in range(LAUNCHES):
+            run_tool(["colmap", "-h"])
+    return run
+
+@benchmark("subprocess.concurrent_launches", scaled=False)
+def bench_concurrent(size, workdir):
+    def run():
+        supervisor = get_supervisor()
+        futures = [supervisor.submit(["colmap", "-h"]) for _ in range(LAUNCHES)]
+        for future in futures:
+            future.result()
+    return run
+
+@benchmark("subprocess.stream_exiftool", max_size=100000)
+def bench_stream_exiftool(size, workdir):
+    json_file = synthetic.write_exiftool_json(os.path.join(workdir, "exiftool.json"), synthetic.trajectory(size))
+
+    def run():
+        os.environ["BENCH_EXIFTOOL_OUTPUT"] = json_file
+        try:
+            telemetry_stream.stream_exiftool_telemetry("synthetic.mp4")
+        finally:
+            del os.environ["BENCH_EXIFTOOL_OUTPUT"]
+    return run
+
+def time_callable(run, repeat):
+    """Run once to warm up, then return the wall time of each of repeat runs"""
+    run()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def run_benchmarks(sizes, repeat, name_filter="", log=print):
+    """Run every registered benchmark and return {"name@size": result}"""
+    results = {}
+    for entry in BENCHMARKS:
+        if name_filter and name_filter not in entry["name"]:
+            continue
+        entry_sizes = [s for s in sizes if entry["max_size"] is None or s <= entry["max_size"]]
+        for size in entry_sizes if entry["scaled"] else [LAUNCHES]:
+            workdir = tempfile.mkdtemp(prefix="dronevideo3d-bench-")
+            try:
+                timings = time_callable(entry["function"](size, workdir), repeat)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            key = f"{entry['name']}@{size}"
+            results[key] = {
+                "name": entry["name"],
+                "size": size,
+                "repeat": repeat,
+                "min_s": min(timings),
+                "median_s": statistics.median(timings),
+                "mean_s": statistics.fmean(timings),
+            }
+            log(f"{key:<45} median {results[key]['median_s'] * 1000:10.2f} ms   min {min(timings) * 1000:10.2f} ms")
+    return results
+
+def environment_info():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pyproj": gps_utils.pyproj is not None,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return (key, baseline_s, current_s, ratio) for every benchmark slower than threshold x baseline"""
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        current, previous = result["median_s"], reference["median_s"]
+        if current > previous * threshold and current - previous > NOISE_FLOOR:
+            regressions.append((key, previous, current, current / previous))
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Drone Video to 3D benchmarks")
+    parser.add_argument("--sizes", help="Comma-separated sample counts (default: 1000,10000,100000,1000000)")
+    parser.add_argument("--quick", action="store_true", help="Only run the 1k and 10k sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--output", default="benchmark_results.json", help="Result file")
+    parser.add_argument("--baseline", help="Stored result file to compare against")
+    parser.add_argument("--save-baseline", help="Also write the results to this baseline file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Slowdown factor reported as a regression")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")] if args.sizes else \
+        list(QUICK_SIZES if args.quick else DEFAULT_SIZES)
+
+    stub_dir = tempfile.mkdtemp(prefix="dronevideo3d-stubs-")
+    os.environ.update(stub_environment(create_stub_tools(stub_dir)))
+    try:
+        results = run_benchmarks(sizes, args.repeat, args.filter)
+    finally:
+        shutdown_supervisor()
+        shutil.rmtree(stub_dir, ignore_errors=True)
+
+    document = {"environment": environment_info(), "results": results}
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(document, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for key, previous, current, ratio in regressions:
+            print(f"REGRESSION {key}: {previous * 1000:.2f} ms -> {current * 1000:.2f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (threshold {args.threshold:.2f}x)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Stub executables standing in for FFmpeg, FFprobe, COLMAP and ExifTool
+
+The stubs start a Python interpreter, optionally replay a prepared output
+file and exit, so the benchmarks measure the add-on's process orchestration
+and output parsing rather than the tools themselves.
+"""
+
+import os
+import sys
+
+TOOLS = ("ffmpeg", "ffprobe", "colmap", "exiftool")
+
+# Environment variable naming a file a stub copies to stdout, per tool
+REPLAY_ENV = "BENCH_{tool}_OUTPUT"
+
+STUB_SOURCE = '''import os
+import sys
+import shutil
+
+replay = os.environ.get("BENCH_{upper}_OUTPUT")
+if replay:
+    with open(replay, "rb") as f:
+        shutil.copyfileobj(f, sys.stdout.buffer)
+sys.exit(0)
+'''
+
+def create_stub_tools(directory):
+    """Write one stub per tool into directory and return the directory
+
+    Put it first in PATH so the add-on finds the stubs instead of real tools.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for tool in TOOLS:
+        script = os.path.join(directory, f"{tool}_stub.py")
+        with open(script, 'w') as f:
+            f.write(STUB_SOURCE.format(upper=tool.upper()))
+        if os.name == "nt":
+            with open(os.path.join(directory, f"{tool}.cmd"), 'w') as f:
+                f.write(f'@"{sys.executable}" "{script}" %*\n')
+        else:
+            launcher = os.path.join(directory, tool)
+            with open(launcher, 'w') as f:
+                f.write(f"#!/bin/sh\nexec \"{sys.executable}\" \"{script}\" \"$@\"\n")
+            os.chmod(launcher, 0o755)
+    return directory
+
+def stub_environment(directory):
+    """Return a copy of os.environ with the stub directory first in PATH"""
+    env = dict(os.environ)
+    env["PATH"] = directory + os.pathsep + env.get("PATH", "")
+    return env
@@ -0,0 +1,83 @@
+"""Deterministic synthetic inputs for the benchmarks
+
+Everything is generated from a fixed seed, so two runs on the same machine
+work on identical data.
+"""
+
+import json
+import numpy as np
+
+SEED = 1234
+
+# Survey flight centre (degrees) and sampling interval (seconds)
+ORIGIN = (47.3769, 8.5417, 520.0)
+SAMPLE_INTERVAL = 0.1
+
+def trajectory(count, seed=SEED):
+    """Return a lawnmower survey flight of count samples as a dict of float arrays
+
+    Keys: time, latitude, longitude, altitude, speed, roll, pitch, yaw.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(count) * SAMPLE_INTERVAL
+    # 200 m legs flown back and forth at 8 m/s, shifted 30 m per leg
+    leg_length, speed, spacing = 200.0, 8.0, 30.0
+    distance = t * speed
+    leg = np.floor(distance / leg_length)
+    along = distance - leg * leg_length
+    east = np.where(leg % 2 == 0, along, leg_length - along)
+    north = leg * spacing
+    up = 80.0 + 2.0 * np.sin(t / 7.0)
+
+    lat0, lon0, alt0 = ORIGIN
+    metres_per_degree = 111320.0
+    return {
+        "time": t,
+        "latitude": lat0 + (north + rng.normal(0, 1.5, count)) / metres_per_degree,
+        "longitude": lon0 + (east + rng.normal(0, 1.5, count)) / (metres_per_degree * np.cos(np.radians(lat0))),
+        "altitude": alt0 + up + rng.normal(0, 0.5, count),
+        "speed": np.full(count, speed),
+        "roll": rng.normal(0, 2.0, count),
+        "pitch": rng.normal(-5.0, 1.0, count),
+        "yaw": np.where(leg % 2 == 0, 90.0, 270.0),
+    }
+
+def gps_data(samples):
+    """Build the per-frame gps_data dict used by gps_utils from trajectory arrays"""
+    camera = {"focal_length": 4.5, "aperture": 2.8, "sensor_width": 6.17}
+    data = {}
+    for i in range(len(samples["latitude"])):
+        data[f"frame_{i + 1:07d}.png"] = {
+            "gps": {field: float(samples[field][i])
+                    for field in ("latitude", "longitude", "altitude", "speed", "roll", "pitch", "yaw")},
+            "camera": dict(camera),
+        }
+    return data
+
+def write_exiftool_json(output_file, samples):
+    """Write telemetry as `exiftool -json -ee -n -G3` prints it: one Doc<N>: tag per line"""
+    fields = {
+        "time": "SampleTime", "latitude": "GPSLatitude", "longitude": "GPSLongitude",
+        "altitude": "AbsoluteAltitude", "speed": "GPSSpeed",
+        "roll": "DroneRoll", "pitch": "DronePitch", "yaw": "DroneYaw",
+    }
+    with open(output_file, 'w') as f:
+        f.write('[{\n  "SourceFile": "synthetic.mp4",\n')
+        f.write('  "Main:FocalLength": 4.5,\n  "Main:Aperture": 2.8,\n')
+        columns = [(tag, samples[field].tolist()) for field, tag in fields.items()]
+        for i in range(len(samples["latitude"])):
+            for tag, column in columns:
+                f.write(f'  "Doc{i + 1}:{tag}": {column[i]!r},\n')
+        f.write('  "Main:Duration": %s\n}]\n' % json.dumps(float(samples["time"][-1]) if len(samples["time"]) else 0.0))
+    return output_file
+
+def point_cloud(count, seed=SEED):
+    """Return (vertices, normals, colors) of a noisy terrain patch like a fused COLMAP cloud"""
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(-100.0, 100.0, (count, 2))
+    z = 5.0 * np.sin(xy[:, 0] / 15.0) * np.cos(xy[:, 1] / 20.0) + rng.normal(0, 0.05, count)
+    vertices = np.column_stack([xy, z]).astype(np.float32)
+    normals = np.column_stack([rng.normal(0, 0.1, (count, 2)), np.ones(count)])
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    colors = np.column_stack([rng.integers(0, 256, (count, 3)), np.full(count, 255)]).astype(np.uint8)
+    return vertices, normals.astype(np.float32), colors
@@ -10,29 +10,36 @@ bl_info = {
     "category": "3D View",
 }
 
-import bpy
 import importlib
 import sys
 import os
 
+# Worker processes (e.g. distributed matching) import the utils package with a
+# plain Python interpreter, where bpy is not available
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
 # Add lib directory to path for bundled dependencies
 file_dir = os.path.dirname(os.path.abspath(__file__))
 lib_dir = os.path.join(file_dir, "lib")
 if os.path.exists(lib_dir) and lib_dir not in sys.path:
     sys.path.insert(0, lib_dir)
 
-# Import the modules
-from . import ui
-from . import operators
-from . import properties
+if bpy is not None:
+    # Import the modules
+    from . import ui
+    from . import operators
+    from . import properties
 
-# Reload modules when the add-on is reloaded
-if "ui" in locals():
-    importlib.reload(ui)
-if "operators" in locals():
-    importlib.reload(operators)
-if "properties" in locals():
-    importlib.reload(properties)
+    # Reload modules when the add-on is reloaded
+    if "ui" in locals():
+        importlib.reload(ui)
+    if "operators" in locals():
+        importlib.reload(operators)
+    if "properties" in locals():
+        importlib.reload(properties)
 
 def register():
     properties.register()
@@ -1,7 +1,9 @@
 import bpy
 import os
-import subprocess
 import json
+import time
+import shutil
+import subprocess
 import tempfile
 import webbrowser
 import numpy as np
@@ -9,6 +11,40 @@ from bpy.types import Operator
 from bpy.props import StringProperty, BoolProperty, FloatProperty
 
 from .utils import gps_utils
+from .utils import colmap_db
+from .utils import chunked_reconstruction
+from .utils import dense_reconstruction
+from .utils import meshroom_pipeline
+from .utils import distributed_matching
+from .utils import feature_cache
+from .utils import image_pyramid
+from .utils import region_of_interest
+from .utils import point_index
+from .utils import live_follow
+from .utils import mesh_io
+from .utils import telemetry_stream
+from .utils import project_store
+from .utils import trajectory
+from .utils import scene_builder
+from .utils import georeferencing
+from .utils import model_export
+from .utils import export_worker
+from .utils.project_store import ProjectStore
+from .utils import video_utils
+from .utils.process_supervisor import run_tool, tool_available, shutdown_supervisor
+from .utils.pipeline_manifest import StageManifest
+
+# Seconds a cancelled batch export keeps trying to delete its scene snapshot
+SNAPSHOT_CLEANUP_TIMEOUT = 60.0
+
+def extraction_scale(quality):
+    """FFmpeg scale filter for a frame extraction quality setting"""
+    if quality == 'HIGH':
+        return ""
+    elif quality == 'MEDIUM':
+        return "scale=iw/2:ih/2"
+    else:  # LOW
+        return "scale=iw/4:ih/4"
 
 class DRONEVIDEO3D_OT_extract_frames(Operator):
     bl_idname = "dronevideo3d.extract_frames"
@@ -34,12 +70,7 @@ class DRONEVIDEO3D_OT_extract_frames(Operator):
         # Extract frames using FFmpeg
         try:
             # Define quality settings
-            if settings.frame_extraction_quality == 'HIGH':
-                scale = ""
-            elif settings.frame_extraction_quality == 'MEDIUM':
-                scale = "scale=iw/2:ih/2"
-            else:  # LOW
-                scale = "scale=iw/4:ih/4"
+            scale = extraction_scale(settings.frame_extraction_quality)
                 
             # Prepare FFmpeg command
             ffmpeg_cmd = [
@@ -50,29 +81,21 @@ class DRONEVIDEO3D_OT_extract_frames(Operator):
                 os.path.join(frames_dir, "frame_%04d.png")
             ]
             
-            # Execute FFmpeg and capture timestamps
-            subprocess.run(ffmpeg_cmd, check=True)
+            # Execute FFmpeg
+            run_tool(ffmpeg_cmd, echo=True)
             
-            # Generate timestamps file using FFmpeg
-            timestamp_file = os.path.join(settings.output_path, "timestamps.csv")
-            ffmpeg_timestamp_cmd = [
-                "ffmpeg", "-i", settings.video_path,
-                "-vf", f"select=not(mod(n\\,{settings.frame_extraction_rate})),showinfo",
-                "-f", "null", "-"
-            ]
-            
-            # Capture showinfo output for timestamps
-            process = subprocess.Popen(ffmpeg_timestamp_cmd, stderr=subprocess.PIPE, universal_newlines=True)
-            output, _ = process.communicate()
-            
-            # Parse timestamps from showinfo output and save to file
-            with open(timestamp_file, 'w') as f:
-                f.write("frame,timestamp\n")
-                for line in output.split('\n'):
-                    if "pts_time:" in line:
-                        pts_time = line.split("pts_time:")[1].split()[0]
-                        frame_num = line.split("n:")[1].split()[0]
-                        f.write(f"frame_{int(frame_num):04d}.png,{pts_time}\n")
+            # Record frame timestamps from streamed FFmpeg showinfo output in the project store
+            names, timestamps = video_utils.extract_timestamps(settings.video_path, frame_rate=settings.frame_extraction_rate)
+            with ProjectStore(settings.output_path) as store:
+                store.write_frames(names, timestamps)
+                store.write_quality(video_utils.frame_sharpness(frames_dir, names))
+                store.export_timestamps_csv(os.path.join(settings.output_path, project_store.TIMESTAMPS_CSV))
+                store.set_stage_metadata("extract_frames", {
+                    "video_path": settings.video_path,
+                    "rate": settings.frame_extraction_rate,
+                    "quality": settings.frame_extraction_quality,
+                    "frames": len(names)
+                })
             
             self.report({'INFO'}, f"Successfully extracted frames to {frames_dir}")
             return {'FINISHED'}
@@ -105,40 +128,49 @@ class DRONEVIDEO3D_OT_extract_gps(Operator):
             return {'CANCELLED'}
             
         # Check if exiftool is available
-        try:
-            subprocess.run(["exiftool", "-ver"], capture_output=True, check=True)
-        except (subprocess.SubprocessError, FileNotFoundError):
+        if not tool_available(["exiftool", "-ver"]):
             self.report({'ERROR'}, "ExifTool not found. Please install ExifTool and make it available in PATH")
             return {'CANCELLED'}
             
         try:
             # Extract GPS metadata from video
             metadata_file = os.path.join(settings.output_path, "gps_metadata.json")
-            exiftool_cmd = [
-                "exiftool", "-json", "-g", settings.video_path
-            ]
             
-            result = subprocess.run(exiftool_cmd, capture_output=True, check=True, text=True)
+            # Parse telemetry samples as ExifTool prints them while tee-ing the raw JSON to file
+            samples, camera = telemetry_stream.stream_exiftool_telemetry(settings.video_path, metadata_file)
             
-            # Save the metadata to file
-            with open(metadata_file, 'w') as f:
-                f.write(result.stdout)
+            with ProjectStore(settings.output_path) as store:
+                # Resample the telemetry at the extracted frames
+                frame_names, frame_times = store.read_frames()
+                gps_data = telemetry_stream.telemetry_to_gps_data(samples, camera, frame_names, frame_times)
+                if not gps_data:
+                    self.report({'ERROR'}, "No GPS telemetry found in video")
+                    return {'CANCELLED'}
                 
-            # Extract GPS data
-            gps_data = gps_utils.extract_gps_metadata(result.stdout)
-            
-            # Apply smoothing if requested
-            if settings.gps_fix_method == 'SMOOTH':
-                gps_data = gps_utils.smooth_gps_trajectory(gps_data)
+                store.write_telemetry(samples)
+                store.set_stage_metadata("camera", camera)
+                store.write_gps(gps_data, project_store.GPS_RAW)
                 
-            # Create CSV for GPS poses
-            csv_file = os.path.join(settings.output_path, "gps_poses.csv")
-            gps_utils.generate_gps_poses_csv(gps_data, csv_file)
-            
-            # Create Meshroom XML file if needed
-            if settings.photogrammetry_pipeline == 'MESHROOM':
-                xml_file = os.path.join(settings.output_path, "sensor_data.xml")
-                gps_utils.generate_meshroom_sensor_data(gps_data, xml_file)
+                # Apply smoothing if requested
+                if settings.gps_fix_method == 'SMOOTH':
+                    store.write_gps(gps_utils.smooth_gps_trajectory(gps_data), project_store.GPS_SMOOTHED)
+                else:
+                    store.write_gps({}, project_store.GPS_SMOOTHED)
+                
+                store.set_stage_metadata("extract_gps", {
+                    "samples": len(samples["latitude"]),
+                    "frames": len(gps_data),
+                    "fix_method": settings.gps_fix_method
+                })
+                
+                # Export the CSV for GPS poses read by the photogrammetry stages
+                csv_file = os.path.join(settings.output_path, "gps_poses.csv")
+                store.export_gps_poses_csv(csv_file)
+                
+                # Export the Meshroom XML file if needed
+                if settings.photogrammetry_pipeline == 'MESHROOM':
+                    xml_file = os.path.join(settings.output_path, "sensor_data.xml")
+                    store.export_sensor_data_xml(xml_file)
             
             self.report({'INFO'}, f"GPS metadata extracted to {metadata_file} and {csv_file}")
             return {'FINISHED'}
@@ -147,6 +179,79 @@ class DRONEVIDEO3D_OT_extract_gps(Operator):
             self.report({'ERROR'}, f"Error extracting GPS metadata: {str(e)}")
             return {'CANCELLED'}
 
+class DRONEVIDEO3D_OT_follow_video(Operator):
+    bl_idname = "dronevideo3d.follow_video"
+    bl_label = "Follow Growing Video"
+    bl_description = "Extract and register frames of a video file while it is still being recorded or copied"
+    
+    _timer = None
+    
+    def execute(self, context):
+        settings = context.scene.drone_video_3d
+        
+        if not settings.video_path:
+            self.report({'ERROR'}, "Please select a video file")
+            return {'CANCELLED'}
+            
+        if not settings.output_path:
+            self.report({'ERROR'}, "Please select an output directory")
+            return {'CANCELLED'}
+            
+        self.follower = live_follow.LiveFollower(
+            settings.video_path, settings.output_path,
+            frame_rate=settings.frame_extraction_rate,
+            scale=extraction_scale(settings.frame_extraction_quality),
+            use_cuda=settings.use_cuda,
+            batch_frames=settings.live_batch_frames,
+            idle_timeout=settings.live_idle_timeout,
+            use_feature_cache=settings.use_feature_cache,
+            cache_size_gb=settings.feature_cache_size_gb
+        ).start()
+        self.start = time.time()
+        self.preview_version = 0
+        self.last_status = None
+        
+        self._timer = context.window_manager.event_timer_add(1.0, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        self.report({'INFO'}, f"Following {settings.video_path}; press Esc to stop")
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.follower.stop()
+            self.report({'WARNING'}, "Stopping after the current batch")
+            return {'PASS_THROUGH'}
+            
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+            
+        status = self.follower.status()
+        summary = (status["extracted"], status["processed"], status["registered"])
+        if summary != self.last_status:
+            self.last_status = summary
+            self.report({'INFO'}, f"Live: {status['extracted']} frames extracted, {status['processed']} processed, "
+                                  f"{status['registered']} registered")
+            
+        if status["preview_version"] != self.preview_version:
+            self.preview_version = status["preview_version"]
+            try:
+                preview = mesh_io.read_ply(self.follower.preview_ply)
+                scene_builder.point_cloud_object("DroneScan_LivePreview", preview, context.scene.collection)
+            except Exception as e:
+                self.report({'WARNING'}, f"Could not load the live preview: {str(e)}")
+                
+        if self.follower.is_running():
+            return {'PASS_THROUGH'}
+            
+        context.window_manager.event_timer_remove(self._timer)
+        self._timer = None
+        if status["error"]:
+            self.report({'ERROR'}, f"Live processing failed: {status['error']}")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Live processing finished: {status['registered']} of {status['processed']} frames "
+                              f"registered in {time.time() - self.start:.0f}s")
+        return {'FINISHED'}
+
 class DRONEVIDEO3D_OT_run_photogrammetry(Operator):
     bl_idname = "dronevideo3d.run_photogrammetry"
     bl_label = "Run Photogrammetry"
@@ -184,9 +289,7 @@ class DRONEVIDEO3D_OT_run_photogrammetry(Operator):
         settings = context.scene.drone_video_3d
         
         # Check if COLMAP is available
-        try:
-            subprocess.run(["colmap", "-h"], capture_output=True, check=True)
-        except (subprocess.SubprocessError, FileNotFoundError):
+        if not tool_available(["colmap", "-h"]):
             self.report({'ERROR'}, "COLMAP not found. Please install COLMAP and make it available in PATH")
             return {'CANCELLED'}
         
@@ -196,46 +299,79 @@ class DRONEVIDEO3D_OT_run_photogrammetry(Operator):
             sparse_dir = os.path.join(photo_dir, "sparse")
             os.makedirs(sparse_dir, exist_ok=True)
             
-            # Feature extraction
-            self.report({'INFO'}, "Running COLMAP feature extraction (this may take a while)...")
-            feature_cmd = [
-                "colmap", "feature_extractor",
-                "--database_path", db_path,
-                "--image_path", frames_dir,
-                "--ImageReader.single_camera", "1",
-                "--ImageReader.camera_model", "OPENCV"
-            ]
+            # Checkpoint records let an interrupted run continue where it stopped
+            manifest = StageManifest(photo_dir)
+            completed, total = manifest.summary()
+            if completed:
+                self.report({'INFO'}, f"Resuming COLMAP pipeline ({completed} of {total} recorded stages already completed)")
             
-            if settings.use_gps_metadata:
-                feature_cmd.extend(["--ImageReader.gps_prior", "1"])
-                
-            if settings.use_cuda:
-                feature_cmd.extend(["--SiftExtraction.use_gpu", "1"])
+            # Restrict the reconstruction to frames that see the region of interest
+            roi = None
+            if settings.use_region_of_interest:
+                roi = self.prepare_region_of_interest(settings, gps_csv, photo_dir)
+                if roi is None:
+                    return {'CANCELLED'}
+                gps_csv = roi["gps_csv"]
+                db_path = os.path.join(photo_dir, "database_roi.db")
+                sparse_dir = os.path.join(photo_dir, "sparse_roi")
+                os.makedirs(sparse_dir, exist_ok=True)
+            
+            if settings.reconstruction_mode == 'CHUNKED':
+                if not os.path.exists(gps_csv):
+                    self.report({'ERROR'}, "Chunked reconstruction needs GPS metadata. Please extract GPS metadata first")
+                    return {'CANCELLED'}
+                    
+                self.report({'INFO'}, "Running chunked COLMAP reconstruction...")
+                model_dir = chunked_reconstruction.run_chunked_reconstruction(
+                    frames_dir, gps_csv, photo_dir,
+                    use_cuda=settings.use_cuda,
+                    max_frames_per_tile=settings.chunk_max_frames,
+                    overlap=settings.chunk_overlap,
+                    memory_budget_gb=settings.memory_budget_gb,
+                    log=lambda message: self.report({'INFO'}, message),
+                    manifest=manifest,
+                    cache_size_gb=settings.feature_cache_size_gb if settings.use_feature_cache else 0.0
+                )
+                upstream = manifest.token("chunk.merge")
+            else:
+                model_dir = self.run_colmap_sparse(settings, frames_dir, gps_csv, db_path, sparse_dir, manifest,
+                                                   frame_names=roi["frames"] if roi else None)
+                upstream = manifest.token("colmap.mapper")
+                if model_dir is not None:
+                    model_dir, upstream = self.align_to_gps(gps_csv, photo_dir, sparse_dir, model_dir, upstream,
+                                                            manifest)
                 
-            subprocess.run(feature_cmd, check=True)
+            if model_dir is None:
+                self.report({'ERROR'}, "COLMAP could not register enough images to build a model")
+                return {'CANCELLED'}
             
-            # Feature matching
-            self.report({'INFO'}, "Running COLMAP feature matching...")
-            matching_cmd = [
-                "colmap", "exhaustive_matcher",
-                "--database_path", db_path
-            ]
+            bbox_path = None
+            if roi:
+                # Fusion is cropped in the GPS-aligned coordinates of the model
+                origin = trajectory.read_model_origin(photo_dir)
+                if origin is None:
+                    self.report({'ERROR'}, "The model could not be aligned to GPS, so the region of interest can't be cropped")
+                    return {'CANCELLED'}
+                lower, upper = region_of_interest.bounding_box(
+                    roi["latitude"], roi["longitude"], roi["ground_altitude"], roi["top_altitude"], origin,
+                    margin=settings.roi_margin
+                )
+                bbox_path = region_of_interest.write_bbox(os.path.join(photo_dir, "roi_bbox.txt"), lower, upper)
             
-            if settings.use_cuda:
-                matching_cmd.extend(["--SiftMatching.use_gpu", "1"])
-                
-            subprocess.run(matching_cmd, check=True)
-            
-            # Structure from motion
-            self.report({'INFO'}, "Running COLMAP structure from motion...")
-            mapper_cmd = [
-                "colmap", "mapper",
-                "--database_path", db_path,
-                "--image_path", frames_dir,
-                "--output_path", sparse_dir
-            ]
-                
-            subprocess.run(mapper_cmd, check=True)
+            # Dense reconstruction (undistortion, stereo and fusion)
+            if settings.run_dense_reconstruction:
+                self.report({'INFO'}, "Running COLMAP dense reconstruction...")
+                dense_reconstruction.run_dense_reconstruction(
+                    frames_dir, model_dir, os.path.join(photo_dir, "dense"),
+                    max_image_size=settings.dense_max_image_size,
+                    num_threads=settings.dense_num_threads,
+                    cache_size_gb=settings.dense_cache_size_gb,
+                    batch_size=settings.dense_batch_size,
+                    log=lambda message: self.report({'INFO'}, message),
+                    manifest=manifest,
+                    upstream=upstream,
+                    bbox_path=bbox_path
+                )
             
             # Create a completion marker
             with open(os.path.join(photo_dir, "colmap_completed.txt"), 'w') as f:
@@ -248,20 +384,227 @@ class DRONEVIDEO3D_OT_run_photogrammetry(Operator):
             self.report({'ERROR'}, f"Error running COLMAP: {str(e)}")
             return {'CANCELLED'}
         
+    def align_to_gps(self, gps_csv, photo_dir, sparse_dir, model_dir, upstream, manifest):
+        """Align a sparse model to the GPS positions and record its origin in chunk_origin.txt
+
+        Returns the model directory and manifest token to continue with. The
+        origin is kept inside the aligned model and copied to the shared
+        chunk_origin.txt on every run, since chunked runs write their own.
+        Without GPS, or when the alignment fails, the unaligned model is
+        returned and the stale record removed so it is not georeferenced.
+        """
+        origin_file = os.path.join(photo_dir, trajectory.MODEL_ORIGIN_FILE)
+        if os.path.exists(gps_csv):
+            names, positions = colmap_db.read_gps_poses_csv(gps_csv)
+            aligned_dir = os.path.join(sparse_dir, "aligned")
+            aligned_origin = os.path.join(aligned_dir, trajectory.MODEL_ORIGIN_FILE)
+            inputs = {"upstream": upstream, "frames": names}
+            try:
+                with manifest.stage("colmap.align", inputs,
+                                    [os.path.join(aligned_dir, "images.bin"), aligned_origin]) as run:
+                    if run:
+                        self.report({'INFO'}, "Aligning the model to the GPS positions...")
+                        origin = positions.mean(axis=0)
+                        chunked_reconstruction.align_model(model_dir, aligned_dir, names, positions, origin)
+                        trajectory.write_model_origin(aligned_dir, origin)
+                shutil.copy2(aligned_origin, origin_file)
+                return aligned_dir, manifest.token("colmap.align")
+            except (subprocess.CalledProcessError, RuntimeError) as e:
+                self.report({'WARNING'}, f"Could not align the model to GPS, it will not be georeferenced: {str(e)}")
+                
+        if os.path.exists(origin_file):
+            os.remove(origin_file)
+        return model_dir, upstream
+        
+    def prepare_region_of_interest(self, settings, gps_csv, photo_dir):
+        """Select the frames that see the region of interest and write their GPS subset"""
+        if not os.path.exists(gps_csv):
+            self.report({'ERROR'}, "A region of interest needs GPS metadata. Please extract GPS metadata first")
+            return None
+        try:
+            latitude, longitude = region_of_interest.parse_polygon(bpy.path.abspath(settings.roi_polygon))
+        except (ValueError, KeyError, IndexError, OSError) as e:
+            self.report({'ERROR'}, f"Invalid region of interest: {str(e)}")
+            return None
+        
+        with ProjectStore(settings.output_path) as store:
+            _, gps = store.read_gps()
+            ground_altitude = float(np.nanmin(gps["altitude"]))
+            top_altitude = float(np.nanmax(gps["altitude"]))
+            frames = region_of_interest.select_frames(
+                store, latitude, longitude,
+                ground_altitude=ground_altitude,
+                camera_pitch=settings.roi_camera_pitch,
+                margin=settings.roi_margin
+            )
+            if len(frames) < 2:
+                self.report({'ERROR'}, "Fewer than two frames see the region of interest")
+                return None
+            roi_csv = os.path.join(photo_dir, "gps_poses_roi.csv")
+            wanted = set(frames)
+            with open(gps_csv, 'r') as source, open(roi_csv, 'w') as target:
+                lines = source.readlines()
+                target.write(lines[0])
+                target.writelines(line for line in lines[1:] if line.split(",", 1)[0] in wanted)
+        
+        self.report({'INFO'}, f"Region of interest: {len(frames)} of {len(gps['altitude'])} frames selected")
+        return {"frames": frames, "gps_csv": roi_csv, "latitude": latitude, "longitude": longitude,
+                "ground_altitude": ground_altitude, "top_altitude": top_altitude}
+        
+    def run_colmap_sparse(self, settings, frames_dir, gps_csv, db_path, sparse_dir, manifest, frame_names=None):
+        use_gps = settings.use_gps_metadata and os.path.exists(gps_csv)
+        
+        # Write the camera, image list and GPS position priors in one transaction
+        inputs = {"frames": frames_dir, "gps": gps_csv if use_gps else None, "subset": frame_names}
+        with manifest.stage("colmap.prepare_database", inputs, [db_path]) as run:
+            if run and not colmap_db.prepare_database(db_path, frames_dir, gps_csv if use_gps else None,
+                                                      frame_names=frame_names):
+                # Extraction only handles the frames listed here, so an empty database would match nothing
+                raise RuntimeError("Could not prepare the COLMAP database")
+        
+        # Feature extraction
+        inputs = {"upstream": manifest.token("colmap.prepare_database"), "use_cuda": settings.use_cuda}
+        with manifest.stage("colmap.feature_extraction", inputs, [db_path]) as run:
+            if run:
+                self.report({'INFO'}, "Running COLMAP feature extraction (this may take a while)...")
+                feature_cmd = [
+                    "colmap", "feature_extractor",
+                    "--database_path", db_path,
+                    "--image_path", frames_dir,
+                    "--ImageReader.single_camera", "1",
+                    "--ImageReader.camera_model", "OPENCV"
+                ]
+                
+                if settings.use_gps_metadata:
+                    feature_cmd.extend(["--ImageReader.gps_prior", "1"])
+                    
+                if settings.use_cuda:
+                    feature_cmd.extend(["--SiftExtraction.use_gpu", "1"])
+                
+                # Reuse features of identical frames from earlier runs and projects
+                params = feature_cache.extraction_params(settings.use_cuda)
+                if settings.use_feature_cache:
+                    with feature_cache.FeatureCache(max_size_bytes=int(settings.feature_cache_size_gb * 1024 ** 3)) as cache:
+                        cached, extracted = feature_cache.run_cached_extraction(db_path, frames_dir, feature_cmd, params, cache)
+                    self.report({'INFO'}, f"Features: {cached} frames from cache, {extracted} extracted")
+                else:
+                    feature_cache.run_cached_extraction(db_path, frames_dir, feature_cmd, params)
+        
+        # Feature matching
+        inputs = {"upstream": manifest.token("colmap.feature_extraction"), "use_cuda": settings.use_cuda,
+                  "coarse_to_fine": [settings.coarse_to_fine_matching, settings.coarse_image_size,
+                                     settings.coarse_min_inliers]}
+        with manifest.stage("colmap.matching", inputs, [db_path]) as run:
+            pairs = None
+            if run and settings.coarse_to_fine_matching:
+                # Only pairs verified on the low-resolution level are matched at full resolution
+                self.report({'INFO'}, "Finding overlapping frames on the coarse image pyramid level...")
+                cache = feature_cache.FeatureCache(max_size_bytes=int(settings.feature_cache_size_gb * 1024 ** 3)) \
+                    if settings.use_feature_cache else None
+                try:
+                    pairs = image_pyramid.coarse_pairs(
+                        db_path, frames_dir, os.path.dirname(db_path),
+                        gps_csv=gps_csv if use_gps else None,
+                        coarse_size=settings.coarse_image_size,
+                        min_inliers=settings.coarse_min_inliers,
+                        use_gpu=settings.use_cuda,
+                        cache=cache,
+                        log=lambda message: self.report({'INFO'}, message)
+                    )
+                finally:
+                    if cache is not None:
+                        cache.close()
+                if len(pairs) == 0:
+                    # Matching nothing would only surface later as a confusing mapper failure
+                    self.report({'WARNING'}, "No overlapping frames found on the coarse level, "
+                                             "falling back to exhaustive matching")
+                    pairs = None
+
+            if run and settings.distributed_matching:
+                self.report({'INFO'}, "Running distributed COLMAP feature matching...")
+                job_dir = bpy.path.abspath(settings.matching_job_dir) if settings.matching_job_dir else \
+                    os.path.join(os.path.dirname(db_path), "match_jobs")
+                distributed_matching.run_distributed_matching(
+                    db_path, job_dir,
+                    num_local_workers=settings.matching_workers,
+                    unit_size=settings.matching_unit_size,
+                    use_gpu=settings.use_cuda,
+                    pairs=pairs,
+                    timeout=settings.matching_timeout * 60.0 or None,
+                    log=lambda message: self.report({'INFO'}, message)
+                )
+            elif run and pairs is not None:
+                self.report({'INFO'}, f"Matching {len(pairs)} verified pairs at full resolution...")
+                image_pyramid.match_pairs(db_path, pairs, use_gpu=settings.use_cuda)
+            elif run:
+                self.report({'INFO'}, "Running COLMAP feature matching...")
+                matching_cmd = [
+                    "colmap", "exhaustive_matcher",
+                    "--database_path", db_path
+                ]
+                
+                if settings.use_cuda:
+                    matching_cmd.extend(["--SiftMatching.use_gpu", "1"])
+                    
+                run_tool(matching_cmd, echo=True)
+                
+            if run:
+                # Report matching diagnostics straight from the database
+                _, keypoint_counts = colmap_db.read_keypoint_counts(db_path)
+                _, _, inlier_counts = colmap_db.read_match_counts(db_path, verified=True)
+                if len(keypoint_counts):
+                    self.report({'INFO'}, f"{len(keypoint_counts)} images, median {int(np.median(keypoint_counts))} keypoints, "
+                                          f"{len(inlier_counts)} verified pairs")
+        
+        # Structure from motion
+        inputs = {"upstream": manifest.token("colmap.matching")}
+        with manifest.stage("colmap.mapper", inputs, [sparse_dir]) as run:
+            if run:
+                self.report({'INFO'}, "Running COLMAP structure from motion...")
+                mapper_cmd = [
+                    "colmap", "mapper",
+                    "--database_path", db_path,
+                    "--image_path", frames_dir,
+                    "--output_path", sparse_dir
+                ]
+                    
+                run_tool(mapper_cmd, echo=True)
+        
+        return chunked_reconstruction.largest_model(sparse_dir)
+        
     def run_meshroom(self, context, frames_dir, sensor_data_xml, photo_dir):
         settings = context.scene.drone_video_3d
         
-        # This is a placeholder. In a real implementation, you would:
-        # 1. Check if Meshroom is installed
-        # 2. Run the Meshroom pipeline with the frames and sensor data
-        
-        self.report({'WARNING'}, "Meshroom integration not fully implemented yet.")
+        meshroom = meshroom_pipeline.find_meshroom(bpy.path.abspath(settings.meshroom_path))
+        if not meshroom or not tool_available([meshroom, "--help"]):
+            self.report({'ERROR'}, "Meshroom not found. Please set the Meshroom path or make meshroom_batch available in PATH")
+            return {'CANCELLED'}
         
-        # Create a dummy completion marker
-        with open(os.path.join(photo_dir, "meshroom_completed.txt"), 'w') as f:
-            f.write("Meshroom processing would be completed here.\n")
+        try:
+            self.report({'INFO'}, "Running Meshroom photogrammetry (cached nodes are reused)...")
+            output_dir = meshroom_pipeline.run_meshroom_pipeline(
+                frames_dir, photo_dir,
+                sensor_data_xml=sensor_data_xml,
+                meshroom=meshroom,
+                parallelism=settings.meshroom_node_parallelism,
+                log=lambda message: self.report({'INFO'}, message)
+            )
             
-        return {'FINISHED'}
+            # Meshroom models are not GPS-aligned; drop the record an earlier COLMAP run left
+            origin_file = os.path.join(photo_dir, trajectory.MODEL_ORIGIN_FILE)
+            if os.path.exists(origin_file):
+                os.remove(origin_file)
+            
+            # Create a completion marker
+            with open(os.path.join(photo_dir, "meshroom_completed.txt"), 'w') as f:
+                f.write("Meshroom processing completed\n")
+                
+            self.report({'INFO'}, f"Meshroom processing completed. Results saved to {output_dir}")
+            return {'FINISHED'}
+            
+        except Exception as e:
+            self.report({'ERROR'}, f"Error running Meshroom: {str(e)}")
+            return {'CANCELLED'}
 
 class DRONEVIDEO3D_OT_import_model(Operator):
     bl_idname = "dronevideo3d.import_model"
@@ -292,17 +635,8 @@ class DRONEVIDEO3D_OT_import_model(Operator):
                 if os.path.exists(fused_ply):
                     model_file = fused_ply
         else:  # MESHROOM
-            # Look for Meshroom mesh.obj
-            mesh_dir = os.path.join(photo_dir, "MeshroomCache", "Texturing")
-            if os.path.exists(mesh_dir):
-                # Find the latest mesh.obj file
-                for root, dirs, files in os.walk(mesh_dir):
-                    for file in files:
-                        if file.endswith(".obj"):
-                            model_file = os.path.join(root, file)
-                            break
-                    if model_file:
-                        break
+            # Look for the textured mesh in the Meshroom output or cache
+            model_file = meshroom_pipeline.find_textured_mesh(photo_dir)
         
         if not model_file:
             # For demonstration, create a simple placeholder model
@@ -326,11 +660,83 @@ class DRONEVIDEO3D_OT_import_model(Operator):
         for obj in bpy.context.selected_objects:
             if obj.type == 'MESH':
                 obj.name = "DroneScan_Model"
+                obj["dronevideo3d_source"] = model_file
                 break
+        
+        # Build (or load the cached) spatial index so region queries are interactive
+        if model_file.endswith(".ply"):
+            start = time.time()
+            try:
+                index = point_index.get_index(model_file, log=lambda message: self.report({'INFO'}, message))
+                self.report({'INFO'}, f"Spatial index of {len(index)} points ready in {time.time() - start:.1f} s")
+            except Exception as e:
+                # The model is in the scene already; region extraction retries the index on demand
+                self.report({'WARNING'}, f"Could not build the spatial index: {str(e)}")
                 
         self.report({'INFO'}, f"Imported 3D model from {model_file}")
         return {'FINISHED'}
 
+class DRONEVIDEO3D_OT_extract_region(Operator):
+    bl_idname = "dronevideo3d.extract_region"
+    bl_label = "Extract Point Cloud Region"
+    bl_description = "Copy the points of the imported cloud inside a box, sphere or outline into a new object"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    def execute(self, context):
+        settings = context.scene.drone_video_3d
+        
+        model_obj = bpy.data.objects.get(model_export.MODEL_OBJECT)
+        source = model_obj.get("dronevideo3d_source") if model_obj is not None else None
+        if not source or not source.endswith(".ply") or not os.path.exists(source):
+            self.report({'ERROR'}, "Please import a dense point cloud (fused.ply) first")
+            return {'CANCELLED'}
+        
+        shape_obj = context.active_object
+        if settings.region_shape != 'SPHERE' and (shape_obj is None or shape_obj == model_obj):
+            self.report({'ERROR'}, "Select an object whose bounds or outline define the region")
+            return {'CANCELLED'}
+        
+        try:
+            index = point_index.get_index(source, log=lambda message: self.report({'INFO'}, message))
+            
+            # Queries run in the cloud's own coordinates
+            to_model = np.linalg.inv(np.array(model_obj.matrix_world, dtype=np.float64))
+            start = time.time()
+            if settings.region_shape == 'BOX':
+                corners = georeferencing.transform_points(
+                    np.array([tuple(corner) for corner in shape_obj.bound_box]),
+                    to_model @ np.array(shape_obj.matrix_world, dtype=np.float64)
+                )
+                rows = index.query_box(corners.min(axis=0), corners.max(axis=0))
+            elif settings.region_shape == 'SPHERE':
+                centre = georeferencing.transform_points(np.array(context.scene.cursor.location), to_model)[0]
+                radius = settings.region_radius / np.cbrt(abs(np.linalg.det(np.array(model_obj.matrix_world)[:3, :3])))
+                rows = index.query_sphere(centre, radius)
+            else:  # POLYGON
+                outline = georeferencing.transform_points(scene_builder.mesh_world_vertices(shape_obj), to_model)
+                if len(outline) < 3:
+                    self.report({'ERROR'}, "The outline object needs at least three vertices")
+                    return {'CANCELLED'}
+                rows = index.query_polygon(outline[:, :2])
+            elapsed = time.time() - start
+            
+            if len(rows) == 0:
+                self.report({'WARNING'}, "No points inside the region")
+                return {'CANCELLED'}
+            
+            region_obj = scene_builder.point_cloud_object(
+                f"{model_export.MODEL_OBJECT}_Region", index.subset(rows),
+                model_obj.users_collection[0] if model_obj.users_collection else context.scene.collection,
+                model_obj.matrix_world.copy()
+            )
+            region_obj["dronevideo3d_source"] = source
+            self.report({'INFO'}, f"Extracted {len(rows)} of {len(index)} points in {elapsed * 1000:.0f} ms")
+            return {'FINISHED'}
+            
+        except Exception as e:
+            self.report({'ERROR'}, f"Error extracting region: {str(e)}")
+            return {'CANCELLED'}
+
 class DRONEVIDEO3D_OT_visualize_gps(Operator):
     bl_idname = "dronevideo3d.visualize_gps"
     bl_label = "Visualize GPS Path"
@@ -344,61 +750,19 @@ class DRONEVIDEO3D_OT_visualize_gps(Operator):
             self.report({'ERROR'}, "Please select an output directory")
             return {'CANCELLED'}
             
-        gps_csv = os.path.join(settings.output_path, "gps_poses.csv")
-        if not os.path.exists(gps_csv):
-            self.report({'ERROR'}, "Please extract GPS metadata first")
-            return {'CANCELLED'}
-            
-        # Create a simple HTML map to visualize GPS path
         try:
-            # Read GPS data from CSV
-            gps_coords = []
-            with open(gps_csv, 'r') as f:
-                import csv
-                reader = csv.DictReader(f)
-                for row in reader:
-                    # Convert cartesian to GPS coordinates (simplified approach)
-                    # Note: In a real implementation, you would use a proper reverse transformation
-                    gps_coords.append({
-                        'frame': row['frame'],
-                        'lat': float(row['x']) / 111111.0,  # Simplified conversion
-                        'lon': float(row['y']) / 111111.0,  # Simplified conversion
-                        'alt': float(row['z'])
-                    })
-            
-            # Create HTML map file
-            map_file = os.path.join(settings.output_path, "gps_map.html")
-            with open(map_file, 'w') as f:
-                f.write("<!DOCTYPE html>\n")
-                f.write("<html>\n")
-                f.write("<head>\n")
-                f.write("  <title>Drone GPS Path</title>\n")
-                f.write("  <style>\n")
-                f.write("    body { font-family: Arial, sans-serif; margin: 0; padding: 20px; }\n")
-                f.write("    h1 { color: #333; }\n")
-                f.write("    .map-container { width: 100%; height: 500px; border: 1px solid #ccc; }\n")
-                f.write("    table { border-collapse: collapse; width: 100%; margin-top: 20px; }\n")
-                f.write("    th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }\n")
-                f.write("    th { background-color: #f2f2f2; }\n")
-                f.write("  </style>\n")
-                f.write("</head>\n")
-                f.write("<body>\n")
-                f.write("  <h1>Drone GPS Path Visualization</h1>\n")
-                f.write("  <div class=\"map-container\">\n")
-                f.write("    <p>Map visualization would be displayed here using folium or similar library.</p>\n")
-                f.write("    <p>This is a placeholder map. In a complete implementation, you would see an interactive map with the drone flight path.</p>\n")
-                f.write("  </div>\n")
-                f.write("  <h2>GPS Coordinates</h2>\n")
-                f.write("  <table>\n")
-                f.write("    <tr><th>Frame</th><th>Latitude</th><th>Longitude</th><th>Altitude</th></tr>\n")
-                
-                # Add GPS coordinates to table
-                for coord in gps_coords[:10]:  # Limit to first 10 for brevity
-                    f.write(f"    <tr><td>{coord['frame']}</td><td>{coord['lat']:.6f}</td><td>{coord['lon']:.6f}</td><td>{coord['alt']:.2f}</td></tr>\n")
-                
-                f.write("  </table>\n")
-                f.write("</body>\n")
-                f.write("</html>\n")
+            # Load the full track, either from the project store or an existing pose CSV
+            track = trajectory.load_trajectory(settings.output_path)
+            if track is None:
+                self.report({'ERROR'}, "Please extract GPS metadata first")
+                return {'CANCELLED'}
+            lat, lon, alt, source = track
+            
+            # Simplify the track to the point budget and write the map page and GeoJSON
+            map_file, geojson_file, kept, total = trajectory.export_trajectory(
+                lat, lon, alt, settings.output_path, max_points=settings.map_point_budget
+            )
+            self.report({'INFO'}, f"GPS path from {source}: kept {kept} of {total} points, GeoJSON in {geojson_file}")
             
             # Open in web browser
             webbrowser.open(map_file)
@@ -410,6 +774,77 @@ class DRONEVIDEO3D_OT_visualize_gps(Operator):
             self.report({'ERROR'}, f"Error visualizing GPS path: {str(e)}")
             return {'CANCELLED'}
 
+class DRONEVIDEO3D_OT_show_flight_path(Operator):
+    bl_idname = "dronevideo3d.show_flight_path"
+    bl_label = "Show Flight Path in Scene"
+    bl_description = "Add the GPS flight path and camera poses to the scene, aligned with the model"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    def execute(self, context):
+        settings = context.scene.drone_video_3d
+        
+        if not settings.output_path:
+            self.report({'ERROR'}, "Please select an output directory")
+            return {'CANCELLED'}
+            
+        try:
+            start = time.time()
+            
+            # Per-frame poses: ECEF positions plus attitude when the telemetry had it
+            camera_poses = trajectory.load_camera_poses(settings.output_path)
+            if camera_poses is None:
+                self.report({'ERROR'}, "Please extract GPS metadata first")
+                return {'CANCELLED'}
+            names, poses, yaw, pitch, roll = camera_poses
+            
+            # The full track, converted to ECEF the same way as the poses
+            track = trajectory.load_trajectory(settings.output_path)
+            if track is None:
+                self.report({'ERROR'}, "No GPS track found; please extract GPS metadata first")
+                return {'CANCELLED'}
+            lat, lon, alt, source = track
+            # Telemetry dropouts leave NaN or infinite samples that would break the path
+            finite = np.isfinite(lat) & np.isfinite(lon) & np.isfinite(alt)
+            lat, lon, alt = lat[finite], lon[finite], alt[finite]
+            if not len(lat):
+                self.report({'ERROR'}, f"The GPS track from {source} has no valid positions")
+                return {'CANCELLED'}
+            path = np.stack([np.broadcast_to(np.asarray(c, dtype=np.float64), len(lat))
+                             for c in gps_utils.convert_to_cartesian(lat, lon, alt)], axis=1)
+            
+            # Express everything in the local frame of the reconstructed model
+            photo_dir = os.path.join(settings.output_path, "photogrammetry")
+            if trajectory.read_model_origin(photo_dir) is None:
+                self.report({'WARNING'}, "The model is not aligned to GPS; the flight path is shown "
+                                         "east-north-up and will not line up with it")
+            origin, rotation = trajectory.model_frame(photo_dir, poses)
+            path_local = trajectory.ecef_to_enu(path, origin, rotation)
+            poses_local = trajectory.ecef_to_enu(poses, origin, rotation)
+            
+            # Without attitude telemetry, point the markers along the direction of travel
+            if not np.any(yaw) and not np.any(pitch) and len(poses) > 1:
+                lat0, lon0, _ = trajectory.cartesian_to_geodetic(*origin)
+                enu = trajectory.ecef_to_enu(poses, origin, trajectory.enu_rotation(lat0, lon0))
+                step = np.gradient(enu[:, :2], axis=0)
+                yaw = np.degrees(np.arctan2(step[:, 0], step[:, 1]))
+            body_to_frame = trajectory.enu_to_frame(origin, rotation) @ scene_builder.attitude_matrices(yaw, pitch, roll)
+            
+            collection = scene_builder.flight_collection(context)
+            path_edges = np.stack([np.arange(len(path_local) - 1), np.arange(1, len(path_local))], axis=1)
+            scene_builder.replace_mesh_object("DroneScan_FlightPath", path_local, path_edges, collection)
+            marker_vertices, marker_edges = scene_builder.camera_marker_geometry(
+                poses_local, body_to_frame, settings.camera_marker_size
+            )
+            scene_builder.replace_mesh_object("DroneScan_CameraPoses", marker_vertices, marker_edges, collection)
+            
+            self.report({'INFO'}, f"Added flight path ({len(path_local)} points from {source}) and "
+                                  f"{len(poses_local)} camera poses in {time.time() - start:.2f}s")
+            return {'FINISHED'}
+        
+        except Exception as e:
+            self.report({'ERROR'}, f"Error showing flight path: {str(e)}")
+            return {'CANCELLED'}
+
 class DRONEVIDEO3D_OT_adjust_gps(Operator):
     bl_idname = "dronevideo3d.adjust_gps"
     bl_label = "Adjust GPS Poses"
@@ -442,78 +877,7 @@ class DRONEVIDEO3D_OT_export_georeferenced(Operator):
     bl_options = {'REGISTER', 'UNDO'}
     
     def execute(self, context):
-        settings = context.scene.drone_video_3d
-        
-        if not settings.output_path:
-            self.report({'ERROR'}, "Please select an output directory")
-            return {'CANCELLED'}
-            
-        # Check if we have a model to export
-        model_obj = bpy.data.objects.get("DroneScan_Model")
-        if not model_obj:
-            self.report({'ERROR'}, "Please import a 3D model first")
-            return {'CANCELLED'}
-            
-        # Export model in the selected format
-        export_dir = os.path.join(settings.output_path, "export")
-        os.makedirs(export_dir, exist_ok=True)
-        
-        model_file = os.path.join(export_dir, f"drone_model.{settings.export_format.lower()}")
-        
-        # Select the model for export
-        bpy.ops.object.select_all(action='DESELECT')
-        model_obj.select_set(True)
-        
-        # Export based on format
-        if settings.export_format == 'OBJ':
-            bpy.ops.export_scene.obj(
-                filepath=model_file,
-                use_selection=True,
-                use_materials=settings.include_textures
-            )
-        elif settings.export_format == 'PLY':
-            bpy.ops.export_mesh.ply(
-                filepath=model_file,
-                use_selection=True
-            )
-        elif settings.export_format == 'GLB':
-            bpy.ops.export_scene.gltf(
-                filepath=model_file,
-                export_format='GLB',
-                use_selection=True
-            )
-        
-        # Create GeoJSON metadata file if requested
-        if settings.include_geo_metadata:
-            geojson_file = os.path.join(export_dir, "geo_metadata.geojson")
-            with open(geojson_file, 'w') as f:
-                f.write('{\n')
-                f.write('  "type": "FeatureCollection",\n')
-                f.write('  "features": [\n')
-                f.write('    {\n')
-                f.write('      "type": "Feature",\n')
-                f.write('      "properties": {\n')
-                f.write('        "model": "drone_model",\n')
-                f.write('        "description": "Drone scan 3D model"\n')
-                f.write('      },\n')
-                f.write('      "geometry": {\n')
-                f.write('        "type": "Polygon",\n')
-                f.write('        "coordinates": [\n')
-                f.write('          [\n')
-                f.write('            [0, 0],\n')
-                f.write('            [0, 1],\n')
-                f.write('            [1, 1],\n')
-                f.write('            [1, 0],\n')
-                f.write('            [0, 0]\n')
-                f.write('          ]\n')
-                f.write('        ]\n')
-                f.write('      }\n')
-                f.write('    }\n')
-                f.write('  ]\n')
-                f.write('}\n')
-            
-        self.report({'INFO'}, f"Exported georeferenced model to {model_file}")
-        return {'FINISHED'}
+        return export_current_model(self, context, georeferenced=True)
 
 class DRONEVIDEO3D_OT_export_model(Operator):
     bl_idname = "dronevideo3d.export_model"
@@ -521,6 +885,57 @@ class DRONEVIDEO3D_OT_export_model(Operator):
     bl_description = "Export the 3D model"
     bl_options = {'REGISTER', 'UNDO'}
     
+    def execute(self, context):
+        return export_current_model(self, context, georeferenced=False)
+
+def export_current_model(operator, context, georeferenced):
+    """Shared body of the export operators: write the model in the selected format"""
+    settings = context.scene.drone_video_3d
+    
+    if not settings.output_path:
+        operator.report({'ERROR'}, "Please select an output directory")
+        return {'CANCELLED'}
+        
+    # Check if we have a model to export
+    model_obj = bpy.data.objects.get(model_export.MODEL_OBJECT)
+    if not model_obj:
+        operator.report({'ERROR'}, "Please import a 3D model first")
+        return {'CANCELLED'}
+        
+    export_dir = os.path.join(settings.output_path, "export")
+    start = time.time()
+    try:
+        model_file = model_export.export_model(model_obj, settings, settings.export_format, export_dir,
+                                               georeferenced)
+    except Exception as e:
+        operator.report({'ERROR'}, f"Error exporting model: {str(e)}")
+        return {'CANCELLED'}
+    
+    # Georeference the model and poses and write the GeoJSON sidecar if requested
+    if georeferenced and settings.include_geo_metadata:
+        try:
+            geo = model_export.write_geo_metadata(model_obj, settings.output_path, export_dir)
+        except Exception as e:
+            operator.report({'ERROR'}, f"Error georeferencing model: {str(e)}")
+            return {'CANCELLED'}
+        if geo is None:
+            operator.report({'ERROR'}, "Please extract GPS metadata first")
+            return {'CANCELLED'}
+        geojson_file, poses_file, frame, vertex_count = geo
+        operator.report({'INFO'}, f"Georeferenced {vertex_count} vertices around "
+                                  f"{frame.latitude:.6f}, {frame.longitude:.6f}: {geojson_file}, {poses_file}")
+        
+    kind = "georeferenced model" if georeferenced else "3D model"
+    operator.report({'INFO'}, f"Exported {kind} to {model_file} in {time.time() - start:.2f}s")
+    return {'FINISHED'}
+
+class DRONEVIDEO3D_OT_batch_export(Operator):
+    bl_idname = "dronevideo3d.batch_export"
+    bl_label = "Batch Export"
+    bl_description = "Export the model in several formats at once in background Blender processes"
+    
+    _timer = None
+    
     def execute(self, context):
         settings = context.scene.drone_video_3d
         
@@ -528,60 +943,120 @@ class DRONEVIDEO3D_OT_export_model(Operator):
             self.report({'ERROR'}, "Please select an output directory")
             return {'CANCELLED'}
             
-        # Check if we have a model to export
-        model_obj = bpy.data.objects.get("DroneScan_Model")
-        if not model_obj:
+        if not bpy.data.objects.get(model_export.MODEL_OBJECT):
             self.report({'ERROR'}, "Please import a 3D model first")
             return {'CANCELLED'}
             
-        # Export model in the selected format
-        export_dir = os.path.join(settings.output_path, "export")
-        os.makedirs(export_dir, exist_ok=True)
+        formats = [f for f in model_export.EXPORT_FORMATS if f in settings.batch_export_formats]
+        if not formats:
+            self.report({'ERROR'}, "Please select at least one export format")
+            return {'CANCELLED'}
+            
+        # Workers load a copy of the scene, so later edits here do not race the export
+        self.export_dir = os.path.join(settings.output_path, "export")
+        os.makedirs(self.export_dir, exist_ok=True)
+        self.snapshot = os.path.join(self.export_dir, "export_snapshot.blend")
+        bpy.ops.wm.save_as_mainfile(filepath=self.snapshot, copy=True, check_existing=False)
         
-        model_file = os.path.join(export_dir, f"drone_model.{settings.export_format.lower()}")
+        georeferenced = settings.batch_georeferenced
+        self.start = time.time()
+        self.jobs = export_worker.submit_exports(
+            bpy.app.binary_path, self.snapshot, formats, self.export_dir, georeferenced,
+            georeferenced and settings.include_geo_metadata, log=lambda message: self.report({'INFO'}, message)
+        )
+        self.pending = list(formats)
+        self.failed = []
         
-        # Select the model for export
-        bpy.ops.object.select_all(action='DESELECT')
-        model_obj.select_set(True)
+        self._timer = context.window_manager.event_timer_add(0.5, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        self.report({'INFO'}, f"Exporting {', '.join(formats)} in background workers")
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            for future, _ in self.jobs.values():
+                future.cancel()
+            self.finish(context)
+            self.report({'WARNING'}, "Batch export cancelled")
+            return {'CANCELLED'}
+            
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+            
+        for file_format in list(self.pending):
+            future, results = self.jobs[file_format]
+            if not future.done():
+                continue
+            self.pending.remove(file_format)
+            try:
+                process = future.result()
+            except Exception as e:
+                self.failed.append(file_format)
+                self.report({'ERROR'}, f"{file_format} export failed: {str(e)}")
+                continue
+            if results:
+                _, seconds, model_file = results[-1]
+                self.report({'INFO'}, f"{file_format}: exported in {seconds:.2f}s "
+                                      f"({process.elapsed:.2f}s with Blender startup) to {model_file}")
+            else:
+                self.report({'INFO'}, f"{file_format}: worker finished in {process.elapsed:.2f}s")
+                
+        if self.pending:
+            return {'PASS_THROUGH'}
+            
+        self.finish(context)
+        done = len(self.jobs) - len(self.failed)
+        self.report({'INFO'} if not self.failed else {'WARNING'},
+                    f"Batch export finished: {done} of {len(self.jobs)} formats in {time.time() - self.start:.2f}s")
+        return {'FINISHED'} if done else {'CANCELLED'}
+    
+    def finish(self, context):
+        context.window_manager.event_timer_remove(self._timer)
+        self._timer = None
+        futures = [future for future, _ in self.jobs.values()]
+        snapshot = self.snapshot
+        deadline = time.time() + SNAPSHOT_CLEANUP_TIMEOUT
         
-        # Export based on format
-        if settings.export_format == 'OBJ':
-            bpy.ops.export_scene.obj(
-                filepath=model_file,
-                use_selection=True,
-                use_materials=settings.include_textures
-            )
-        elif settings.export_format == 'PLY':
-            bpy.ops.export_mesh.ply(
-                filepath=model_file,
-                use_selection=True
-            )
-        elif settings.export_format == 'GLB':
-            bpy.ops.export_scene.gltf(
-                filepath=model_file,
-                export_format='GLB',
-                use_selection=True
-            )
+        def remove_snapshot():
+            # Cancelled workers are killed asynchronously and may still hold the file open
+            try:
+                if all(future.done() for future in futures):
+                    if os.path.exists(snapshot):
+                        os.remove(snapshot)
+                    return None
+            except OSError:
+                pass
+            return 1.0 if time.time() < deadline else None
         
-        self.report({'INFO'}, f"Exported 3D model to {model_file}")
-        return {'FINISHED'}
+        if remove_snapshot() is not None:
+            bpy.app.timers.register(remove_snapshot, first_interval=1.0)
 
 def register():
     bpy.utils.register_class(DRONEVIDEO3D_OT_extract_frames)
     bpy.utils.register_class(DRONEVIDEO3D_OT_extract_gps)
+    bpy.utils.register_class(DRONEVIDEO3D_OT_follow_video)
     bpy.utils.register_class(DRONEVIDEO3D_OT_run_photogrammetry)
     bpy.utils.register_class(DRONEVIDEO3D_OT_import_model)
+    bpy.utils.register_class(DRONEVIDEO3D_OT_extract_region)
     bpy.utils.register_class(DRONEVIDEO3D_OT_visualize_gps)
+    bpy.utils.register_class(DRONEVIDEO3D_OT_show_flight_path)
     bpy.utils.register_class(DRONEVIDEO3D_OT_adjust_gps)
     bpy.utils.register_class(DRONEVIDEO3D_OT_export_georeferenced)
     bpy.utils.register_class(DRONEVIDEO3D_OT_export_model)
+    bpy.utils.register_class(DRONEVIDEO3D_OT_batch_export)
 
 def unregister():
+    shutdown_supervisor()
+    bpy.utils.unregister_class(DRONEVIDEO3D_OT_batch_export)
     bpy.utils.unregister_class(DRONEVIDEO3D_OT_export_model)
     bpy.utils.unregister_class(DRONEVIDEO3D_OT_export_georeferenced)
     bpy.utils.unregister_class(DRONEVIDEO3D_OT_adjust_gps)
+    bpy.utils.unregister_class(DRONEVIDEO3D_OT_show_flight_path)
     bpy.utils.unregister_class(DRONEVIDEO3D_OT_visualize_gps)
+    bpy.utils.unregister_class(DRONEVIDEO3D_OT_extract_region)
     bpy.utils.unregister_class(DRONEVIDEO3D_OT_import_model)
+    point_index.clear_indexes()
     bpy.utils.unregister_class(DRONEVIDEO3D_OT_run_photogrammetry)
+    bpy.utils.unregister_class(DRONEVIDEO3D_OT_follow_video)
     bpy.utils.unregister_class(DRONEVIDEO3D_OT_extract_gps)
     bpy.utils.unregister_class(DRONEVIDEO3D_OT_extract_frames)
@@ -41,6 +41,22 @@ class DroneVideo3DSettings(bpy.types.PropertyGroup):
         max=100
     )
     
+    live_batch_frames: IntProperty(
+        name="Live Batch Size",
+        description="New frames collected before they are registered into the live model",
+        default=20,
+        min=1,
+        max=1000
+    )
+    
+    live_idle_timeout: FloatProperty(
+        name="Live Idle Timeout (s)",
+        description="Stop following the video once it has not grown for this long",
+        default=30.0,
+        min=1.0,
+        max=3600.0
+    )
+    
     use_cuda: BoolProperty(
         name="Use CUDA Acceleration",
         description="Use GPU acceleration for processing",
@@ -57,6 +73,193 @@ class DroneVideo3DSettings(bpy.types.PropertyGroup):
         default='COLMAP'
     )
     
+    reconstruction_mode: EnumProperty(
+        name="Reconstruction Mode",
+        description="How to run sparse reconstruction for large flights",
+        items=[
+            ('SINGLE', "Single Model", "Reconstruct all frames in one COLMAP mapper run"),
+            ('CHUNKED', "Chunked", "Reconstruct overlapping GPS tiles in parallel and merge them")
+        ],
+        default='SINGLE'
+    )
+    
+    chunk_max_frames: IntProperty(
+        name="Frames per Tile",
+        description="Maximum number of frames reconstructed in one tile",
+        default=400,
+        min=20,
+        max=10000
+    )
+    
+    chunk_overlap: FloatProperty(
+        name="Tile Overlap",
+        description="Fraction of the tile size shared with neighbouring tiles",
+        default=0.15,
+        min=0.0,
+        max=1.0,
+        subtype='FACTOR'
+    )
+    
+    memory_budget_gb: FloatProperty(
+        name="Memory Budget (GB)",
+        description="Upper bound on memory used by concurrently running reconstruction processes",
+        default=16.0,
+        min=1.0,
+        max=1024.0
+    )
+    
+    use_feature_cache: BoolProperty(
+        name="Use Feature Cache",
+        description="Reuse features of identical frames from earlier runs and other projects on this machine",
+        default=True
+    )
+    
+    feature_cache_size_gb: FloatProperty(
+        name="Feature Cache Size (GB)",
+        description="Least recently used features are evicted once the cache grows beyond this size",
+        default=20.0,
+        min=0.1,
+        max=4096.0
+    )
+    
+    coarse_to_fine_matching: BoolProperty(
+        name="Coarse-to-Fine Matching",
+        description="Find overlapping frames on a cached low-resolution copy and match only those pairs at full resolution",
+        default=False
+    )
+    
+    coarse_image_size: IntProperty(
+        name="Coarse Image Size",
+        description="Longer side in pixels of the low-resolution pyramid level used to find overlapping frames",
+        default=1000,
+        min=200,
+        max=4000
+    )
+    
+    coarse_min_inliers: IntProperty(
+        name="Coarse Min Inliers",
+        description="Verified matches a coarse pair needs to be matched again at full resolution",
+        default=30,
+        min=5,
+        max=1000
+    )
+    
+    distributed_matching: BoolProperty(
+        name="Distributed Matching",
+        description="Shard feature matching into work units processed by worker processes on this and other nodes",
+        default=False
+    )
+    
+    matching_workers: IntProperty(
+        name="Local Match Workers",
+        description="Number of matching worker processes started on this machine",
+        default=2,
+        min=0,
+        max=64
+    )
+    
+    matching_unit_size: IntProperty(
+        name="Pairs per Work Unit",
+        description="Number of image pairs in one matching work unit",
+        default=2000,
+        min=10,
+        max=1000000
+    )
+    
+    matching_timeout: FloatProperty(
+        name="Matching Timeout (min)",
+        description="Give up distributed matching after this many minutes (0: no limit)",
+        default=720.0,
+        min=0.0,
+        max=100000.0
+    )
+    
+    matching_job_dir: StringProperty(
+        name="Shared Job Directory",
+        description="Directory on a shared filesystem that remote match workers can join (default: inside the output directory)",
+        default="",
+        subtype='DIR_PATH'
+    )
+    
+    use_region_of_interest: BoolProperty(
+        name="Region of Interest",
+        description="Only reconstruct frames that see a lat/lon polygon and crop the dense cloud to it",
+        default=False
+    )
+    
+    roi_polygon: StringProperty(
+        name="ROI Polygon",
+        description="GeoJSON polygon file, or 'lat, lon; lat, lon; ...' vertices of the region of interest",
+        default=""
+    )
+    
+    roi_camera_pitch: FloatProperty(
+        name="Camera Pitch",
+        description="Gimbal pitch of the camera in degrees (-90 looks straight down) used to find the frames that see the region",
+        default=-90.0,
+        min=-90.0,
+        max=0.0
+    )
+    
+    roi_margin: FloatProperty(
+        name="ROI Margin (m)",
+        description="Distance around the region of interest that is still reconstructed",
+        default=10.0,
+        min=0.0,
+        max=1000.0
+    )
+    
+    run_dense_reconstruction: BoolProperty(
+        name="Dense Reconstruction",
+        description="Run undistortion, stereo and fusion after the sparse model to produce fused.ply",
+        default=True
+    )
+    
+    dense_max_image_size: IntProperty(
+        name="Dense Image Size",
+        description="Maximum image dimension used for dense stereo and fusion",
+        default=2000,
+        min=256,
+        max=16384
+    )
+    
+    dense_num_threads: IntProperty(
+        name="Fusion Threads",
+        description="Number of threads used for depth map fusion (-1 uses all cores)",
+        default=-1,
+        min=-1,
+        max=256
+    )
+    
+    dense_cache_size_gb: FloatProperty(
+        name="Dense Cache (GB)",
+        description="Memory cache for images and depth maps during stereo and fusion",
+        default=8.0,
+        min=0.5,
+        max=1024.0
+    )
+    
+    dense_batch_size: IntProperty(
+        name="Stereo Batch Size",
+        description="Number of images processed per resumable stereo batch",
+        default=50,
+        min=1,
+        max=10000
+    )
+    
+    meshroom_path: StringProperty(
+        name="Meshroom Executable",
+        description="Path to meshroom_batch (default: $DRONEVIDEO3D_MESHROOM or meshroom_batch in PATH)",
+        default="",
+        subtype='FILE_PATH'
+    )
+    
+    meshroom_node_parallelism: StringProperty(
+        name="Meshroom Parallelism",
+        description="Chunks computed at once per node type, e.g. 'FeatureExtraction=4, DepthMap=1, *=2'",
+        default="FeatureExtraction=4, FeatureMatching=4, DepthMap=1, *=2"
+    )
+    
     # Additional GPS-related properties
     gps_fix_method: EnumProperty(
         name="GPS Fix Method",
@@ -69,17 +272,116 @@ class DroneVideo3DSettings(bpy.types.PropertyGroup):
         default='NONE'
     )
     
+    map_point_budget: IntProperty(
+        name="Map Point Budget",
+        description="Maximum number of points kept when simplifying the flight path for the map",
+        default=2000,
+        min=10,
+        max=100000
+    )
+    
+    camera_marker_size: FloatProperty(
+        name="Camera Marker Size",
+        description="Size of the camera pose markers shown along the flight path (scene units)",
+        default=1.0,
+        min=0.01,
+        max=100.0
+    )
+    
+    region_shape: EnumProperty(
+        name="Region Shape",
+        description="Shape of the point cloud region to extract",
+        items=[
+            ('BOX', "Box", "Bounding box of the active object"),
+            ('SPHERE', "Sphere", "Sphere around the 3D cursor"),
+            ('POLYGON', "Outline", "Top-view outline given by the vertices of the active object"),
+        ],
+        default='BOX'
+    )
+    
+    region_radius: FloatProperty(
+        name="Region Radius",
+        description="Radius of the sphere around the 3D cursor",
+        default=10.0,
+        min=0.01,
+        max=100000.0
+    )
+    
     export_format: EnumProperty(
         name="Export Format",
         description="Format for the final 3D model",
         items=[
             ('OBJ', "OBJ", "Wavefront OBJ format"),
             ('PLY', "PLY", "Stanford PLY format"),
-            ('GLB', "GLB", "Binary glTF format")
+            ('GLB', "GLB", "Binary glTF format"),
+            ('TILES', "3D Tiles", "Hierarchical glTF tiles with a tileset.json for streaming in web viewers")
         ],
         default='OBJ'
     )
     
+    tile_max_faces: IntProperty(
+        name="Faces per Tile",
+        description="Maximum number of triangles in a full-resolution tile",
+        default=100000,
+        min=1000,
+        max=10000000
+    )
+    
+    tile_workers: IntProperty(
+        name="Tile Workers",
+        description="Worker processes building tiles (0 = one per CPU core minus one)",
+        default=0,
+        min=0,
+        max=256
+    )
+    
+    compact_export: BoolProperty(
+        name="Compact Vertex Encoding",
+        description="Quantize positions to 16 bits and normals to 8 bits and reorder triangles for faster loading (GLB and 3D Tiles)",
+        default=True
+    )
+    
+    export_lods: BoolProperty(
+        name="Generate LODs",
+        description="Also write simplified levels of detail next to the model as drone_model_lod<N> files",
+        default=False
+    )
+    
+    lod_levels: IntProperty(
+        name="LOD Levels",
+        description="Number of simplified levels written after the full-resolution model",
+        default=3,
+        min=1,
+        max=8
+    )
+    
+    lod_reduction: FloatProperty(
+        name="LOD Reduction",
+        description="Each level keeps this many times fewer faces than the previous one",
+        default=4.0,
+        min=1.5,
+        max=100.0
+    )
+    
+    batch_export_formats: EnumProperty(
+        name="Batch Formats",
+        description="Formats written by Batch Export, each in its own background Blender process",
+        items=[
+            ('OBJ', "OBJ", "Wavefront OBJ format"),
+            ('PLY', "PLY", "Stanford PLY format"),
+            ('GLB', "GLB", "Binary glTF format"),
+            ('TILES', "3D Tiles", "Hierarchical glTF tiles with a tileset.json")
+        ],
+        options={'ENUM_FLAG'},
+        default={'OBJ', 'PLY', 'GLB'}
+    )
+    
+    batch_georeferenced: BoolProperty(
+        name="Georeferenced Batch",
+        description="Write batch-exported tiles in the local ENU frame and the georeferencing sidecar",
+        default=True
+    )
+    
     include_textures: BoolProperty(
         name="Include Textures",
         description="Include textures in the exported model",
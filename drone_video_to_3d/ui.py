@@ -26,6 +26,39 @@ class DRONEVIDEO3D_PT_main_panel(Panel):
         box.prop(settings, "frame_extraction_rate")
         box.prop(settings, "use_cuda")
         box.prop(settings, "photogrammetry_pipeline")
+        if settings.photogrammetry_pipeline == 'COLMAP':
+            box.prop(settings, "reconstruction_mode")
+            if settings.reconstruction_mode == 'CHUNKED':
+                box.prop(settings, "chunk_max_frames")
+                box.prop(settings, "chunk_overlap")
+                box.prop(settings, "memory_budget_gb")
+            box.prop(settings, "use_feature_cache")
+            if settings.use_feature_cache:
+                box.prop(settings, "feature_cache_size_gb")
+            box.prop(settings, "coarse_to_fine_matching")
+            if settings.coarse_to_fine_matching:
+                box.prop(settings, "coarse_image_size")
+                box.prop(settings, "coarse_min_inliers")
+            box.prop(settings, "distributed_matching")
+            if settings.distributed_matching:
+                box.prop(settings, "matching_workers")
+                box.prop(settings, "matching_unit_size")
+                box.prop(settings, "matching_timeout")
+                box.prop(settings, "matching_job_dir")
+            box.prop(settings, "use_region_of_interest")
+            if settings.use_region_of_interest:
+                box.prop(settings, "roi_polygon")
+                box.prop(settings, "roi_camera_pitch")
+                box.prop(settings, "roi_margin")
+            box.prop(settings, "run_dense_reconstruction")
+            if settings.run_dense_reconstruction:
+                box.prop(settings, "dense_max_image_size")
+                box.prop(settings, "dense_num_threads")
+                box.prop(settings, "dense_cache_size_gb")
+                box.prop(settings, "dense_batch_size")
+        else:
+            box.prop(settings, "meshroom_path")
+            box.prop(settings, "meshroom_node_parallelism")
         
         # Operation buttons
         layout.separator()
@@ -34,7 +67,17 @@ class DRONEVIDEO3D_PT_main_panel(Panel):
         col.operator("dronevideo3d.extract_gps", text="Extract GPS Metadata")
         col.operator("dronevideo3d.run_photogrammetry", text="Run Photogrammetry")
         layout.separator()
+        box = layout.box()
+        box.label(text="Live Follow")
+        box.prop(settings, "live_batch_frames")
+        box.prop(settings, "live_idle_timeout")
+        box.operator("dronevideo3d.follow_video", text="Follow Growing Video")
+        layout.separator()
         layout.operator("dronevideo3d.import_model", text="Import 3D Model")
+        layout.prop(settings, "region_shape")
+        if settings.region_shape == 'SPHERE':
+            layout.prop(settings, "region_radius")
+        layout.operator("dronevideo3d.extract_region", text="Extract Point Cloud Region")
 
 class DRONEVIDEO3D_PT_georeferencing_panel(Panel):
     bl_label = "Georeferencing"
@@ -51,7 +94,10 @@ class DRONEVIDEO3D_PT_georeferencing_panel(Panel):
         
         layout.prop(settings, "gps_fix_method")
         layout.label(text="GPS Data Visualization")
+        layout.prop(settings, "map_point_budget")
         layout.operator("dronevideo3d.visualize_gps", text="Show GPS Path on Map")
+        layout.prop(settings, "camera_marker_size")
+        layout.operator("dronevideo3d.show_flight_path", text="Show Flight Path in Scene")
         layout.operator("dronevideo3d.adjust_gps", text="Manually Adjust GPS Poses")
         layout.separator()
         layout.operator("dronevideo3d.export_georeferenced", text="Export Georeferenced Model")
@@ -70,10 +116,25 @@ class DRONEVIDEO3D_PT_export_panel(Panel):
         settings = context.scene.drone_video_3d
         
         layout.prop(settings, "export_format")
+        if settings.export_format == 'TILES':
+            layout.prop(settings, "tile_max_faces")
+            layout.prop(settings, "tile_workers")
+        if settings.export_format in ('PLY', 'GLB', 'TILES'):
+            layout.prop(settings, "compact_export")
+        if settings.export_format in ('PLY', 'GLB'):
+            layout.prop(settings, "export_lods")
+            if settings.export_lods:
+                layout.prop(settings, "lod_levels")
+                layout.prop(settings, "lod_reduction")
         layout.prop(settings, "include_textures")
         layout.prop(settings, "include_geo_metadata")
         layout.separator()
         layout.operator("dronevideo3d.export_model", text="Export 3D Model")
+        layout.separator()
+        layout.label(text="Batch Export:")
+        layout.prop(settings, "batch_export_formats")
+        layout.prop(settings, "batch_georeferenced")
+        layout.operator("dronevideo3d.batch_export", text="Export All Formats in Background")
 
 def register():
     bpy.utils.register_class(DRONEVIDEO3D_PT_main_panel)
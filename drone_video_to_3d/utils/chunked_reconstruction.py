@@ -0,0 +1,332 @@
+import os
+import hashlib
+import shutil
+import struct
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+
+from . import colmap_db
+from . import feature_cache
+from . import trajectory
+from .process_supervisor import run_tool
+from .pipeline_manifest import optional_stage, stage_token
+
+# Rough peak resident memory of feature matching plus mapping per frame megapixel in a tile
+MEMORY_PER_MEGAPIXEL_MB = 4.0
+# Frame size assumed when it cannot be read (1080p)
+DEFAULT_FRAME_MEGAPIXELS = 1920 * 1080 / 1e6
+
+def local_plane_coordinates(positions):
+    """Project ECEF positions onto the best-fit plane of the flight (2D, metres)"""
+    positions = np.asarray(positions, dtype=np.float64)
+    centered = positions - positions.mean(axis=0)
+    if len(centered) < 3:
+        return centered[:, :2]
+    # The two dominant principal axes span the ground plane of a survey flight
+    _, _, vt = np.linalg.svd(centered, full_matrices=False)
+    return centered @ vt[:2].T
+
+def partition_frames(positions, max_frames_per_tile=400, overlap=0.15):
+    """Split frames into overlapping spatial tiles and return a list of index arrays
+
+    Tiles are found by recursively bisecting the flight along its longest
+    extent, which keeps corridor flights as a chain of tiles instead of a
+    sparse grid. Each tile is then grown by overlap (a fraction of its size)
+    so neighbouring sub-models share the frames needed to merge them.
+    """
+    coords = local_plane_coordinates(positions)
+    indices = np.arange(len(coords))
+    leaves = []
+    stack = [indices]
+    while stack:
+        tile = stack.pop()
+        if len(tile) <= max_frames_per_tile:
+            leaves.append(tile)
+            continue
+        extent = coords[tile].max(axis=0) - coords[tile].min(axis=0)
+        axis = int(np.argmax(extent))
+        order = tile[np.argsort(coords[tile, axis], kind='stable')]
+        half = len(order) // 2
+        stack.append(order[:half])
+        stack.append(order[half:])
+
+    tiles = []
+    for tile in leaves:
+        lower = coords[tile].min(axis=0)
+        upper = coords[tile].max(axis=0)
+        margin = np.maximum((upper - lower) * overlap, 1e-6)
+        inside = np.all((coords >= lower - margin) & (coords <= upper + margin), axis=1)
+        tiles.append(np.flatnonzero(inside))
+    return tiles
+
+def frame_megapixels(frames_dir, names):
+    """Return the size of the extracted frames in megapixels, read from the first frame's header"""
+    for name in names[:1]:
+        try:
+            width, height = colmap_db.read_png_size(os.path.join(frames_dir, name))
+        except (OSError, ValueError):
+            break
+        return width * height / 1e6
+    return DEFAULT_FRAME_MEGAPIXELS
+
+def plan_workers(tiles, memory_budget_gb, cpu_count=None, megapixels=DEFAULT_FRAME_MEGAPIXELS):
+    """Return (parallel tiles, threads per tile) that fit the memory budget
+
+    Features, matches and mapper observations all grow with the number of
+    pixels per frame, so a tile's memory is estimated from its frame count
+    times the frame size in megapixels.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    largest = max((len(t) for t in tiles), default=1)
+    tile_memory_gb = largest * megapixels * MEMORY_PER_MEGAPIXEL_MB / 1024.0
+    workers = int(memory_budget_gb // tile_memory_gb) if tile_memory_gb > 0 else cpu_count
+    workers = max(1, min(workers, cpu_count, len(tiles)))
+    return workers, max(1, cpu_count // workers)
+
+def largest_model(sparse_dir):
+    """Return the sub-directory of a mapper output holding the most images"""
+    best, best_size = None, -1
+    if not os.path.isdir(sparse_dir):
+        return None
+    for entry in os.listdir(sparse_dir):
+        images_bin = os.path.join(sparse_dir, entry, "images.bin")
+        if os.path.exists(images_bin) and os.path.getsize(images_bin) > best_size:
+            best, best_size = os.path.join(sparse_dir, entry), os.path.getsize(images_bin)
+    return best
+
+def registered_images(model_dir):
+    """Return the set of image names registered in a binary COLMAP model (images.bin)"""
+    names = set()
+    with open(os.path.join(model_dir, "images.bin"), 'rb') as f:
+        data = f.read()
+    (count,), offset = struct.unpack_from("<Q", data), 8
+    for _ in range(count):
+        # image_id, qvec, tvec and camera_id precede the null-terminated name
+        offset += 4 + 7 * 8 + 4
+        end = data.index(b"\0", offset)
+        names.add(data[offset:end].decode("utf-8"))
+        (num_points,) = struct.unpack_from("<Q", data, end + 1)
+        offset = end + 1 + 8 + num_points * 24
+    return names
+
+def align_model(model_dir, output_dir, names, positions, origin):
+    """Align a sparse model to ECEF camera positions, expressed relative to origin
+
+    The result is metric and GPS-aligned, with origin at its zero (see
+    trajectory.model_frame); the caller records origin with
+    trajectory.write_model_origin.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    ref_images = os.path.join(output_dir, "ref_images.txt")
+    with open(ref_images, 'w') as f:
+        for name, (x, y, z) in zip(names, np.asarray(positions) - origin):
+            f.write(f"{name} {x:.6f} {y:.6f} {z:.6f}\n")
+    run_tool([
+        "colmap", "model_aligner",
+        "--input_path", model_dir,
+        "--output_path", output_dir,
+        "--ref_images_path", ref_images,
+        "--ref_is_gps", "0",
+        "--robust_alignment_max_error", "3.0"
+    ])
+    if not os.path.exists(os.path.join(output_dir, "images.bin")):
+        raise RuntimeError("model_aligner found too few GPS positions to align the model")
+    return output_dir
+
+def reconstruct_tile(tile_dir, frames_dir, gps_csv, frame_names, ref_positions, use_cuda=True, num_threads=1,
+                     cache_size_gb=0.0):
+    """Run extraction, matching, mapping and GPS alignment for one tile
+
+    Every step is its own COLMAP process, so each tile's peak memory is
+    released as soon as it finishes. With cache_size_gb set, features come
+    from the shared feature cache where possible, which also lets frames in
+    the overlap of two tiles be extracted only once.
+    """
+    os.makedirs(tile_dir, exist_ok=True)
+    db_path = os.path.join(tile_dir, "database.db")
+    sparse_dir = os.path.join(tile_dir, "sparse")
+    aligned_dir = os.path.join(tile_dir, "aligned")
+    os.makedirs(sparse_dir, exist_ok=True)
+    os.makedirs(aligned_dir, exist_ok=True)
+
+    image_list = os.path.join(tile_dir, "image_list.txt")
+    with open(image_list, 'w') as f:
+        f.write("\n".join(frame_names) + "\n")
+
+    if not colmap_db.prepare_database(db_path, frames_dir, gps_csv, frame_names=frame_names):
+        raise RuntimeError("Could not prepare the tile database")
+
+    gpu = "1" if use_cuda else "0"
+    threads = str(num_threads)
+    feature_cmd = [
+        "colmap", "feature_extractor",
+        "--database_path", db_path,
+        "--image_path", frames_dir,
+        "--ImageReader.single_camera", "1",
+        "--ImageReader.camera_model", "OPENCV",
+        "--SiftExtraction.use_gpu", gpu,
+        "--SiftExtraction.num_threads", threads
+    ]
+    params = feature_cache.extraction_params(use_cuda)
+    if cache_size_gb:
+        with feature_cache.FeatureCache(max_size_bytes=int(cache_size_gb * 1024 ** 3)) as cache:
+            feature_cache.run_cached_extraction(db_path, frames_dir, feature_cmd, params, cache)
+    else:
+        feature_cache.run_cached_extraction(db_path, frames_dir, feature_cmd, params)
+    run_tool([
+        "colmap", "exhaustive_matcher",
+        "--database_path", db_path,
+        "--SiftMatching.use_gpu", gpu,
+        "--SiftMatching.num_threads", threads
+    ])
+    run_tool([
+        "colmap", "mapper",
+        "--database_path", db_path,
+        "--image_path", frames_dir,
+        "--image_list_path", image_list,
+        "--output_path", sparse_dir,
+        "--Mapper.num_threads", threads
+    ])
+
+    model_dir = largest_model(sparse_dir)
+    if model_dir is None:
+        return None
+
+    # Bring every sub-model into the same local metric frame before merging
+    return align_model(model_dir, aligned_dir, frame_names, ref_positions, np.zeros(3))
+
+def reconstruct_tile_checkpointed(manifest, index, tile_dir, frames_dir, gps_csv, frame_names, ref_positions,
+                                  use_cuda=True, num_threads=1, cache_size_gb=0.0):
+    """reconstruct_tile wrapped in a manifest stage so finished tiles are reused"""
+    aligned_dir = os.path.join(tile_dir, "aligned")
+    positions_key = hashlib.sha1(np.round(ref_positions, 3).tobytes()).hexdigest()
+    inputs = {"frames": frame_names, "positions": positions_key, "use_cuda": use_cuda}
+    with optional_stage(manifest, f"chunk.tile_{index:03d}", inputs, [os.path.join(aligned_dir, "images.bin")]) as run:
+        if not run:
+            return aligned_dir
+        model_dir = reconstruct_tile(tile_dir, frames_dir, gps_csv, frame_names, ref_positions, use_cuda, num_threads,
+                                     cache_size_gb)
+        if model_dir is None:
+            raise RuntimeError("Tile produced no model")
+        return model_dir
+
+def merge_models(model_dirs, output_dir, work_dir, log=print):
+    """Merge aligned sub-models into output_dir, joining only models that share registered images
+
+    model_merger estimates the transformation between two models from their
+    common images, so each model is merged into the growing model only once
+    it shares images with it; otherwise a missing tile in the middle of a
+    corridor makes the merge fail. Models that never connect, or whose merge
+    fails, form separate groups. The group with the most registered images
+    is written to output_dir and the others are reported through log.
+    """
+    remaining = [(model_dir, registered_images(model_dir)) for model_dir in model_dirs]
+    groups = []
+    step = 0
+    while remaining:
+        merged, merged_names = remaining.pop(0)
+        members = 1
+        deferred = []
+        while True:
+            candidate = next((entry for entry in remaining if entry[1] & merged_names), None)
+            if candidate is None:
+                break
+            remaining.remove(candidate)
+            step += 1
+            step_dir = os.path.join(work_dir, f"merge_{step:03d}")
+            os.makedirs(step_dir, exist_ok=True)
+            try:
+                run_tool([
+                    "colmap", "model_merger",
+                    "--input_path1", merged,
+                    "--input_path2", candidate[0],
+                    "--output_path", step_dir
+                ])
+            except subprocess.CalledProcessError as e:
+                log(f"Could not merge {candidate[0]}: {e}")
+                deferred.append(candidate)
+                continue
+            merged, merged_names = step_dir, registered_images(step_dir)
+            members += 1
+        groups.append((merged, merged_names, members))
+        # A model that failed to merge here starts a group of its own
+        remaining = deferred + remaining
+
+    groups.sort(key=lambda group: len(group[1]), reverse=True)
+    merged = groups[0][0]
+    for model_dir, names, members in groups[1:]:
+        log(f"Skipping {members} sub-model(s) with {len(names)} images that share no images with the main model "
+            f"({model_dir})")
+
+    os.makedirs(output_dir, exist_ok=True)
+    for file_name in os.listdir(merged):
+        shutil.copy2(os.path.join(merged, file_name), os.path.join(output_dir, file_name))
+    return output_dir
+
+def run_chunked_reconstruction(frames_dir, gps_csv, photo_dir, use_cuda=True, max_frames_per_tile=400,
+                               overlap=0.15, memory_budget_gb=16.0, log=print, manifest=None, cache_size_gb=0.0):
+    """Reconstruct a large flight as GPS tiles in parallel and merge them into sparse/0
+
+    The merged model is expressed in a local metric frame centred on the
+    flight; its ECEF origin is written to chunk_origin.txt
+    (trajectory.MODEL_ORIGIN_FILE).
+    """
+    names, positions = colmap_db.read_gps_poses_csv(gps_csv)
+    available = set(colmap_db.list_frames(frames_dir))
+    keep = [i for i, name in enumerate(names) if name in available]
+    names = [names[i] for i in keep]
+    positions = positions[keep]
+    if not names:
+        raise RuntimeError("No extracted frames have GPS positions")
+
+    origin = positions.mean(axis=0)
+    local_positions = positions - origin
+
+    chunks_dir = os.path.join(photo_dir, "chunks")
+    os.makedirs(chunks_dir, exist_ok=True)
+    trajectory.write_model_origin(photo_dir, origin)
+
+    tiles = partition_frames(positions, max_frames_per_tile, overlap)
+    workers, threads = plan_workers(tiles, memory_budget_gb, megapixels=frame_megapixels(frames_dir, names))
+    log(f"Reconstructing {len(names)} frames as {len(tiles)} tiles, {workers} in parallel with {threads} threads each")
+
+    model_dirs = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                reconstruct_tile_checkpointed,
+                manifest,
+                i,
+                os.path.join(chunks_dir, f"tile_{i:03d}"),
+                frames_dir,
+                gps_csv,
+                [names[j] for j in tile],
+                local_positions[tile],
+                use_cuda,
+                threads,
+                cache_size_gb
+            ): i
+            for i, tile in enumerate(tiles)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                model_dir = future.result()
+            except (subprocess.CalledProcessError, RuntimeError) as e:
+                log(f"Tile {i} failed: {e}")
+                continue
+            model_dirs[i] = model_dir
+            log(f"Tile {i} reconstructed ({len(model_dirs)}/{len(tiles)})")
+
+    if not model_dirs:
+        raise RuntimeError("No tile could be reconstructed")
+
+    # Merge in tile order so neighbouring tiles are tried first
+    ordered = [model_dirs[i] for i in sorted(model_dirs)]
+    output_dir = os.path.join(photo_dir, "sparse", "0")
+    inputs = {"tiles": [stage_token(manifest, f"chunk.tile_{i:03d}") for i in sorted(model_dirs)]}
+    with optional_stage(manifest, "chunk.merge", inputs, [os.path.join(output_dir, "images.bin")]) as run:
+        if run:
+            merge_models(ordered, output_dir, chunks_dir, log)
+    return output_dir
@@ -0,0 +1,378 @@
+import os
+import csv
+import struct
+import sqlite3
+import numpy as np
+
+from .process_supervisor import run_tool
+
+# COLMAP encodes an unordered image pair as a single integer key
+MAX_IMAGE_ID = 2147483647
+
+# COLMAP camera model ids and their parameter counts
+CAMERA_MODELS = {
+    "SIMPLE_PINHOLE": (0, 3),
+    "PINHOLE": (1, 4),
+    "SIMPLE_RADIAL": (2, 4),
+    "RADIAL": (3, 5),
+    "OPENCV": (4, 8),
+}
+
+# Coordinate systems understood by the pose_priors table
+COORDINATE_SYSTEM_UNDEFINED = -1
+COORDINATE_SYSTEM_WGS84 = 0
+COORDINATE_SYSTEM_CARTESIAN = 1
+
+# Pipeline databases are created by `colmap database_creator` and only the
+# tables and columns found in them are written. COLMAP 3.8 and 3.9 keep
+# position priors in the images table, 3.10 and 3.11 in pose_priors; 3.12
+# reorganised the database around rigs and frames and is refused.
+SUPPORTED_COLMAP_VERSIONS = "3.8 to 3.11"
+
+# Tables every supported COLMAP database has
+REQUIRED_TABLES = ("cameras", "images", "keypoints", "descriptors", "matches", "two_view_geometries")
+
+# Tables that only exist in the rig and frame layout of COLMAP 3.12 and newer
+RIG_LAYOUT_TABLES = ("rigs", "frames")
+
+# Columns holding position priors: pose_priors in COLMAP 3.10/3.11, images in 3.8/3.9
+POSE_PRIOR_COLUMNS = {"image_id", "position", "coordinate_system", "position_covariance"}
+IMAGE_PRIOR_COLUMNS = {"prior_tx", "prior_ty", "prior_tz"}
+
+# COLMAP 3.10/3.11 layout, used only for databases created without COLMAP
+CREATE_TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS cameras (
+    camera_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    model INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    params BLOB,
+    prior_focal_length INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS images (
+    image_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    name TEXT NOT NULL UNIQUE,
+    camera_id INTEGER NOT NULL,
+    CONSTRAINT image_id_check CHECK(image_id >= 0 and image_id < 2147483647),
+    FOREIGN KEY(camera_id) REFERENCES cameras(camera_id));
+CREATE TABLE IF NOT EXISTS pose_priors (
+    image_id INTEGER PRIMARY KEY NOT NULL,
+    position BLOB,
+    coordinate_system INTEGER NOT NULL,
+    position_covariance BLOB,
+    FOREIGN KEY(image_id) REFERENCES images(image_id) ON DELETE CASCADE);
+CREATE TABLE IF NOT EXISTS keypoints (
+    image_id INTEGER PRIMARY KEY NOT NULL,
+    rows INTEGER NOT NULL,
+    cols INTEGER NOT NULL,
+    data BLOB,
+    FOREIGN KEY(image_id) REFERENCES images(image_id) ON DELETE CASCADE);
+CREATE TABLE IF NOT EXISTS descriptors (
+    image_id INTEGER PRIMARY KEY NOT NULL,
+    rows INTEGER NOT NULL,
+    cols INTEGER NOT NULL,
+    data BLOB,
+    FOREIGN KEY(image_id) REFERENCES images(image_id) ON DELETE CASCADE);
+CREATE TABLE IF NOT EXISTS matches (
+    pair_id INTEGER PRIMARY KEY NOT NULL,
+    rows INTEGER NOT NULL,
+    cols INTEGER NOT NULL,
+    data BLOB);
+CREATE TABLE IF NOT EXISTS two_view_geometries (
+    pair_id INTEGER PRIMARY KEY NOT NULL,
+    rows INTEGER NOT NULL,
+    cols INTEGER NOT NULL,
+    data BLOB,
+    config INTEGER NOT NULL,
+    F BLOB,
+    E BLOB,
+    H BLOB,
+    qvec BLOB,
+    tvec BLOB);
+CREATE UNIQUE INDEX IF NOT EXISTS index_name ON images(name);
+"""
+
+def image_ids_to_pair_id(image_id1, image_id2):
+    """Encode two image ids (scalars or arrays) as COLMAP pair ids"""
+    image_id1 = np.asarray(image_id1, dtype=np.int64)
+    image_id2 = np.asarray(image_id2, dtype=np.int64)
+    low = np.minimum(image_id1, image_id2)
+    high = np.maximum(image_id1, image_id2)
+    return low * MAX_IMAGE_ID + high
+
+def pair_id_to_image_ids(pair_id):
+    """Decode COLMAP pair ids (scalars or arrays) into two image id arrays"""
+    pair_id = np.asarray(pair_id, dtype=np.int64)
+    image_id2 = pair_id % MAX_IMAGE_ID
+    image_id1 = (pair_id - image_id2) // MAX_IMAGE_ID
+    return image_id1, image_id2
+
+def create_database(db_path):
+    """Let COLMAP create an empty database with its own schema, unless db_path already exists"""
+    if not os.path.exists(db_path):
+        run_tool(["colmap", "database_creator", "--database_path", db_path])
+
+def connect(db_path):
+    """Open a COLMAP database in WAL mode and check that its layout is supported
+
+    A database without any tables gets the COLMAP 3.10/3.11 layout of
+    CREATE_TABLES_SQL; otherwise the schema is left as COLMAP wrote it.
+    """
+    connection = sqlite3.connect(db_path)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        if not table_names(connection):
+            connection.executescript(CREATE_TABLES_SQL)
+        check_schema(connection)
+    except Exception:
+        connection.close()
+        raise
+    return connection
+
+def table_names(connection):
+    """Return the set of tables in a database"""
+    return {name for (name,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+def table_columns(connection, table):
+    """Return the set of column names of a table, empty if it does not exist"""
+    return {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+
+def check_schema(connection):
+    """Raise RuntimeError unless the database has a layout of a supported COLMAP version"""
+    tables = table_names(connection)
+    if tables.intersection(RIG_LAYOUT_TABLES):
+        raise RuntimeError("The COLMAP database uses the rig and frame layout of COLMAP 3.12 or newer; "
+                           f"supported COLMAP versions are {SUPPORTED_COLMAP_VERSIONS}")
+    missing = [table for table in REQUIRED_TABLES if table not in tables]
+    if missing:
+        raise RuntimeError(f"Not a COLMAP database, missing tables: {', '.join(missing)}")
+
+def read_png_size(image_path):
+    """Read width and height from a PNG header without decoding the image"""
+    with open(image_path, 'rb') as f:
+        header = f.read(24)
+    if len(header) < 24 or header[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError(f"Not a PNG file: {image_path}")
+    return struct.unpack('>II', header[16:24])
+
+def default_camera_params(model, width, height, focal_length=None):
+    """Build a COLMAP parameter vector with a focal length prior"""
+    if focal_length is None:
+        # Same heuristic COLMAP uses when no EXIF focal length is present
+        focal_length = 1.2 * max(width, height)
+    cx, cy = width / 2.0, height / 2.0
+    _, num_params = CAMERA_MODELS[model]
+    if model == "SIMPLE_PINHOLE":
+        params = [focal_length, cx, cy]
+    elif model in ("SIMPLE_RADIAL", "RADIAL"):
+        params = [focal_length, cx, cy] + [0.0] * (num_params - 3)
+    else:
+        params = [focal_length, focal_length, cx, cy] + [0.0] * (num_params - 4)
+    return np.asarray(params, dtype=np.float64)
+
+def insert_cameras(connection, cameras):
+    """Bulk insert cameras given as (model, width, height, params, prior_focal_length) tuples"""
+    rows = [
+        (CAMERA_MODELS[model][0], int(width), int(height),
+         np.asarray(params, dtype=np.float64).tobytes(), int(bool(prior)))
+        for model, width, height, params, prior in cameras
+    ]
+    first_id = _next_id(connection, "cameras", "camera_id")
+    connection.executemany(
+        "INSERT INTO cameras (model, width, height, params, prior_focal_length) VALUES (?, ?, ?, ?, ?)",
+        rows
+    )
+    return list(range(first_id, first_id + len(rows)))
+
+def insert_images(connection, names, camera_ids, image_ids=None):
+    """Bulk insert images and return a name -> image_id mapping for every name
+
+    Explicit image_ids keep ids consistent between several databases that
+    hold subsets of the same frames.
+    """
+    if np.isscalar(camera_ids):
+        camera_ids = [camera_ids] * len(names)
+    camera_ids = (int(c) for c in camera_ids)
+    if image_ids is None:
+        connection.executemany(
+            "INSERT OR IGNORE INTO images (name, camera_id) VALUES (?, ?)",
+            zip(names, camera_ids)
+        )
+    else:
+        connection.executemany(
+            "INSERT OR IGNORE INTO images (image_id, name, camera_id) VALUES (?, ?, ?)",
+            zip((int(i) for i in image_ids), names, camera_ids)
+        )
+    return read_image_ids(connection)
+
+def insert_pose_priors(connection, image_ids, positions, coordinate_system=COORDINATE_SYSTEM_CARTESIAN, covariances=None):
+    """Bulk insert (or replace) position priors for the given image ids
+
+    COLMAP 3.10 and 3.11 store them in pose_priors; 3.8 and 3.9 only have
+    the prior_tx/ty/tz columns of the images table, which hold the position
+    without coordinate system or covariance.
+    """
+    positions = np.ascontiguousarray(positions, dtype=np.float64).reshape(-1, 3)
+    if not POSE_PRIOR_COLUMNS <= table_columns(connection, "pose_priors"):
+        if not IMAGE_PRIOR_COLUMNS <= table_columns(connection, "images"):
+            raise RuntimeError("The COLMAP database has no columns for position priors; "
+                               f"supported COLMAP versions are {SUPPORTED_COLMAP_VERSIONS}")
+        connection.executemany(
+            "UPDATE images SET prior_tx = ?, prior_ty = ?, prior_tz = ? WHERE image_id = ?",
+            ((x, y, z, int(image_id)) for (x, y, z), image_id in zip(positions.tolist(), image_ids))
+        )
+        return
+    if covariances is None:
+        # COLMAP treats a NaN covariance as "unknown"
+        covariances = np.full((len(positions), 3, 3), np.nan)
+    covariances = np.ascontiguousarray(covariances, dtype=np.float64).reshape(-1, 3, 3)
+    rows = (
+        (int(image_id), positions[i].tobytes(), coordinate_system, covariances[i].tobytes())
+        for i, image_id in enumerate(image_ids)
+    )
+    connection.executemany(
+        "INSERT OR REPLACE INTO pose_priors (image_id, position, coordinate_system, position_covariance) "
+        "VALUES (?, ?, ?, ?)",
+        rows
+    )
+
+def insert_features(connection, rows):
+    """Bulk insert keypoints and descriptors
+
+    rows yields (image_id, keypoint_rows, keypoint_cols, keypoint_blob,
+    descriptor_rows, descriptor_cols, descriptor_blob) with the blobs in
+    COLMAP's layout (float32 keypoints, uint8 descriptors, row-major).
+    """
+    rows = list(rows)
+    connection.executemany(
+        "INSERT OR REPLACE INTO keypoints (image_id, rows, cols, data) VALUES (?, ?, ?, ?)",
+        ((r[0], r[1], r[2], r[3]) for r in rows)
+    )
+    connection.executemany(
+        "INSERT OR REPLACE INTO descriptors (image_id, rows, cols, data) VALUES (?, ?, ?, ?)",
+        ((r[0], r[4], r[5], r[6]) for r in rows)
+    )
+
+def read_features(connection, image_ids=None):
+    """Yield feature rows in the layout accepted by insert_features"""
+    query = (
+        "SELECT k.image_id, k.rows, k.cols, k.data, d.rows, d.cols, d.data "
+        "FROM keypoints k JOIN descriptors d ON k.image_id = d.image_id"
+    )
+    if image_ids is None:
+        yield from connection.execute(query)
+        return
+    for image_id in image_ids:
+        yield from connection.execute(query + " WHERE k.image_id = ?", (int(image_id),))
+
+def read_image_ids_with_features(connection):
+    """Return the set of image ids that already have keypoints and descriptors"""
+    return {
+        image_id for (image_id,) in connection.execute(
+            "SELECT k.image_id FROM keypoints k JOIN descriptors d ON k.image_id = d.image_id"
+        )
+    }
+
+def read_image_ids(connection):
+    """Return a name -> image_id mapping for all images in the database"""
+    return dict(connection.execute("SELECT name, image_id FROM images"))
+
+def read_keypoint_counts(db_path):
+    """Return (image_ids, keypoint_counts) arrays for every image with keypoints"""
+    connection = connect(db_path)
+    try:
+        rows = np.array(
+            connection.execute("SELECT image_id, rows FROM keypoints ORDER BY image_id").fetchall(),
+            dtype=np.int64
+        ).reshape(-1, 2)
+    finally:
+        connection.close()
+    return rows[:, 0], rows[:, 1]
+
+def read_match_counts(db_path, verified=False):
+    """Return (image_ids1, image_ids2, match_counts) arrays for all matched pairs
+
+    With verified=True the counts are the geometrically verified inliers from
+    two_view_geometries instead of the raw descriptor matches.
+    """
+    table = "two_view_geometries" if verified else "matches"
+    connection = connect(db_path)
+    try:
+        rows = np.array(
+            connection.execute(f"SELECT pair_id, rows FROM {table} WHERE rows > 0 ORDER BY pair_id").fetchall(),
+            dtype=np.int64
+        ).reshape(-1, 2)
+    finally:
+        connection.close()
+    image_ids1, image_ids2 = pair_id_to_image_ids(rows[:, 0])
+    return image_ids1, image_ids2, rows[:, 1]
+
+def list_frames(frames_dir):
+    """Return the sorted PNG frame names in frames_dir"""
+    return sorted(f for f in os.listdir(frames_dir) if f.lower().endswith(".png"))
+
+def read_gps_poses_csv(gps_csv):
+    """Read frame names and ECEF positions from a gps_poses.csv file"""
+    names = []
+    positions = []
+    with open(gps_csv, 'r', newline='') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            names.append(row["frame"])
+            positions.append((float(row["x"]), float(row["y"]), float(row["z"])))
+    return names, np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+
+def prepare_database(db_path, frames_dir, gps_csv=None, camera_model="OPENCV", focal_length=None, frame_names=None):
+    """Write the shared camera, all frames and their GPS position priors in one transaction
+
+    A new database is created by COLMAP itself (see create_database).
+    COLMAP's feature extractor reuses images that already exist in the
+    database, so populating it up front fixes the image-to-camera assignment
+    and makes the priors available to the matcher and mapper. Image ids follow
+    the sorted order of all frames in frames_dir, so databases prepared for a
+    subset of frame_names agree on ids with the full database.
+    """
+    try:
+        all_frames = list_frames(frames_dir)
+        if frame_names is None:
+            frame_names = all_frames
+        frame_index = {name: i + 1 for i, name in enumerate(all_frames)}
+        frame_names = sorted(name for name in frame_names if name in frame_index)
+        if not frame_names:
+            return False
+
+        width, height = read_png_size(os.path.join(frames_dir, frame_names[0]))
+        params = default_camera_params(camera_model, width, height, focal_length)
+
+        create_database(db_path)
+        connection = connect(db_path)
+        try:
+            with connection:
+                camera_ids = [c for (c,) in connection.execute("SELECT camera_id FROM cameras LIMIT 1")]
+                if not camera_ids:
+                    camera_ids = insert_cameras(
+                        connection, [(camera_model, width, height, params, focal_length is not None)]
+                    )
+                image_ids = insert_images(
+                    connection, frame_names, camera_ids[0], [frame_index[name] for name in frame_names]
+                )
+
+                if gps_csv and os.path.exists(gps_csv):
+                    names, positions = read_gps_poses_csv(gps_csv)
+                    known = [i for i, name in enumerate(names) if name in image_ids]
+                    insert_pose_priors(
+                        connection,
+                        [image_ids[names[i]] for i in known],
+                        positions[known]
+                    )
+        finally:
+            connection.close()
+        return True
+    except Exception as e:
+        print(f"Error preparing COLMAP database: {str(e)}")
+        return False
+
+def _next_id(connection, table, column):
+    """Return the id the next AUTOINCREMENT insert into table will receive"""
+    (max_id,) = connection.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}").fetchone()
+    return max_id + 1
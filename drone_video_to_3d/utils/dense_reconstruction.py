@@ -0,0 +1,147 @@
+import os
+import shutil
+
+from .process_supervisor import run_tool
+from .pipeline_manifest import optional_stage, stage_token
+
+# Number of source images COLMAP picks automatically for each reference image
+NUM_SOURCE_IMAGES = 20
+
+def undistort_images(frames_dir, model_dir, dense_dir, max_image_size=2000):
+    """Undistort the registered frames into a fresh COLMAP dense workspace"""
+    # Depth maps of a previous model would otherwise be taken as finished batches
+    for stale in ("depth_maps", "normal_maps"):
+        shutil.rmtree(os.path.join(dense_dir, "stereo", stale), ignore_errors=True)
+    run_tool([
+        "colmap", "image_undistorter",
+        "--image_path", frames_dir,
+        "--input_path", model_dir,
+        "--output_path", dense_dir,
+        "--output_type", "COLMAP",
+        "--max_image_size", str(max_image_size)
+    ], echo=True)
+    return dense_dir
+
+def list_workspace_images(dense_dir):
+    """Return the sorted image names of an undistorted workspace"""
+    images_dir = os.path.join(dense_dir, "images")
+    return sorted(
+        f for f in os.listdir(images_dir)
+        if os.path.isfile(os.path.join(images_dir, f))
+    )
+
+def make_batches(image_names, batch_size):
+    """Split image names into consecutive batches of at most batch_size"""
+    batch_size = max(1, int(batch_size))
+    return [image_names[i:i + batch_size] for i in range(0, len(image_names), batch_size)]
+
+def depth_map_path(dense_dir, image_name, input_type):
+    """Return the path of the depth map patch_match_stereo writes for an image"""
+    return os.path.join(dense_dir, "stereo", "depth_maps", f"{image_name}.{input_type}.bin")
+
+def batch_is_complete(dense_dir, batch, input_type):
+    """Check whether every image of a batch already has its depth map"""
+    return all(os.path.exists(depth_map_path(dense_dir, name, input_type)) for name in batch)
+
+def write_patch_match_config(dense_dir, batch):
+    """Restrict patch_match_stereo to the reference images of one batch"""
+    config_path = os.path.join(dense_dir, "stereo", "patch-match.cfg")
+    with open(config_path, 'w') as f:
+        for name in batch:
+            f.write(f"{name}\n__auto__, {NUM_SOURCE_IMAGES}\n")
+    return config_path
+
+def run_stereo_batches(dense_dir, batch_size=50, max_image_size=2000, cache_size_gb=8.0, gpu_index="0", log=print,
+                       manifest=None):
+    """Compute depth maps batch by batch, skipping batches that already finished
+
+    All photometric depth maps are computed before any geometric ones, because
+    geometric consistency of a batch reads the photometric maps of source
+    images that may belong to other batches. patch_match_stereo needs a CUDA
+    build of COLMAP; depth maps produced on another node are picked up here and
+    their batches skipped.
+    """
+    batches = make_batches(list_workspace_images(dense_dir), batch_size)
+    config_path = os.path.join(dense_dir, "stereo", "patch-match.cfg")
+    original_config = None
+    if os.path.exists(config_path):
+        with open(config_path, 'r') as f:
+            original_config = f.read()
+
+    try:
+        for input_type, geom_consistency in (("photometric", "false"), ("geometric", "true")):
+            for i, batch in enumerate(batches):
+                if batch_is_complete(dense_dir, batch, input_type):
+                    continue
+                inputs = {"images": batch, "max_image_size": max_image_size,
+                          "undistort": stage_token(manifest, "dense.undistort")}
+                outputs = [depth_map_path(dense_dir, name, input_type) for name in batch]
+                with optional_stage(manifest, f"dense.stereo.{input_type}.{i:04d}", inputs, outputs) as run:
+                    if not run:
+                        continue
+                    log(f"Dense stereo ({input_type}) batch {i + 1}/{len(batches)}")
+                    write_patch_match_config(dense_dir, batch)
+                    run_tool([
+                        "colmap", "patch_match_stereo",
+                        "--workspace_path", dense_dir,
+                        "--workspace_format", "COLMAP",
+                        "--PatchMatchStereo.geom_consistency", geom_consistency,
+                        "--PatchMatchStereo.max_image_size", str(max_image_size),
+                        "--PatchMatchStereo.cache_size", str(cache_size_gb),
+                        "--PatchMatchStereo.gpu_index", gpu_index
+                    ], echo=True)
+    finally:
+        # Leave the workspace config covering all images for later tools
+        if original_config is not None:
+            with open(config_path, 'w') as f:
+                f.write(original_config)
+
+def run_fusion(dense_dir, max_image_size=2000, num_threads=-1, cache_size_gb=8.0, bbox_path=None):
+    """Fuse geometric depth maps into dense/fused.ply with a bounded image cache
+
+    With bbox_path, only points inside that box (model coordinates) are fused.
+    """
+    fused_ply = os.path.join(dense_dir, "fused.ply")
+    cmd = [
+        "colmap", "stereo_fusion",
+        "--workspace_path", dense_dir,
+        "--workspace_format", "COLMAP",
+        "--input_type", "geometric",
+        "--output_path", fused_ply,
+        "--StereoFusion.max_image_size", str(max_image_size),
+        "--StereoFusion.num_threads", str(num_threads),
+        "--StereoFusion.use_cache", "1",
+        "--StereoFusion.cache_size", str(cache_size_gb)
+    ]
+    if bbox_path:
+        cmd.extend(["--bbox_path", bbox_path])
+    run_tool(cmd, echo=True)
+    return fused_ply
+
+def run_dense_reconstruction(frames_dir, model_dir, dense_dir, max_image_size=2000, num_threads=-1,
+                             cache_size_gb=8.0, batch_size=50, log=print, manifest=None, upstream=None,
+                             bbox_path=None):
+    """Run undistortion, batched stereo and fusion, resuming from existing outputs
+
+    upstream is the manifest token of the stage that produced model_dir;
+    bbox_path optionally crops the fused cloud (see run_fusion).
+    """
+    bbox = None
+    if bbox_path:
+        with open(bbox_path, 'r') as f:
+            bbox = f.read().split()
+    fused_ply = os.path.join(dense_dir, "fused.ply")
+    inputs = {"model": model_dir, "max_image_size": max_image_size, "upstream": upstream}
+    with optional_stage(manifest, "dense.undistort", inputs, [os.path.join(dense_dir, "sparse")]) as run:
+        if run:
+            undistort_images(frames_dir, model_dir, dense_dir, max_image_size)
+
+    run_stereo_batches(dense_dir, batch_size, max_image_size, cache_size_gb, log=log, manifest=manifest)
+
+    inputs = {"max_image_size": max_image_size, "undistort": stage_token(manifest, "dense.undistort"),
+              "batches": len(make_batches(list_workspace_images(dense_dir), batch_size)), "bbox": bbox}
+    with optional_stage(manifest, "dense.fusion", inputs, [fused_ply]) as run:
+        if run:
+            log("Fusing depth maps...")
+            run_fusion(dense_dir, max_image_size, num_threads, cache_size_gb, bbox_path)
+    return fused_ply
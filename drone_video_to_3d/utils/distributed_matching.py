@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import subprocess
+import numpy as np
+
+from . import colmap_db
+from .match_worker import job_paths, release_unit, last_failure, HEARTBEAT_INTERVAL, MAX_ATTEMPTS
+
+FEATURES_DATABASE = "features.db"
+
+# Seconds the coordinator waits for a first worker when none is started locally
+JOIN_TIMEOUT = 600.0
+
+def exhaustive_pairs(image_ids):
+    """Return all unordered pairs of image ids as an (N, 2) array"""
+    image_ids = np.asarray(sorted(image_ids), dtype=np.int64)
+    first, second = np.triu_indices(len(image_ids), k=1)
+    return np.stack([image_ids[first], image_ids[second]], axis=1)
+
+def shard_pairs(pairs, unit_size):
+    """Split an (N, 2) pair array into work units of at most unit_size pairs"""
+    unit_size = max(1, int(unit_size))
+    return [pairs[i:i + unit_size] for i in range(0, len(pairs), unit_size)]
+
+def snapshot_features(db_path, snapshot_path):
+    """Copy keypoints and descriptors into a read-only snapshot for the workers"""
+    if os.path.exists(snapshot_path):
+        os.remove(snapshot_path)
+    source = colmap_db.connect(db_path)
+    target = sqlite3.connect(snapshot_path)
+    try:
+        # The backup API gives a consistent copy even while the source is in WAL mode
+        source.backup(target)
+        with target:
+            target.execute("DELETE FROM matches")
+            target.execute("DELETE FROM two_view_geometries")
+        target.execute("PRAGMA journal_mode=DELETE")
+        target.execute("VACUUM")
+    finally:
+        target.close()
+        source.close()
+
+def write_job(job_dir, db_path, pairs, unit_size, use_gpu=True, num_threads=-1, max_attempts=MAX_ATTEMPTS,
+              colmap="colmap"):
+    """Publish a matching job: features snapshot, job description and pending units"""
+    paths = job_paths(job_dir)
+    if os.path.exists(job_dir):
+        shutil.rmtree(job_dir)
+    for key in ("pending", "claimed", "results", "failures", "failed", "workers"):
+        os.makedirs(paths[key], exist_ok=True)
+
+    snapshot_features(db_path, os.path.join(job_dir, FEATURES_DATABASE))
+
+    connection = colmap_db.connect(db_path)
+    try:
+        names = {image_id: name for name, image_id in colmap_db.read_image_ids(connection).items()}
+    finally:
+        connection.close()
+
+    units = shard_pairs(pairs, unit_size)
+    for i, unit in enumerate(units):
+        unit_path = os.path.join(paths["pending"], f"unit_{i:06d}.txt")
+        with open(unit_path + ".tmp", 'w') as f:
+            for image_id1, image_id2 in unit:
+                f.write(f"{names[int(image_id1)]} {names[int(image_id2)]}\n")
+        os.replace(unit_path + ".tmp", unit_path)
+
+    # The job description goes last; workers wait for it before starting
+    job = {
+        "features_database": FEATURES_DATABASE,
+        "num_units": len(units),
+        "use_gpu": bool(use_gpu),
+        "num_threads": int(num_threads),
+        "max_attempts": int(max_attempts),
+        "colmap": colmap,
+    }
+    with open(paths["job"] + ".tmp", 'w') as f:
+        json.dump(job, f, indent=2)
+    os.replace(paths["job"] + ".tmp", paths["job"])
+    return len(units)
+
+def start_local_workers(job_dir, num_workers):
+    """Launch worker processes on this machine and return their Popen handles
+
+    Local workers stand in for remote nodes: they run exactly the same module
+    against the same job directory.
+    """
+    package_parent = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_parent, env.get("PYTHONPATH")]))
+    workers = []
+    for i in range(num_workers):
+        cmd = [
+            sys.executable, "-m", "drone_video_to_3d.utils.match_worker",
+            "--job-dir", job_dir,
+            "--worker-id", f"local-{i}"
+        ]
+        workers.append(subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    return workers
+
+def merge_result(connection, result_path):
+    """Bulk copy one unit's matches into the main database in a single transaction"""
+    connection.execute("ATTACH DATABASE ? AS unit", (result_path,))
+    try:
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO main.matches SELECT * FROM unit.matches")
+            connection.execute("INSERT OR REPLACE INTO main.two_view_geometries SELECT * FROM unit.two_view_geometries")
+    finally:
+        connection.execute("DETACH DATABASE unit")
+
+def requeue_stale_claims(paths, stale_after, max_attempts=MAX_ATTEMPTS):
+    """Move units whose worker stopped sending heartbeats back to pending, counting it as a failed attempt"""
+    now = time.time()
+    for file_name in os.listdir(paths["claimed"]):
+        claim_path = os.path.join(paths["claimed"], file_name)
+        try:
+            if now - os.path.getmtime(claim_path) > stale_after:
+                unit_name = file_name.split(".", 1)[0]
+                release_unit(paths, unit_name, claim_path, "worker stopped sending heartbeats", "coordinator",
+                             max_attempts)
+        except OSError:
+            continue
+
+def workers_alive(paths, workers, stale_after):
+    """Whether any local worker is running or any worker, local or remote, showed signs of life recently"""
+    if any(w.poll() is None for w in workers):
+        return True
+    now = time.time()
+    for key in ("workers", "claimed"):
+        for file_name in os.listdir(paths[key]):
+            try:
+                if now - os.path.getmtime(os.path.join(paths[key], file_name)) <= stale_after:
+                    return True
+            except OSError:
+                continue
+    return False
+
+def gather_results(db_path, job_dir, num_units, workers=(), poll_interval=1.0, stale_after=None, timeout=None,
+                   join_timeout=JOIN_TIMEOUT, max_attempts=MAX_ATTEMPTS, log=print):
+    """Merge unit results into db_path as they arrive until every unit is merged
+
+    Raises RuntimeError when a unit fails max_attempts times, when no worker
+    has been alive for stale_after seconds (join_timeout before the first
+    one shows up) while units are outstanding, or when timeout runs out.
+    """
+    paths = job_paths(job_dir)
+    stale_after = stale_after or 4 * HEARTBEAT_INTERVAL
+    merged = set()
+    start = last_alive = time.time()
+    seen_worker = False
+    connection = colmap_db.connect(db_path)
+    try:
+        while len(merged) < num_units:
+            for file_name in sorted(os.listdir(paths["results"])):
+                if not file_name.endswith(".db") or file_name in merged:
+                    continue
+                merge_result(connection, os.path.join(paths["results"], file_name))
+                merged.add(file_name)
+                log(f"Merged matching unit {len(merged)}/{num_units}")
+
+            missing = num_units - len(merged)
+            if missing == 0:
+                break
+            failed = sorted(os.listdir(paths["failed"]))
+            if failed:
+                unit_name = os.path.splitext(failed[0])[0]
+                raise RuntimeError(f"{len(failed)} matching units failed {max_attempts} times; "
+                                   f"last error of {unit_name}: {last_failure(paths, unit_name)}")
+            now = time.time()
+            if timeout and now - start > timeout:
+                raise RuntimeError(f"Distributed matching timed out after {timeout:.0f}s with {missing} units missing")
+
+            requeue_stale_claims(paths, stale_after, max_attempts)
+            if workers_alive(paths, workers, stale_after):
+                seen_worker = True
+                last_alive = now
+            elif workers and all(w.poll() not in (None, 0) for w in workers):
+                raise RuntimeError(f"All local matching workers failed with {missing} units missing")
+            elif now - last_alive > (stale_after if seen_worker else join_timeout):
+                raise RuntimeError(f"No matching worker is running and {missing} units are not done")
+            time.sleep(poll_interval)
+    finally:
+        connection.close()
+    return len(merged)
+
+def run_distributed_matching(db_path, job_dir, num_local_workers=2, unit_size=2000, use_gpu=True,
+                             num_threads=-1, pairs=None, timeout=None, join_timeout=JOIN_TIMEOUT,
+                             stale_after=None, poll_interval=1.0, colmap="colmap", log=print):
+    """Match all image pairs (or the given pairs) with a pool of local and remote workers
+
+    Remote nodes join by running match_worker against the same job_dir on a
+    shared filesystem. Partial results are merged into db_path as they arrive.
+    See gather_results for when the job gives up.
+    """
+    if pairs is None:
+        connection = colmap_db.connect(db_path)
+        try:
+            pairs = exhaustive_pairs(colmap_db.read_image_ids(connection).values())
+        finally:
+            connection.close()
+    if len(pairs) == 0:
+        return 0
+
+    num_units = write_job(job_dir, db_path, pairs, unit_size, use_gpu, num_threads, colmap=colmap)
+    log(f"Matching {len(pairs)} image pairs as {num_units} work units in {job_dir}")
+
+    workers = start_local_workers(job_dir, num_local_workers)
+    try:
+        gather_results(db_path, job_dir, num_units, workers, poll_interval, stale_after, timeout, join_timeout,
+                       log=log)
+    finally:
+        # Tell every worker, local or remote, that the job is over
+        with open(job_paths(job_dir)["closed"], 'w') as f:
+            f.write("closed\n")
+        for worker in workers:
+            try:
+                worker.wait(timeout=HEARTBEAT_INTERVAL)
+            except subprocess.TimeoutExpired:
+                worker.terminate()
+    return num_units
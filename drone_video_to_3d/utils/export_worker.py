@@ -0,0 +1,105 @@
+"""Model export worker for batch exports
+
+The add-on saves a snapshot of the scene and starts one of these per format:
+
+    blender --background --factory-startup snapshot.blend --python export_worker.py -- --format GLB
+
+Each worker registers the add-on from this checkout, exports DroneScan_Model
+with the settings stored in the snapshot and prints one EXPORTED line with
+the export time, so several formats are written in parallel without
+blocking the interactive session.
+"""
+
+import os
+import sys
+import time
+import argparse
+import importlib
+
+# Prefix of the line a worker prints after a successful export
+RESULT_PREFIX = "EXPORTED"
+
+def package_dir():
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def worker_command(blender, snapshot, file_format, export_dir, georeferenced=False, geo_metadata=False):
+    """Build the command line of one background export worker"""
+    # --python-exit-code makes an exception in the script fail the process
+    cmd = [blender, "--background", "--factory-startup", snapshot, "--python-exit-code", "1",
+           "--python", os.path.abspath(__file__), "--",
+           "--format", file_format, "--export-dir", export_dir]
+    if georeferenced:
+        cmd.append("--georeferenced")
+    if geo_metadata:
+        cmd.append("--geo-metadata")
+    return cmd
+
+def parse_result(line):
+    """Parse a worker's EXPORTED line into (format, seconds, path), or None for any other line"""
+    if not line.startswith(RESULT_PREFIX + " "):
+        return None
+    _, file_format, seconds, path = line.split(" ", 3)
+    return file_format, float(seconds), path
+
+def submit_exports(blender, snapshot, formats, export_dir, georeferenced=False, geo_metadata=False, log=print):
+    """Start one background worker per format and return {format: (future, results)}
+
+    results is a list that receives the worker's parsed EXPORTED line.
+    Workers go through the process supervisor, which caps how many Blender
+    instances run at once.
+    """
+    from .process_supervisor import get_supervisor
+
+    supervisor = get_supervisor()
+    jobs = {}
+    for index, file_format in enumerate(formats):
+        results = []
+
+        def on_stdout(line, results=results):
+            parsed = parse_result(line)
+            if parsed is not None:
+                results.append(parsed)
+
+        cmd = worker_command(blender, snapshot, file_format, export_dir, georeferenced,
+                             geo_metadata and index == 0)
+        log(f"Starting {file_format} export worker")
+        jobs[file_format] = (supervisor.submit(cmd, tool="blender", on_stdout=on_stdout), results)
+    return jobs
+
+def parse_args():
+    """Parse the arguments after Blender's '--' separator"""
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="Background model export worker")
+    parser.add_argument("--format", required=True, help="Export format (OBJ, PLY, GLB or TILES)")
+    parser.add_argument("--export-dir", required=True, help="Directory the model is written to")
+    parser.add_argument("--georeferenced", action="store_true", help="Write tiles in the local ENU frame")
+    parser.add_argument("--geo-metadata", action="store_true",
+                        help="Also write the GeoJSON sidecar and ENU camera poses")
+    return parser.parse_args(argv)
+
+def main():
+    import bpy
+
+    args = parse_args()
+    sys.path.insert(0, os.path.dirname(package_dir()))
+    addon = importlib.import_module(os.path.basename(package_dir()))
+    addon.register()
+    model_export = importlib.import_module(addon.__name__ + ".utils.model_export")
+
+    settings = bpy.context.scene.drone_video_3d
+    model_obj = bpy.data.objects.get(model_export.MODEL_OBJECT)
+    if model_obj is None:
+        print(f"No {model_export.MODEL_OBJECT} object in the snapshot", file=sys.stderr)
+        return 1
+
+    start = time.time()
+    model_file = model_export.export_model(model_obj, settings, args.format, args.export_dir, args.georeferenced)
+    if args.geo_metadata:
+        geo = model_export.write_geo_metadata(model_obj, settings.output_path, args.export_dir)
+        if geo is None:
+            print("No camera poses found; skipped the georeferencing sidecar", file=sys.stderr)
+    print(f"{RESULT_PREFIX} {args.format} {time.time() - start:.3f} {model_file}", flush=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+from . import colmap_db
+from .process_supervisor import run_tool
+
+# Bytes read at a time while hashing frame files
+HASH_CHUNK_SIZE = 1024 * 1024
+
+CREATE_CACHE_SQL = """
+CREATE TABLE IF NOT EXISTS features (
+    key TEXT PRIMARY KEY NOT NULL,
+    keypoint_rows INTEGER NOT NULL,
+    keypoint_cols INTEGER NOT NULL,
+    keypoints BLOB,
+    descriptor_rows INTEGER NOT NULL,
+    descriptor_cols INTEGER NOT NULL,
+    descriptors BLOB,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS features_last_access ON features(last_access);
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL);
+"""
+
+def default_cache_dir():
+    """Return the machine-wide cache directory shared by all projects"""
+    if os.environ.get("DRONEVIDEO3D_CACHE_DIR"):
+        return os.environ["DRONEVIDEO3D_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "drone_video_to_3d")
+
+def params_digest(params):
+    """Hash the extraction parameters that change the resulting features"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+def extraction_params(use_gpu, camera_model="OPENCV"):
+    """Return the feature_extractor settings that are part of the cache key"""
+    # GPU and CPU SIFT produce slightly different features
+    return {"extractor": "sift", "camera_model": camera_model, "use_gpu": bool(use_gpu)}
+
+class FeatureCache:
+    """Persistent per-frame SIFT features keyed by frame content and extraction parameters
+
+    Entries live in one SQLite file and are evicted least-recently-used first
+    once the cache grows beyond max_size_bytes.
+    """
+
+    def __init__(self, cache_dir=None, max_size_bytes=20 * 1024 ** 3):
+        cache_dir = cache_dir or default_cache_dir()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "features.db")
+        self.max_size_bytes = max_size_bytes
+        self.connection = sqlite3.connect(self.path, timeout=60.0)
+        # Incremental auto-vacuum must be set before the first table is created
+        self.connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(CREATE_CACHE_SQL)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def content_hash(self, file_path):
+        """Return the SHA-256 of a file, reusing the stored hash while size and mtime match"""
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        row = self.connection.execute(
+            "SELECT hash FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (file_path, stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        if row:
+            return row[0]
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+                (file_path, stat.st_size, stat.st_mtime_ns, content_hash)
+            )
+        return content_hash
+
+    def keys_for_frames(self, frames_dir, frame_names, params):
+        """Return a frame name -> cache key mapping"""
+        suffix = params_digest(params)
+        return {
+            name: hashlib.sha256(
+                (self.content_hash(os.path.join(frames_dir, name)) + suffix).encode("ascii")
+            ).hexdigest()
+            for name in frame_names
+        }
+
+    def import_into_database(self, db_path, frames_dir, params):
+        """Copy cached features for every frame of db_path that has none yet
+
+        Returns the names of frames that still need feature extraction.
+        """
+        connection = colmap_db.connect(db_path)
+        try:
+            image_ids = colmap_db.read_image_ids(connection)
+            have_features = colmap_db.read_image_ids_with_features(connection)
+            wanted = [name for name, image_id in image_ids.items() if image_id not in have_features]
+            keys = self.keys_for_frames(frames_dir, wanted, params)
+
+            rows = []
+            found = {}
+            for name in wanted:
+                row = self.connection.execute(
+                    "SELECT keypoint_rows, keypoint_cols, keypoints, descriptor_rows, descriptor_cols, descriptors "
+                    "FROM features WHERE key = ?", (keys[name],)
+                ).fetchone()
+                if row:
+                    rows.append((image_ids[name],) + tuple(row))
+                    found[keys[name]] = name
+
+            with connection:
+                colmap_db.insert_features(connection, rows)
+        finally:
+            connection.close()
+
+        if found:
+            now = time.time()
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE features SET last_access = ? WHERE key = ?", ((now, key) for key in found)
+                )
+        return sorted(set(wanted) - set(found.values()))
+
+    def store_from_database(self, db_path, frames_dir, frame_names, params):
+        """Add the features of frame_names from db_path to the cache and enforce the size cap"""
+        if not frame_names:
+            return 0
+        connection = colmap_db.connect(db_path)
+        try:
+            image_ids = colmap_db.read_image_ids(connection)
+            names = [name for name in frame_names if name in image_ids]
+            keys = self.keys_for_frames(frames_dir, names, params)
+            names_by_id = {image_ids[name]: name for name in names}
+            now = time.time()
+            stored = 0
+            with self.connection:
+                for row in colmap_db.read_features(connection, names_by_id):
+                    image_id, k_rows, k_cols, keypoints, d_rows, d_cols, descriptors = row
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (keys[names_by_id[image_id]], k_rows, k_cols, keypoints, d_rows, d_cols, descriptors,
+                         len(keypoints or b'') + len(descriptors or b''), now)
+                    )
+                    stored += 1
+        finally:
+            connection.close()
+        self.evict()
+        return stored
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits max_size_bytes"""
+        (total,) = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM features").fetchone()
+        if total <= self.max_size_bytes:
+            return 0
+        excess = total - self.max_size_bytes
+        doomed = []
+        freed = 0
+        for key, size in self.connection.execute("SELECT key, size FROM features ORDER BY last_access"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        with self.connection:
+            self.connection.executemany("DELETE FROM features WHERE key = ?", doomed)
+        self.connection.execute("PRAGMA incremental_vacuum")
+        return len(doomed)
+
+def run_cached_extraction(db_path, frames_dir, feature_cmd, params, cache=None):
+    """Run a COLMAP feature_extractor command only for frames that still lack features
+
+    The database should already list the frames (see colmap_db.prepare_database).
+    With a cache, cached features are imported first and only the remaining
+    frames are extracted and then added to the cache. A database listing no
+    images gets a plain full extraction, which adds every image in
+    frames_dir. feature_cmd must not contain --image_list_path. Returns
+    (cached, extracted) counts.
+    """
+    connection = colmap_db.connect(db_path)
+    try:
+        listed = len(colmap_db.read_image_ids(connection))
+    finally:
+        connection.close()
+    if not listed:
+        run_tool(feature_cmd, echo=True)
+        connection = colmap_db.connect(db_path)
+        try:
+            names = sorted(colmap_db.read_image_ids(connection))
+        finally:
+            connection.close()
+        if cache is not None and names:
+            cache.store_from_database(db_path, frames_dir, names, params)
+        return 0, len(names)
+
+    if cache is not None:
+        missing = cache.import_into_database(db_path, frames_dir, params)
+    else:
+        connection = colmap_db.connect(db_path)
+        try:
+            have_features = colmap_db.read_image_ids_with_features(connection)
+            missing = sorted(
+                name for name, image_id in colmap_db.read_image_ids(connection).items()
+                if image_id not in have_features
+            )
+        finally:
+            connection.close()
+
+    connection = colmap_db.connect(db_path)
+    try:
+        total = len(colmap_db.read_image_ids(connection))
+    finally:
+        connection.close()
+
+    if missing:
+        image_list = os.path.join(os.path.dirname(os.path.abspath(db_path)), "extract_image_list.txt")
+        with open(image_list, 'w') as f:
+            f.write("\n".join(missing) + "\n")
+        run_tool(feature_cmd + ["--image_list_path", image_list], echo=True)
+        if cache is not None:
+            cache.store_from_database(db_path, frames_dir, missing, params)
+    return total - len(missing), len(missing)
@@ -0,0 +1,205 @@
+import os
+import json
+import numpy as np
+
+from . import mesh_io
+from . import trajectory
+
+def affine(rotation, translation):
+    """Build a 4x4 matrix from a 3x3 rotation and a translation"""
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation
+    matrix[:3, 3] = translation
+    return matrix
+
+def invert_rigid(matrix):
+    """Invert a 4x4 rotation plus translation matrix"""
+    rotation = matrix[:3, :3].T
+    return affine(rotation, -rotation @ matrix[:3, 3])
+
+def transform_points(points, matrix):
+    """Apply a 4x4 matrix to (N, 3) points in one float64 array operation"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
+
+def transform_mesh(mesh, matrix):
+    """Return a copy of mesh buffers with positions and normals moved by a rigid 4x4 matrix"""
+    normals = None
+    if mesh.normals is not None:
+        normals = (mesh.normals @ matrix[:3, :3].T.astype(np.float32)).astype(np.float32)
+    return mesh_io.MeshBuffers(transform_points(mesh.vertices, matrix).astype(np.float32), mesh.faces,
+                               normals, mesh.colors)
+
+class LocalFrame:
+    """East-north-up frame at the centre of a flight with its ECEF and model transforms
+
+    ENU coordinates stay small, so float32 vertices keep sub-millimetre
+    precision where raw ECEF (millions of metres) would round to centimetres.
+    """
+
+    def __init__(self, origin_ecef):
+        self.origin_ecef = np.asarray(origin_ecef, dtype=np.float64)
+        self.latitude, self.longitude, self.altitude = (
+            float(v) for v in trajectory.cartesian_to_geodetic(*self.origin_ecef)
+        )
+        rotation = trajectory.enu_rotation(self.latitude, self.longitude)
+        self.ecef_to_enu = affine(rotation, -rotation @ self.origin_ecef)
+        self.enu_to_ecef = invert_rigid(self.ecef_to_enu)
+
+    @classmethod
+    def from_positions(cls, ecef_positions):
+        """Centre the frame on the mean of the given ECEF positions"""
+        return cls(np.asarray(ecef_positions, dtype=np.float64).reshape(-1, 3).mean(axis=0))
+
+    def model_to_enu(self, photo_dir, reference_ecef):
+        """Return the 4x4 matrix taking reconstructed model coordinates into this frame
+
+        Raises ValueError when the model was never aligned to GPS.
+        """
+        origin, rotation = trajectory.model_frame(photo_dir, reference_ecef, require_alignment=True)
+        model_to_ecef = invert_rigid(affine(rotation, -rotation @ origin))
+        return self.ecef_to_enu @ model_to_ecef
+
+    def enu_to_wgs84(self):
+        """Return the 4x4 matrix from this frame to WGS84 ECEF, as 3D Tiles and other viewers expect
+
+        enu_to_ecef goes to the ECEF of the stored poses, which is spherical
+        when pyproj is missing; this one is rebuilt from the frame's latitude,
+        longitude and altitude on the ellipsoid.
+        """
+        origin = np.array(trajectory.geodetic_to_ecef(self.latitude, self.longitude, self.altitude),
+                          dtype=np.float64)
+        return affine(trajectory.enu_rotation(self.latitude, self.longitude).T, origin)
+
+    def to_geodetic(self, enu_points):
+        """Convert (N, 3) ENU points to (lat, lon, alt) arrays"""
+        ecef = transform_points(enu_points, self.enu_to_ecef)
+        return trajectory.cartesian_to_geodetic(ecef[:, 0], ecef[:, 1], ecef[:, 2])
+
+    def describe(self):
+        return {
+            "origin": {
+                "latitude": self.latitude,
+                "longitude": self.longitude,
+                "altitude": self.altitude,
+                "ecef": self.origin_ecef.tolist(),
+            },
+            "ecef_to_enu": self.ecef_to_enu.tolist(),
+            "enu_to_ecef": self.enu_to_ecef.tolist(),
+        }
+
+def _cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+def convex_hull(points):
+    """Return the convex hull of (N, 2) points counter-clockwise, without repeating the first point
+
+    Points inside the polygon spanned by the eight extreme points are
+    discarded with one vectorized test first (Akl-Toussaint), so the
+    monotone chain only walks the few points near the boundary even for
+    meshes with millions of vertices.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) < 3:
+        return np.unique(points, axis=0)
+
+    # Extremes along x, y and both diagonals form a convex polygon inside the hull
+    keys = [points[:, 0], points[:, 1], points[:, 0] + points[:, 1], points[:, 0] - points[:, 1]]
+    extremes = np.unique(np.concatenate([[np.argmin(k), np.argmax(k)] for k in keys]))
+    poly = points[extremes]
+    centre = poly.mean(axis=0)
+    poly = poly[np.argsort(np.arctan2(poly[:, 1] - centre[1], poly[:, 0] - centre[0]))]
+    if len(poly) >= 3:
+        inside = np.ones(len(points), dtype=bool)
+        for a, b in zip(poly, np.roll(poly, -1, axis=0)):
+            inside &= (b[0] - a[0]) * (points[:, 1] - a[1]) - (b[1] - a[1]) * (points[:, 0] - a[0]) > 0
+        points = points[~inside]
+
+    # Sorted by x then y, as the monotone chain requires
+    points = np.unique(points, axis=0)
+    lower = []
+    for p in points:
+        while len(lower) >= 2 and _cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    upper = []
+    for p in points[::-1]:
+        while len(upper) >= 2 and _cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return np.array(lower[:-1] + upper[:-1])
+
+def polygon_area(polygon):
+    """Shoelace area of a closed (N, 2) polygon"""
+    x, y = polygon[:, 0], polygon[:, 1]
+    return 0.5 * abs(float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))))
+
+def footprint(enu_vertices):
+    """Return the ground footprint (convex hull of the vertices projected to east/north) and height range"""
+    enu_vertices = np.asarray(enu_vertices, dtype=np.float64).reshape(-1, 3)
+    hull = convex_hull(enu_vertices[:, :2])
+    return hull, float(enu_vertices[:, 2].min()), float(enu_vertices[:, 2].max())
+
+def footprint_feature(frame, hull, ground_height=0.0, properties=None):
+    """Build a GeoJSON Polygon Feature from an ENU footprint"""
+    hull3 = np.column_stack([hull, np.full(len(hull), ground_height)])
+    lat, lon, _ = frame.to_geodetic(hull3)
+    ring = np.column_stack([np.round(lon, 8), np.round(lat, 8)]).tolist()
+    ring.append(ring[0])
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Polygon", "coordinates": [ring]},
+        "properties": properties or {}
+    }
+
+def write_georeferencing_geojson(output_file, frame, model_to_enu, enu_vertices, model_name="drone_model"):
+    """Write the model footprint and the model/ENU/ECEF transforms as a GeoJSON sidecar"""
+    hull, min_height, max_height = footprint(enu_vertices)
+    properties = {
+        "model": model_name,
+        "description": "Drone scan 3D model",
+        "crs": "EPSG:4326",
+        "area_m2": polygon_area(hull) if len(hull) >= 3 else 0.0,
+        "height_range_m": [min_height, max_height],
+        "vertex_count": int(len(enu_vertices)),
+        "model_to_enu": np.asarray(model_to_enu).tolist(),
+    }
+    properties.update(frame.describe())
+    collection = {
+        "type": "FeatureCollection",
+        "features": [footprint_feature(frame, hull, min_height, properties)]
+    }
+    with open(output_file, 'w') as f:
+        json.dump(collection, f, indent=2)
+    return output_file
+
+def write_enu_poses_csv(output_file, names, enu_positions, yaw=None, pitch=None, roll=None):
+    """Write camera positions in the local ENU frame"""
+    count = len(names)
+    yaw = np.zeros(count) if yaw is None else yaw
+    pitch = np.zeros(count) if pitch is None else pitch
+    roll = np.zeros(count) if roll is None else roll
+    table = np.column_stack([enu_positions, roll, pitch, yaw])
+    with open(output_file, 'w') as f:
+        f.write("frame,east,north,up,roll,pitch,yaw\n")
+        for name, row in zip(names, table):
+            f.write(name + "," + ",".join(f"{v:.4f}" for v in row) + "\n")
+    return output_file
+
+def georeference_model(vertices, names, pose_ecef, photo_dir, export_dir, yaw=None, pitch=None, roll=None):
+    """Georeference model vertices and camera poses, writing the GeoJSON sidecar and ENU pose CSV
+
+    vertices are (N, 3) model coordinates and pose_ecef the (M, 3) ECEF
+    camera positions. Returns (geojson_file, poses_file, frame).
+    """
+    frame = LocalFrame.from_positions(pose_ecef)
+    model_to_enu = frame.model_to_enu(photo_dir, pose_ecef)
+    enu_vertices = transform_points(vertices, model_to_enu)
+    enu_poses = transform_points(pose_ecef, frame.ecef_to_enu)
+
+    geojson_file = write_georeferencing_geojson(
+        os.path.join(export_dir, "geo_metadata.geojson"), frame, model_to_enu, enu_vertices
+    )
+    poses_file = write_enu_poses_csv(os.path.join(export_dir, "camera_poses_enu.csv"), names, enu_poses,
+                                     yaw, pitch, roll)
+    return geojson_file, poses_file, frame
@@ -0,0 +1,164 @@
+import os
+import json
+import numpy as np
+
+from . import colmap_db
+from . import feature_cache
+from .process_supervisor import run_tool
+
+PYRAMID_DIR = "pyramid"
+MANIFEST_NAME = "pyramid.json"
+
+# Features per frame on the coarse level; enough to verify overlap, cheap to match
+COARSE_MAX_FEATURES = 2048
+
+def level_dir(pyramid_dir, max_size):
+    return os.path.join(pyramid_dir, f"level_{int(max_size)}")
+
+def _read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def build_level(frames_dir, pyramid_dir, max_size, log=print):
+    """Resize frames to at most max_size pixels on the longer side, reusing cached levels
+
+    Only frames that are new or changed since the level was last built (by
+    size and modification time) are resized with COLMAP's image_resizer;
+    resized copies of frames that no longer exist are removed. Returns the
+    level directory and the names of the frames that were resized.
+    """
+    output_dir = level_dir(pyramid_dir, max_size)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = _read_manifest(manifest_path)
+
+    frames = colmap_db.list_frames(frames_dir)
+    current = {}
+    stale = []
+    for name in frames:
+        stat = os.stat(os.path.join(frames_dir, name))
+        current[name] = [stat.st_size, stat.st_mtime_ns]
+        if manifest.get(name) != current[name] or not os.path.exists(os.path.join(output_dir, name)):
+            stale.append(name)
+    for name in set(manifest) - set(current):
+        removed = os.path.join(output_dir, name)
+        if os.path.exists(removed):
+            os.remove(removed)
+
+    if stale:
+        log(f"Building {max_size}px pyramid level for {len(stale)} of {len(frames)} frames")
+        image_list = os.path.join(output_dir, "resize_image_list.txt")
+        with open(image_list, 'w') as f:
+            f.write("\n".join(stale) + "\n")
+        run_tool([
+            "colmap", "image_resizer",
+            "--image_path", frames_dir,
+            "--output_path", output_dir,
+            "--image_list_path", image_list,
+            "--max_image_size", str(int(max_size))
+        ])
+        os.remove(image_list)
+
+    with open(manifest_path, 'w') as f:
+        json.dump(current, f)
+    return output_dir, stale
+
+def _translate_pairs(source_db, target_db, image_ids1, image_ids2):
+    """Map image id pairs of source_db to the ids of the same frame names in target_db"""
+    connection = colmap_db.connect(source_db)
+    try:
+        names = {image_id: name for name, image_id in colmap_db.read_image_ids(connection).items()}
+    finally:
+        connection.close()
+    connection = colmap_db.connect(target_db)
+    try:
+        target_ids = colmap_db.read_image_ids(connection)
+    finally:
+        connection.close()
+
+    pairs = [
+        (target_ids[names[a]], target_ids[names[b]])
+        for a, b in zip(image_ids1.tolist(), image_ids2.tolist())
+        if names.get(a) in target_ids and names.get(b) in target_ids
+    ]
+    return np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+
+def coarse_pairs(db_path, frames_dir, work_dir, gps_csv=None, coarse_size=1000, min_inliers=30,
+                 use_gpu=True, cache=None, log=print):
+    """Find overlapping frame pairs by matching a low-resolution pyramid level
+
+    Frames are resized once into work_dir/pyramid, features are extracted and
+    exhaustively matched in a separate low-resolution database, and pairs
+    with at least min_inliers geometrically verified matches are returned as
+    an (N, 2) array of db_path image ids.
+    """
+    pyramid_dir = os.path.join(work_dir, PYRAMID_DIR)
+    coarse_dir, resized = build_level(frames_dir, pyramid_dir, coarse_size, log)
+    coarse_db = os.path.join(pyramid_dir, f"coarse_{int(coarse_size)}.db")
+    if resized and os.path.exists(coarse_db):
+        # Features and matches of replaced frames are stale; the feature cache refills the rest
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(coarse_db + suffix):
+                os.remove(coarse_db + suffix)
+
+    if not colmap_db.prepare_database(coarse_db, coarse_dir, gps_csv):
+        raise RuntimeError("Could not prepare the coarse matching database")
+
+    feature_cmd = [
+        "colmap", "feature_extractor",
+        "--database_path", coarse_db,
+        "--image_path", coarse_dir,
+        "--ImageReader.single_camera", "1",
+        "--ImageReader.camera_model", "OPENCV",
+        "--SiftExtraction.max_num_features", str(COARSE_MAX_FEATURES),
+        "--SiftExtraction.use_gpu", "1" if use_gpu else "0"
+    ]
+    # Coarse features must never be served for full-resolution frames
+    params = dict(feature_cache.extraction_params(use_gpu), max_image_size=int(coarse_size),
+                  max_num_features=COARSE_MAX_FEATURES)
+    cached, extracted = feature_cache.run_cached_extraction(coarse_db, coarse_dir, feature_cmd, params, cache)
+    log(f"Coarse features: {cached} frames from cache, {extracted} extracted")
+
+    # Low-resolution pairs are cheap, so every pair is tried; already matched pairs are skipped
+    run_tool([
+        "colmap", "exhaustive_matcher",
+        "--database_path", coarse_db,
+        "--SiftMatching.use_gpu", "1" if use_gpu else "0"
+    ])
+
+    image_ids1, image_ids2, inliers = colmap_db.read_match_counts(coarse_db, verified=True)
+    keep = inliers >= min_inliers
+    pairs = _translate_pairs(coarse_db, db_path, image_ids1[keep], image_ids2[keep])
+    log(f"Coarse matching verified {len(pairs)} of {len(inliers)} matched pairs")
+    return pairs
+
+def write_pair_list(db_path, pairs, output_file):
+    """Write image id pairs as the 'name1 name2' list read by matches_importer"""
+    connection = colmap_db.connect(db_path)
+    try:
+        names = {image_id: name for name, image_id in colmap_db.read_image_ids(connection).items()}
+    finally:
+        connection.close()
+    with open(output_file, 'w') as f:
+        for image_id1, image_id2 in np.asarray(pairs, dtype=np.int64).tolist():
+            f.write(f"{names[image_id1]} {names[image_id2]}\n")
+    return output_file
+
+def match_pairs(db_path, pairs, use_gpu=True):
+    """Match only the given image id pairs at full resolution with matches_importer"""
+    if len(pairs) == 0:
+        return 0
+    pair_list = write_pair_list(
+        db_path, pairs, os.path.join(os.path.dirname(os.path.abspath(db_path)), "match_pairs.txt")
+    )
+    run_tool([
+        "colmap", "matches_importer",
+        "--database_path", db_path,
+        "--match_list_path", pair_list,
+        "--match_type", "pairs",
+        "--SiftMatching.use_gpu", "1" if use_gpu else "0"
+    ], echo=True)
+    return len(pairs)
@@ -0,0 +1,320 @@
+import os
+import time
+import shutil
+import struct
+import threading
+import subprocess
+import numpy as np
+
+from . import colmap_db
+from . import chunked_reconstruction
+from . import feature_cache
+from . import telemetry_stream
+from .project_store import ProjectStore, GPS_RAW
+from .process_supervisor import get_supervisor, run_tool
+
+LIVE_SPARSE_DIR = "sparse_live"
+PREVIEW_NAME = "live_preview.ply"
+
+# Frames announced by showinfo but possibly not yet written by the PNG muxer
+WRITE_LAG = 2
+
+# Neighbouring frames each new frame is matched against
+SEQUENTIAL_OVERLAP = 10
+
+# Seconds between ExifTool re-reads of the growing file; every read parses
+# the whole file, so reading once per batch would cost quadratic time
+TELEMETRY_REREAD_INTERVAL = 30.0
+
+def ffmpeg_follow_command(video_path, frames_dir, frame_rate=1, scale="", idle_timeout=30.0):
+    """FFmpeg invocation that keeps reading a growing file and logs every selected frame
+
+    -follow makes the file protocol wait at the end of the file for more
+    data; the read gives up once nothing arrives for idle_timeout seconds.
+    Frames are numbered like the regular extraction so later stages treat
+    them the same.
+    """
+    filters = f"select=not(mod(n\\,{frame_rate})){', ' + scale if scale else ''},showinfo"
+    return [
+        "ffmpeg", "-nostats",
+        "-follow", "1",
+        "-rw_timeout", str(int(idle_timeout * 1e6)),
+        "-i", "file:" + os.path.abspath(video_path),
+        "-vf", filters,
+        "-vsync", "0",
+        "-q:v", "1",
+        os.path.join(frames_dir, "frame_%04d.png")
+    ]
+
+def registered_image_count(model_dir):
+    """Number of registered images in a binary COLMAP model, read from the images.bin header"""
+    try:
+        with open(os.path.join(model_dir, "images.bin"), 'rb') as f:
+            return struct.unpack("<Q", f.read(8))[0]
+    except (OSError, struct.error):
+        return 0
+
+class LiveFollower:
+    """Extract, register and preview frames of a video file while it is still being written
+
+    One FFmpeg process follows the file and writes frames as they arrive.
+    A background thread takes the written frames in batches: it appends
+    their timestamps and the telemetry read so far to the project store,
+    extracts features for the new frames only, matches them against their
+    sequential neighbours and lets the mapper register them into the
+    existing sparse model. After each batch the model is converted to a
+    preview PLY; preview_version changes whenever a new one is ready.
+
+    Only containers that are readable while being written (MPEG-TS, MKV,
+    fragmented MP4) can be followed; a regular MP4 is unreadable until the
+    recorder writes its index at the end.
+    """
+
+    def __init__(self, video_path, output_dir, frame_rate=1, scale="", use_cuda=True, batch_frames=20,
+                 idle_timeout=30.0, use_feature_cache=True, cache_size_gb=20.0,
+                 telemetry_interval=TELEMETRY_REREAD_INTERVAL, log=print):
+        self.video_path = video_path
+        self.output_dir = output_dir
+        self.frames_dir = os.path.join(output_dir, "frames")
+        self.photo_dir = os.path.join(output_dir, "photogrammetry")
+        self.db_path = os.path.join(self.photo_dir, "database.db")
+        self.sparse_dir = os.path.join(self.photo_dir, LIVE_SPARSE_DIR)
+        self.gps_csv = os.path.join(output_dir, "gps_poses.csv")
+        self.preview_ply = os.path.join(self.photo_dir, PREVIEW_NAME)
+        self.frame_rate = frame_rate
+        self.scale = scale
+        self.use_cuda = use_cuda
+        self.batch_frames = max(1, int(batch_frames))
+        self.idle_timeout = idle_timeout
+        self.cache_size_gb = cache_size_gb if use_feature_cache else 0.0
+        self.telemetry_interval = telemetry_interval
+        self.log = log
+
+        self.lock = threading.Lock()
+        self.announced = []
+        self.processed = 0
+        self.registered = 0
+        self.preview_version = 0
+        self.error = None
+        self.stopping = threading.Event()
+        self.extraction = None
+        self.thread = None
+        self.telemetry_read_at = None
+        # Frames whose time is not covered by the telemetry read so far
+        self.gps_pending = []
+
+    # Control
+
+    def start(self):
+        os.makedirs(self.frames_dir, exist_ok=True)
+        os.makedirs(self.sparse_dir, exist_ok=True)
+        self.extraction = get_supervisor().submit(
+            ffmpeg_follow_command(self.video_path, self.frames_dir, self.frame_rate, self.scale, self.idle_timeout),
+            on_stderr=self._on_ffmpeg_line, check=False
+        )
+        self.thread = threading.Thread(target=self._run, name="dronevideo3d-live-follow", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop following; the batch being processed is finished first"""
+        self.stopping.set()
+        if self.extraction is not None:
+            self.extraction.cancel()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def status(self):
+        with self.lock:
+            return {
+                "extracted": len(self.announced),
+                "processed": self.processed,
+                "registered": self.registered,
+                "preview_version": self.preview_version,
+                "following": self.extraction is not None and not self.extraction.done(),
+                "error": self.error,
+            }
+
+    # Frame extraction
+
+    def _on_ffmpeg_line(self, line):
+        if "pts_time:" in line and " n:" in line:
+            pts_time = float(line.split("pts_time:")[1].split()[0])
+            frame_num = int(line.split(" n:")[1].split()[0])
+            with self.lock:
+                # showinfo counts from 0 while the image2 muxer numbers files from 1
+                self.announced.append((f"frame_{frame_num + 1:04d}.png", pts_time))
+
+    def _ready_frames(self):
+        """Announced frames that are certainly written, minus those already processed
+
+        The batch ends at the first frame whose file does not exist yet so
+        frames are always processed in order.
+        """
+        finished = self.extraction.done()
+        with self.lock:
+            end = len(self.announced) if finished else max(0, len(self.announced) - WRITE_LAG)
+            batch = self.announced[self.processed:end]
+        for i, (name, _) in enumerate(batch):
+            if not os.path.exists(os.path.join(self.frames_dir, name)):
+                # After FFmpeg exited a missing frame will never appear
+                return batch[:i], finished and i == 0
+        return batch, finished
+
+    # Processing
+
+    def _run(self):
+        try:
+            while not self.stopping.is_set():
+                batch, finished = self._ready_frames()
+                if batch and (len(batch) >= self.batch_frames or finished):
+                    self._process_batch(batch, finished)
+                    with self.lock:
+                        self.processed += len(batch)
+                    continue
+                if finished:
+                    break
+                time.sleep(0.5)
+            if self.gps_pending and not self.stopping.is_set():
+                # Give the frames of the last batches the telemetry of the complete file
+                self._record_batch([], np.zeros(0), final=True)
+            if not self.extraction.cancelled():
+                result = self.extraction.result()
+                # The read timing out after the recording ends is the normal way out
+                if result.returncode != 0 and not self.announced:
+                    result.check_returncode()
+        except Exception as e:
+            with self.lock:
+                self.error = str(e)
+            self.log(f"Live processing stopped: {e}")
+
+    def _record_batch(self, names, times, final=False):
+        """Append frame timestamps and telemetry to the project store and give frames their GPS
+
+        ExifTool is re-run on the growing file at most every
+        telemetry_interval seconds and once more at the end. Frames later
+        than the last sample read so far wait for a later read instead of
+        being given clamped positions.
+        """
+        now = time.time()
+        reread = final or self.telemetry_read_at is None or now - self.telemetry_read_at >= self.telemetry_interval
+        samples, camera = None, {}
+        if reread:
+            self.telemetry_read_at = now
+            try:
+                samples, camera = telemetry_stream.stream_exiftool_telemetry(self.video_path)
+            except (subprocess.SubprocessError, OSError):
+                samples = None
+
+        with ProjectStore(self.output_dir) as store:
+            store.append_frames(names, times)
+            self.gps_pending.extend(zip(names, times))
+            if samples is not None and len(samples["latitude"]):
+                store.append_telemetry(samples)
+                store.set_stage_metadata("camera", camera)
+
+            has_gps = False
+            telemetry = store.read_telemetry()
+            if self.gps_pending and len(telemetry["latitude"]):
+                pending_times = np.array([t for _, t in self.gps_pending], dtype=np.float64)
+                sample_times = telemetry["time"]
+                if final or np.isnan(pending_times).any() or np.isnan(sample_times).all():
+                    covered = np.ones(len(pending_times), dtype=bool)
+                else:
+                    covered = pending_times <= np.nanmax(sample_times)
+                if covered.any():
+                    covered_names = [name for (name, _), keep in zip(self.gps_pending, covered) if keep]
+                    gps_data = telemetry_stream.telemetry_to_gps_data(
+                        telemetry, store.get_stage_metadata("camera", {}), covered_names, pending_times[covered]
+                    )
+                    if gps_data:
+                        store.write_gps(gps_data, GPS_RAW, replace=False)
+                        has_gps = True
+                    self.gps_pending = [item for item, keep in zip(self.gps_pending, covered) if not keep]
+            if has_gps or GPS_RAW in store.gps_kinds():
+                store.export_gps_poses_csv(self.gps_csv, GPS_RAW)
+                return True
+        return False
+
+    def _process_batch(self, batch, finished=False):
+        names = [name for name, _ in batch]
+        times = np.array([t for _, t in batch], dtype=np.float64)
+        has_gps = self._record_batch(names, times, final=finished)
+
+        with self.lock:
+            frame_names = [name for name, _ in self.announced[:self.processed]] + names
+        if not colmap_db.prepare_database(self.db_path, self.frames_dir, self.gps_csv if has_gps else None,
+                                          frame_names=frame_names):
+            raise RuntimeError("Could not prepare the COLMAP database")
+
+        gpu = "1" if self.use_cuda else "0"
+        feature_cmd = [
+            "colmap", "feature_extractor",
+            "--database_path", self.db_path,
+            "--image_path", self.frames_dir,
+            "--ImageReader.single_camera", "1",
+            "--ImageReader.camera_model", "OPENCV",
+            "--SiftExtraction.use_gpu", gpu
+        ]
+        params = feature_cache.extraction_params(self.use_cuda)
+        if self.cache_size_gb:
+            with feature_cache.FeatureCache(max_size_bytes=int(self.cache_size_gb * 1024 ** 3)) as cache:
+                feature_cache.run_cached_extraction(self.db_path, self.frames_dir, feature_cmd, params, cache)
+        else:
+            feature_cache.run_cached_extraction(self.db_path, self.frames_dir, feature_cmd, params)
+
+        # Pairs matched in earlier batches are already in the database and skipped
+        run_tool([
+            "colmap", "sequential_matcher",
+            "--database_path", self.db_path,
+            "--SequentialMatching.overlap", str(SEQUENTIAL_OVERLAP),
+            "--SiftMatching.use_gpu", gpu
+        ])
+
+        self._register()
+        self.log(f"Live: {len(frame_names)} frames processed, {self.registered} registered")
+
+    def _register(self):
+        """Register new images into the live model, starting one once an initial pair is found"""
+        model_dir = os.path.join(self.sparse_dir, "model")
+        cmd = [
+            "colmap", "mapper",
+            "--database_path", self.db_path,
+            "--image_path", self.frames_dir,
+        ]
+        try:
+            if os.path.exists(os.path.join(model_dir, "images.bin")):
+                # Continue from the current model; swap it in only once the mapper succeeded
+                next_dir = os.path.join(self.sparse_dir, "next")
+                shutil.rmtree(next_dir, ignore_errors=True)
+                os.makedirs(next_dir)
+                run_tool(cmd + ["--input_path", model_dir, "--output_path", next_dir])
+                if not os.path.exists(os.path.join(next_dir, "images.bin")):
+                    return
+                shutil.rmtree(model_dir)
+                os.replace(next_dir, model_dir)
+            else:
+                initial_dir = os.path.join(self.sparse_dir, "initial")
+                shutil.rmtree(initial_dir, ignore_errors=True)
+                os.makedirs(initial_dir)
+                run_tool(cmd + ["--output_path", initial_dir])
+                largest = chunked_reconstruction.largest_model(initial_dir)
+                if largest is None:
+                    return
+                os.replace(largest, model_dir)
+                shutil.rmtree(initial_dir, ignore_errors=True)
+        except subprocess.CalledProcessError as e:
+            # Too few overlapping frames so far; the next batch tries again
+            self.log(f"Live mapping not possible yet: {e}")
+            return
+
+        run_tool([
+            "colmap", "model_converter",
+            "--input_path", model_dir,
+            "--output_path", self.preview_ply,
+            "--output_type", "PLY"
+        ])
+        with self.lock:
+            self.registered = registered_image_count(model_dir)
+            self.preview_version += 1
@@ -0,0 +1,210 @@
+"""Feature matching worker for a distributed matching job
+
+Run one or more of these on any machine that can see the job directory:
+
+    python -m drone_video_to_3d.utils.match_worker --job-dir /shared/flight/match_jobs
+
+The worker claims pending work units by renaming them, matches their image
+pairs with COLMAP against a private copy of the feature database and
+publishes the resulting matches as a small SQLite file in results/.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import sqlite3
+import argparse
+import tempfile
+import threading
+import subprocess
+
+# Seconds between heartbeats on a claimed unit; claims older than a few
+# heartbeats are handed back to the queue by the coordinator
+HEARTBEAT_INTERVAL = 30.0
+
+# Failed or abandoned attempts after which a unit is moved to failed/ instead of pending/
+MAX_ATTEMPTS = 3
+
+def job_paths(job_dir):
+    """Return the well-known paths inside a job directory"""
+    return {
+        "job": os.path.join(job_dir, "job.json"),
+        "pending": os.path.join(job_dir, "pending"),
+        "claimed": os.path.join(job_dir, "claimed"),
+        "results": os.path.join(job_dir, "results"),
+        "failures": os.path.join(job_dir, "failures"),
+        "failed": os.path.join(job_dir, "failed"),
+        "workers": os.path.join(job_dir, "workers"),
+        "closed": os.path.join(job_dir, "closed"),
+    }
+
+def release_unit(paths, unit_name, claim_path, reason, source, max_attempts=MAX_ATTEMPTS):
+    """Hand a claimed unit back after a failed attempt
+
+    Every attempt leaves a note in failures/; once a unit has failed
+    max_attempts times it goes to failed/, which ends the job, instead of
+    back to pending/. Returns the number of attempts so far.
+    """
+    note = os.path.join(paths["failures"], f"{unit_name}.{source}.{time.time_ns()}.txt")
+    with open(note, 'w') as f:
+        f.write(reason + "\n")
+    attempts = sum(1 for file_name in os.listdir(paths["failures"]) if file_name.split(".", 1)[0] == unit_name)
+    target = paths["failed"] if attempts >= max_attempts else paths["pending"]
+    os.rename(claim_path, os.path.join(target, f"{unit_name}.txt"))
+    return attempts
+
+def last_failure(paths, unit_name):
+    """Return the reason noted for the most recent failed attempt of a unit"""
+    notes = [file_name for file_name in os.listdir(paths["failures"]) if file_name.split(".", 1)[0] == unit_name]
+    if not notes:
+        return ""
+    latest = max(notes, key=lambda file_name: os.path.getmtime(os.path.join(paths["failures"], file_name)))
+    with open(os.path.join(paths["failures"], latest), 'r') as f:
+        return f.read().strip()
+
+def touch_worker(paths, worker_id):
+    """Mark the worker as alive for the coordinator"""
+    alive_path = os.path.join(paths["workers"], worker_id)
+    with open(alive_path, 'a'):
+        pass
+    os.utime(alive_path)
+
+def claim_unit(paths, worker_id):
+    """Atomically claim the next pending unit, returning (unit_name, claim_path)"""
+    try:
+        pending = sorted(os.listdir(paths["pending"]))
+    except FileNotFoundError:
+        return None, None
+    for file_name in pending:
+        unit_name = os.path.splitext(file_name)[0]
+        claim_path = os.path.join(paths["claimed"], f"{unit_name}.{worker_id}.txt")
+        try:
+            os.rename(os.path.join(paths["pending"], file_name), claim_path)
+        except (FileNotFoundError, OSError):
+            # Another worker was faster
+            continue
+        return unit_name, claim_path
+    return None, None
+
+def start_heartbeat(claim_path):
+    """Touch the claim file periodically until the returned event is set"""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                os.utime(claim_path)
+            except OSError:
+                return
+
+    threading.Thread(target=beat, daemon=True).start()
+    return stop
+
+def export_matches(database_path, result_path):
+    """Copy the matches and verified geometries of a database into result_path atomically"""
+    tmp_path = result_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.execute("ATTACH DATABASE ? AS source", (database_path,))
+        with connection:
+            connection.execute("CREATE TABLE matches AS SELECT * FROM source.matches")
+            connection.execute("CREATE TABLE two_view_geometries AS SELECT * FROM source.two_view_geometries")
+        connection.execute("DETACH DATABASE source")
+    finally:
+        connection.close()
+    os.replace(tmp_path, result_path)
+
+def match_unit(job, local_db, unit_path, gpu_index):
+    """Match the pairs of one unit into the worker's private database"""
+    connection = sqlite3.connect(local_db)
+    try:
+        with connection:
+            connection.execute("DELETE FROM matches")
+            connection.execute("DELETE FROM two_view_geometries")
+    finally:
+        connection.close()
+
+    cmd = [
+        job.get("colmap", "colmap"), "matches_importer",
+        "--database_path", local_db,
+        "--match_list_path", unit_path,
+        "--match_type", "pairs",
+        "--SiftMatching.use_gpu", "1" if job.get("use_gpu") else "0",
+        "--SiftMatching.num_threads", str(job.get("num_threads", -1))
+    ]
+    if job.get("use_gpu"):
+        cmd.extend(["--SiftMatching.gpu_index", str(gpu_index)])
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def run_worker(job_dir, worker_id=None, gpu_index=-1, idle_timeout=60.0, poll_interval=1.0):
+    """Process units from job_dir until the job is closed or stays idle for idle_timeout"""
+    paths = job_paths(job_dir)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+    # Wait for the coordinator to publish the job description
+    deadline = time.time() + idle_timeout
+    while not os.path.exists(paths["job"]):
+        if time.time() > deadline:
+            return 0
+        time.sleep(poll_interval)
+    with open(paths["job"], 'r') as f:
+        job = json.load(f)
+
+    work_dir = tempfile.mkdtemp(prefix="dronevideo3d-match-")
+    local_db = os.path.join(work_dir, "database.db")
+    shutil.copyfile(os.path.join(job_dir, job["features_database"]), local_db)
+
+    processed = 0
+    idle_since = time.time()
+    try:
+        while not os.path.exists(paths["closed"]):
+            touch_worker(paths, worker_id)
+            unit_name, claim_path = claim_unit(paths, worker_id)
+            if unit_name is None:
+                # Units claimed by others may still come back when their worker dies
+                if os.listdir(paths["claimed"]):
+                    idle_since = time.time()
+                elif time.time() - idle_since > idle_timeout:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            stop = start_heartbeat(claim_path)
+            try:
+                match_unit(job, local_db, claim_path, gpu_index)
+                export_matches(local_db, os.path.join(paths["results"], f"{unit_name}.db"))
+                os.remove(claim_path)
+                processed += 1
+            except (subprocess.CalledProcessError, sqlite3.Error, OSError) as e:
+                print(f"Worker {worker_id} failed on {unit_name}: {str(e)}")
+                # Hand the unit back so another worker can retry it, up to the job's attempt limit
+                try:
+                    release_unit(paths, unit_name, claim_path, f"{worker_id}: {str(e)}", worker_id,
+                                 job.get("max_attempts", MAX_ATTEMPTS))
+                except OSError:
+                    pass
+            finally:
+                stop.set()
+            idle_since = time.time()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return processed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed COLMAP matching worker")
+    parser.add_argument("--job-dir", required=True, help="Shared job directory written by the coordinator")
+    parser.add_argument("--worker-id", default=None, help="Unique worker name (default: host-pid)")
+    parser.add_argument("--gpu-index", type=int, default=-1, help="GPU used when the job enables GPU matching (-1: all)")
+    parser.add_argument("--idle-timeout", type=float, default=60.0, help="Exit after this many idle seconds")
+    args = parser.parse_args(argv)
+    processed = run_worker(args.job_dir, args.worker_id, args.gpu_index, args.idle_timeout)
+    print(f"Matched {processed} work units")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
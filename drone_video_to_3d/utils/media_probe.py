@@ -0,0 +1,208 @@
+import os
+import json
+import hashlib
+import threading
+
+from .process_supervisor import get_supervisor
+from .feature_cache import default_cache_dir
+
+# Bump when the probe result layout changes so stale cache entries are ignored
+PROBE_VERSION = 2
+
+# Codec tags and handler names of timed metadata tracks that carry flight telemetry
+TELEMETRY_CODECS = ("gpmd", "djmd", "dbgi", "camm", "mett", "rtmd")
+TELEMETRY_HANDLERS = ("gopro met", "dji meta", "camm", "gps", "telemetry")
+
+# The subset of those track types known to carry GPS positions
+GPS_CODECS = ("gpmd", "djmd", "camm")
+GPS_HANDLERS = ("gopro met", "dji meta", "camm", "gps")
+
+# ExifTool tags holding a position; other GPS* tags (version, map datum) prove nothing
+GPS_POSITION_TAGS = ("GPSLatitude", "GPSLongitude", "GPSCoordinates", "GPSPosition")
+
+_memory_cache = {}
+_memory_lock = threading.Lock()
+
+def probe_key(video_path):
+    """Identify a file by path, size and modification time"""
+    path = os.path.abspath(video_path)
+    stat = os.stat(path)
+    raw = f"{PROBE_VERSION}|{path}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest(), stat
+
+def probe_cache_dir():
+    return os.path.join(default_cache_dir(), "media_probes")
+
+def _read_cached(cache_file):
+    try:
+        with open(cache_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_cached(cache_file, info):
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(info, f)
+    os.replace(temp_file, cache_file)
+
+def _rate(text):
+    """Parse an ffprobe rational like '30000/1001' into a float, or None"""
+    try:
+        numerator, denominator = (text or "0/0").split("/")
+        return float(numerator) / float(denominator) if float(denominator) else None
+    except ValueError:
+        return None
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def stream_rotation(stream):
+    """Display rotation of a video stream in degrees clockwise (0, 90, 180 or 270)"""
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            # The display matrix rotation is counter-clockwise
+            return int(round(-float(side_data["rotation"]))) % 360
+    rotate = stream.get("tags", {}).get("rotate")
+    return int(rotate) % 360 if rotate not in (None, "") else 0
+
+def _matches_track(stream, codecs, handlers):
+    if stream.get("codec_type") not in ("data", "subtitle"):
+        return False
+    tag = (stream.get("codec_tag_string") or "").lower()
+    handler = stream.get("tags", {}).get("handler_name", "").lower()
+    return tag in codecs or any(name in handler for name in handlers)
+
+def is_telemetry_stream(stream):
+    return _matches_track(stream, TELEMETRY_CODECS, TELEMETRY_HANDLERS)
+
+def is_gps_stream(stream):
+    """Whether a stream is a telemetry track of a type known to carry GPS positions"""
+    return _matches_track(stream, GPS_CODECS, GPS_HANDLERS)
+
+def _has_position(value):
+    """Whether an ExifTool -n position value holds a non-zero coordinate"""
+    numbers = []
+    for part in str(value).replace(",", " ").split():
+        number = _float(part)
+        if number is not None:
+            numbers.append(number)
+    return any(numbers)
+
+def summarize(ffprobe_info, exif_info=None):
+    """Reduce ffprobe (and ExifTool) JSON to what the pipeline needs"""
+    streams = []
+    telemetry = []
+    gps_tracks = []
+    video = None
+    for stream in ffprobe_info.get("streams", []):
+        entry = {
+            "index": stream.get("index"),
+            "type": stream.get("codec_type"),
+            "codec": stream.get("codec_name") or stream.get("codec_tag_string"),
+            "duration": _float(stream.get("duration")),
+            "frames": int(stream["nb_frames"]) if str(stream.get("nb_frames", "")).isdigit() else None,
+            "handler": stream.get("tags", {}).get("handler_name"),
+        }
+        streams.append(entry)
+        if is_telemetry_stream(stream):
+            telemetry.append(entry)
+        if is_gps_stream(stream):
+            gps_tracks.append(entry)
+        if video is None and stream.get("codec_type") == "video" \
+                and not stream.get("disposition", {}).get("attached_pic"):
+            video = stream
+
+    info = {
+        "duration": _float(ffprobe_info.get("format", {}).get("duration")),
+        "width": None,
+        "height": None,
+        "fps": None,
+        "codec": None,
+        "frame_count": None,
+        "rotation": 0,
+        "streams": streams,
+        "telemetry_tracks": telemetry,
+        "has_telemetry": bool(telemetry),
+        "gps_tracks": gps_tracks,
+        "has_gps": bool(gps_tracks),
+        "make": None,
+        "model": None,
+    }
+    if video is not None:
+        fps = _rate(video.get("avg_frame_rate")) or _rate(video.get("r_frame_rate"))
+        duration = _float(video.get("duration")) or info["duration"]
+        frames = video.get("nb_frames")
+        info.update({
+            "width": video.get("width"),
+            "height": video.get("height"),
+            "fps": round(fps, 3) if fps else None,
+            "codec": video.get("codec_name"),
+            "rotation": stream_rotation(video),
+            # Containers without a frame count are estimated from the duration
+            "frame_count": int(frames) if str(frames or "").isdigit()
+            else (int(round(duration * fps)) if duration and fps else None),
+        })
+
+    if exif_info:
+        for key, value in exif_info.items():
+            name = key.split(":")[-1]
+            if name in GPS_POSITION_TAGS and _has_position(value):
+                info["has_gps"] = True
+            elif name == "Make" and info["make"] is None:
+                info["make"] = str(value)
+            elif name == "Model" and info["model"] is None:
+                info["model"] = str(value)
+    return info
+
+def probe_media(video_path, use_cache=True, cache_dir=None, timeout=120.0):
+    """Probe a video with ffprobe and ExifTool running concurrently and return a summary dict
+
+    Results are kept in memory and on disk, keyed by path, size and
+    modification time, so unchanged files are only probed once. ExifTool
+    only reads the container-level tags here (no -ee scan of the whole
+    file); telemetry tracks are recognised from the stream layout.
+    has_gps needs a position tag or a track type known to carry GPS, while
+    has_telemetry reports any telemetry track.
+    """
+    key, stat = probe_key(video_path)
+    cache_file = os.path.join(cache_dir or probe_cache_dir(), f"{key}.json")
+    if use_cache:
+        with _memory_lock:
+            if key in _memory_cache:
+                return _memory_cache[key]
+        info = _read_cached(cache_file)
+        if info is not None:
+            with _memory_lock:
+                _memory_cache[key] = info
+            return info
+
+    supervisor = get_supervisor()
+    ffprobe_lines, exif_lines = [], []
+    ffprobe = supervisor.submit([
+        "ffprobe", "-v", "error", "-print_format", "json",
+        "-show_format", "-show_streams", video_path
+    ], on_stdout=ffprobe_lines.append, timeout=timeout)
+    exiftool = supervisor.submit([
+        "exiftool", "-json", "-n", "-G1", "-api", "LargeFileSupport=1", video_path
+    ], on_stdout=exif_lines.append, timeout=timeout)
+
+    ffprobe.result()
+    try:
+        exiftool.result()
+        exif_info = json.loads("\n".join(exif_lines))[0]
+    except Exception:
+        # ExifTool is optional; GPS presence then only comes from the stream layout
+        exif_info = None
+
+    info = summarize(json.loads("\n".join(ffprobe_lines)), exif_info)
+    info.update({"path": os.path.abspath(video_path), "size": stat.st_size, "mtime": stat.st_mtime})
+    if use_cache:
+        _write_cached(cache_file, info)
+        with _memory_lock:
+            _memory_cache[key] = info
+    return info
@@ -0,0 +1,390 @@
+import json
+import struct
+import numpy as np
+
+# Rows converted and written per step; bounds the temporary memory of a write
+CHUNK_SIZE = 1 << 20
+
+GLB_MAGIC = 0x46546C67
+GLB_CHUNK_JSON = 0x4E4F534A
+GLB_CHUNK_BIN = 0x004E4942
+
+# glTF component types
+BYTE = 5120
+UNSIGNED_BYTE = 5121
+UNSIGNED_SHORT = 5123
+UNSIGNED_INT = 5125
+FLOAT = 5126
+
+# PLY property types and their numpy equivalents (byte order is added per file)
+PLY_TYPES = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4", "double": "f8", "float64": "f8",
+}
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+# Allows the integer position and normal types used by compact GLB files
+MESH_QUANTIZATION = "KHR_mesh_quantization"
+
+# Grid resolution per axis of the Morton codes used to order triangles
+MORTON_BITS = 10
+
+class MeshBuffers:
+    """Flat mesh arrays as pulled from Blender: positions, triangles and optional normals/colors
+
+    vertices are (N, 3) float32, faces (M, 3) integer triangles, normals
+    (N, 3) float32 and colors (N, 4) uint8 sRGB, all per vertex.
+    """
+
+    def __init__(self, vertices, faces=None, normals=None, colors=None):
+        self.vertices = np.asarray(vertices, dtype=np.float32).reshape(-1, 3)
+        self.faces = None if faces is None else np.asarray(faces).reshape(-1, 3)
+        self.normals = None if normals is None else np.asarray(normals, dtype=np.float32).reshape(-1, 3)
+        self.colors = None if colors is None else np.asarray(colors, dtype=np.uint8).reshape(-1, 4)
+
+    @property
+    def vertex_count(self):
+        return len(self.vertices)
+
+    @property
+    def face_count(self):
+        return 0 if self.faces is None else len(self.faces)
+
+def _write_chunked(f, array, dtype, transform=None, chunk_size=CHUNK_SIZE):
+    """Write array rows to f in chunks, converting each chunk to dtype on the way"""
+    for start in range(0, len(array), chunk_size):
+        chunk = array[start:start + chunk_size]
+        if transform is not None:
+            chunk = transform(chunk)
+        f.write(np.ascontiguousarray(chunk, dtype=dtype).tobytes())
+
+def _pad4(length):
+    return (4 - length % 4) % 4
+
+def write_ply(output_file, mesh, chunk_size=CHUNK_SIZE):
+    """Write a binary little-endian PLY file chunk by chunk"""
+    properties = [("x", "<f4"), ("y", "<f4"), ("z", "<f4")]
+    header = ["ply", "format binary_little_endian 1.0", "comment Drone Video to 3D",
+              f"element vertex {mesh.vertex_count}",
+              "property float x", "property float y", "property float z"]
+    if mesh.normals is not None:
+        properties += [("nx", "<f4"), ("ny", "<f4"), ("nz", "<f4")]
+        header += ["property float nx", "property float ny", "property float nz"]
+    if mesh.colors is not None:
+        properties += [("red", "u1"), ("green", "u1"), ("blue", "u1"), ("alpha", "u1")]
+        header += ["property uchar red", "property uchar green", "property uchar blue", "property uchar alpha"]
+    header += [f"element face {mesh.face_count}", "property list uchar int vertex_indices", "end_header"]
+
+    vertex_dtype = np.dtype(properties)
+    face_dtype = np.dtype([("count", "u1"), ("indices", "<i4", (3,))])
+    with open(output_file, 'wb') as f:
+        f.write(("\n".join(header) + "\n").encode("ascii"))
+
+        for start in range(0, mesh.vertex_count, chunk_size):
+            end = min(start + chunk_size, mesh.vertex_count)
+            record = np.empty(end - start, dtype=vertex_dtype)
+            record["x"], record["y"], record["z"] = mesh.vertices[start:end].T
+            if mesh.normals is not None:
+                record["nx"], record["ny"], record["nz"] = mesh.normals[start:end].T
+            if mesh.colors is not None:
+                record["red"], record["green"], record["blue"], record["alpha"] = mesh.colors[start:end].T
+            f.write(record.tobytes())
+
+        for start in range(0, mesh.face_count, chunk_size):
+            end = min(start + chunk_size, mesh.face_count)
+            record = np.empty(end - start, dtype=face_dtype)
+            record["count"] = 3
+            record["indices"] = mesh.faces[start:end]
+            f.write(record.tobytes())
+    return output_file
+
+def _ply_header(f):
+    """Read a PLY header and return (format, [(element, count, [(property, type or list types)])])"""
+    if f.readline().strip() != b"ply":
+        raise ValueError("Not a PLY file")
+    file_format = None
+    elements = []
+    while True:
+        line = f.readline()
+        if not line:
+            raise ValueError("PLY header has no end_header")
+        words = line.decode("ascii", errors="replace").split()
+        if not words or words[0] in ("comment", "obj_info"):
+            continue
+        if words[0] == "format":
+            file_format = words[1]
+        elif words[0] == "element":
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == "property":
+            if words[1] == "list":
+                elements[-1][2].append((words[4], (words[2], words[3])))
+            else:
+                elements[-1][2].append((words[2], words[1]))
+        elif words[0] == "end_header":
+            return file_format, elements
+
+def _read_ply_element(f, file_format, count, properties):
+    """Read one element into a structured array (list properties must hold triangles)"""
+    if file_format == "ascii":
+        rows = np.array([f.readline().split() for _ in range(count)], dtype=np.float64).reshape(count, -1)
+        columns = {}
+        column = 0
+        for name, kind in properties:
+            if isinstance(kind, tuple):
+                if count and not np.all(rows[:, column] == 3):
+                    raise ValueError("Only triangle faces are supported")
+                columns[name] = rows[:, column + 1:column + 4]
+                column += 4
+            else:
+                columns[name] = rows[:, column]
+                column += 1
+        return columns
+
+    order = "<" if file_format == "binary_little_endian" else ">"
+    fields = []
+    for name, kind in properties:
+        if isinstance(kind, tuple):
+            fields += [(f"{name}__count", order + PLY_TYPES[kind[0]]), (name, order + PLY_TYPES[kind[1]], (3,))]
+        else:
+            fields.append((name, order + PLY_TYPES[kind]))
+    dtype = np.dtype(fields)
+    data = np.frombuffer(f.read(count * dtype.itemsize), dtype=dtype, count=count)
+    for name, kind in properties:
+        if isinstance(kind, tuple) and count and not np.all(data[f"{name}__count"] == 3):
+            raise ValueError("Only triangle faces are supported")
+    return {name: data[name] for name, _ in properties}
+
+def read_ply(input_file):
+    """Read an ASCII or binary PLY mesh or point cloud into MeshBuffers
+
+    Binary elements are read with a single structured-array read each, so
+    multi-million point clouds such as COLMAP's fused.ply load at disk
+    speed. Faces must be triangles.
+    """
+    with open(input_file, 'rb') as f:
+        file_format, elements = _ply_header(f)
+        data = {}
+        for name, count, properties in elements:
+            data[name] = _read_ply_element(f, file_format, count, properties)
+
+    vertex = data.get("vertex", {})
+    if not all(axis in vertex for axis in ("x", "y", "z")):
+        raise ValueError("PLY file has no vertex positions")
+    vertices = np.column_stack([vertex["x"], vertex["y"], vertex["z"]])
+    normals = None
+    if all(axis in vertex for axis in ("nx", "ny", "nz")):
+        normals = np.column_stack([vertex["nx"], vertex["ny"], vertex["nz"]])
+    colors = None
+    if all(channel in vertex for channel in ("red", "green", "blue")):
+        alpha = vertex.get("alpha", np.full(len(vertices), 255))
+        colors = np.column_stack([vertex["red"], vertex["green"], vertex["blue"], alpha])
+    faces = None
+    face = data.get("face", {})
+    for name in ("vertex_indices", "vertex_index"):
+        if name in face:
+            faces = np.asarray(face[name]).astype(np.uint32).reshape(-1, 3)
+    return MeshBuffers(vertices, faces, normals, colors)
+
+def srgb_to_linear(values):
+    """Convert sRGB channel values in [0, 1] to linear"""
+    values = np.asarray(values, dtype=np.float32)
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4).astype(np.float32)
+
+def linear_to_srgb(values):
+    """Convert linear channel values in [0, 1] to sRGB"""
+    values = np.clip(np.asarray(values, dtype=np.float32), 0.0, 1.0)
+    return np.where(values <= 0.0031308, values * 12.92, 1.055 * values ** (1.0 / 2.4) - 0.055).astype(np.float32)
+
+# sRGB byte -> linear byte lookup for glTF COLOR_0, which is linear
+SRGB_TO_LINEAR_BYTES = np.round(srgb_to_linear(np.arange(256) / 255.0) * 255.0).astype(np.uint8)
+
+def linear_color_bytes(colors):
+    """Convert (N, 4) sRGB color bytes to linear bytes, leaving alpha alone"""
+    converted = np.array(colors, dtype=np.uint8)
+    converted[:, :3] = SRGB_TO_LINEAR_BYTES[converted[:, :3]]
+    return converted
+
+def z_up_to_y_up(vectors):
+    """Convert Blender's Z-up axes to glTF's Y-up axes: (x, y, z) -> (x, z, -y)"""
+    return np.stack([vectors[:, 0], vectors[:, 2], -vectors[:, 1]], axis=1)
+
+def _spread_bits(values):
+    """Insert two zero bits between each of the low 21 bits of uint64 values"""
+    values = values & np.uint64(0x1fffff)
+    for shift, mask in ((32, 0x1f00000000ffff), (16, 0x1f0000ff0000ff), (8, 0x100f00f00f00f00f),
+                        (4, 0x10c30c30c30c30c3), (2, 0x1249249249249249)):
+        values = (values | values << np.uint64(shift)) & np.uint64(mask)
+    return values
+
+def morton_codes(points, lower, upper, bits=MORTON_BITS):
+    """Return uint64 Z-order codes of (N, 3) points on a 2**bits grid spanning lower..upper"""
+    extent = np.asarray(upper, dtype=np.float64) - lower
+    scale = ((1 << bits) - 1) / np.where(extent > 0, extent, 1.0)
+    cells = np.clip((np.asarray(points, dtype=np.float64) - lower) * scale, 0, (1 << bits) - 1).astype(np.uint64)
+    return (_spread_bits(cells[:, 0]) | _spread_bits(cells[:, 1]) << np.uint64(1)
+            | _spread_bits(cells[:, 2]) << np.uint64(2))
+
+def reorder_for_locality(mesh, chunk_size=CHUNK_SIZE):
+    """Return the mesh with triangles in Z-order and vertices renumbered by first use
+
+    Neighbouring triangles then share recently used vertices, which keeps
+    the GPU post-transform cache warm, and vertex fetches walk the buffers
+    mostly forward. Vertices not used by any triangle are kept at the end.
+    """
+    if mesh.vertex_count == 0:
+        return mesh
+    lower, upper = mesh.vertices.min(axis=0), mesh.vertices.max(axis=0)
+    if not mesh.face_count:
+        order = np.argsort(morton_codes(mesh.vertices, lower, upper), kind="stable")
+        return MeshBuffers(mesh.vertices[order], None,
+                           None if mesh.normals is None else mesh.normals[order],
+                           None if mesh.colors is None else mesh.colors[order])
+
+    codes = np.empty(mesh.face_count, dtype=np.uint64)
+    for start in range(0, mesh.face_count, chunk_size):
+        centroids = mesh.vertices[mesh.faces[start:start + chunk_size]].mean(axis=1)
+        codes[start:start + chunk_size] = morton_codes(centroids, lower, upper)
+    faces = mesh.faces[np.argsort(codes, kind="stable")]
+
+    used, first = np.unique(faces.ravel(), return_index=True)
+    order = used[np.argsort(first)]
+    if len(order) < mesh.vertex_count:
+        order = np.concatenate([order, np.setdiff1d(np.arange(mesh.vertex_count), used)])
+    remap = np.empty(mesh.vertex_count, dtype=np.uint32)
+    remap[order] = np.arange(mesh.vertex_count, dtype=np.uint32)
+    return MeshBuffers(
+        mesh.vertices[order], remap[faces],
+        None if mesh.normals is None else mesh.normals[order],
+        None if mesh.colors is None else mesh.colors[order]
+    )
+
+def write_glb(output_file, mesh, chunk_size=CHUNK_SIZE, name="drone_model", compact=False):
+    """Write a single-mesh binary glTF (GLB) file chunk by chunk
+
+    The JSON header only needs array sizes and position bounds, so it is
+    written first and the buffers are streamed after it without ever
+    assembling the binary chunk in memory.
+
+    With compact=True triangles are reordered for vertex cache locality,
+    positions are stored as 16-bit integers relative to the mesh bounds
+    (the node's translation and uniform scale dequantize them), normals as
+    normalized 8-bit integers and indices in the smallest type that fits,
+    using KHR_mesh_quantization. Colors are always 8-bit and converted
+    from sRGB to the linear values glTF expects.
+    """
+    if compact:
+        mesh = reorder_for_locality(mesh, chunk_size)
+    count = mesh.vertex_count
+    index_type, index_dtype, index_size = ((UNSIGNED_SHORT, "<u2", 2) if count < 65536
+                                           else (UNSIGNED_INT, "<u4", 4))
+
+    # Bounds in glTF axes straight from the Z-up bounds, without a converted copy
+    lower = mesh.vertices.min(axis=0) if count else np.zeros(3)
+    upper = mesh.vertices.max(axis=0) if count else np.zeros(3)
+    gltf_lower = np.array([lower[0], lower[2], -upper[1]], dtype=np.float64)
+    gltf_upper = np.array([upper[0], upper[2], -lower[1]], dtype=np.float64)
+    node = {"mesh": 0, "name": name}
+
+    # (array, dtype, bytes per element, transform, accessor) for every buffer view in write order
+    views = []
+    if compact:
+        extent = gltf_upper - gltf_lower
+        # One step for all axes: a non-uniform node scale would skew the normals in viewers
+        step = extent.max() / 65535.0 if extent.max() > 0 else 1.0
+
+        def quantize_positions(chunk):
+            packed = np.zeros((len(chunk), 4), dtype=np.uint16)
+            packed[:, :3] = np.clip(np.round((z_up_to_y_up(chunk) - gltf_lower) / step), 0, 65535)
+            return packed
+
+        # Rows are padded to 8 bytes so every vertex starts on a 4-byte boundary
+        views.append((mesh.vertices, "<u2", 8, quantize_positions, {
+            "componentType": UNSIGNED_SHORT, "type": "VEC3",
+            "min": [0, 0, 0], "max": np.round(extent / step).astype(int).tolist()
+        }))
+        node["translation"] = gltf_lower.tolist()
+        node["scale"] = [float(step)] * 3
+    else:
+        views.append((mesh.vertices, "<f4", 12, z_up_to_y_up, {
+            "componentType": FLOAT, "type": "VEC3",
+            "min": gltf_lower.tolist(), "max": gltf_upper.tolist()
+        }))
+    attributes = {"POSITION": 0}
+    if mesh.normals is not None:
+        attributes["NORMAL"] = len(views)
+        if compact:
+            def quantize_normals(chunk):
+                packed = np.zeros((len(chunk), 4), dtype=np.int8)
+                packed[:, :3] = np.round(np.clip(z_up_to_y_up(chunk), -1.0, 1.0) * 127.0)
+                return packed
+
+            views.append((mesh.normals, "i1", 4, quantize_normals,
+                          {"componentType": BYTE, "normalized": True, "type": "VEC3"}))
+        else:
+            views.append((mesh.normals, "<f4", 12, z_up_to_y_up, {"componentType": FLOAT, "type": "VEC3"}))
+    if mesh.colors is not None:
+        attributes["COLOR_0"] = len(views)
+        views.append((mesh.colors, "u1", 4, linear_color_bytes,
+                      {"componentType": UNSIGNED_BYTE, "normalized": True, "type": "VEC4"}))
+    vertex_views = len(views)
+    primitive = {"attributes": attributes, "mode": 4 if mesh.face_count else 0}
+    if mesh.face_count:
+        primitive["indices"] = len(views)
+        views.append((mesh.faces, index_dtype, 3 * index_size, None,
+                      {"componentType": index_type, "type": "SCALAR"}))
+
+    buffer_views = []
+    accessors = []
+    offset = 0
+    for view, (array, dtype, row_size, _, accessor) in enumerate(views):
+        length = len(array) * row_size
+        buffer_view = {"buffer": 0, "byteOffset": offset, "byteLength": length}
+        if view < vertex_views:
+            buffer_view["target"] = ARRAY_BUFFER
+            if compact:
+                buffer_view["byteStride"] = row_size
+        else:
+            buffer_view["target"] = ELEMENT_ARRAY_BUFFER
+        buffer_views.append(buffer_view)
+        count_in_view = len(array) * 3 if accessor["type"] == "SCALAR" else len(array)
+        accessors.append({"bufferView": view, "count": count_in_view, **accessor})
+        offset += length + _pad4(length)
+    bin_length = offset
+
+    document = {
+        "asset": {"version": "2.0", "generator": "Drone Video to 3D"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [node],
+        "meshes": [{"name": name, "primitives": [primitive]}],
+        "accessors": accessors,
+        "bufferViews": buffer_views,
+        "buffers": [{"byteLength": bin_length}],
+    }
+    if compact:
+        document["extensionsUsed"] = [MESH_QUANTIZATION]
+        document["extensionsRequired"] = [MESH_QUANTIZATION]
+    json_bytes = json.dumps(document, separators=(',', ':')).encode("utf-8")
+    json_bytes += b" " * _pad4(len(json_bytes))
+
+    with open(output_file, 'wb') as f:
+        f.write(struct.pack("<III", GLB_MAGIC, 2, 12 + 8 + len(json_bytes) + 8 + bin_length))
+        f.write(struct.pack("<II", len(json_bytes), GLB_CHUNK_JSON))
+        f.write(json_bytes)
+        f.write(struct.pack("<II", bin_length, GLB_CHUNK_BIN))
+        for array, dtype, row_size, transform, _ in views:
+            _write_chunked(f, array, dtype, transform, chunk_size)
+            f.write(b"\0" * _pad4(len(array) * row_size))
+    return output_file
+
+def write_mesh(output_file, mesh, file_format, compact=False):
+    """Write mesh buffers as 'PLY' or 'GLB'; compact GLB files use quantized attributes"""
+    if file_format == 'PLY':
+        return write_ply(output_file, reorder_for_locality(mesh) if compact else mesh)
+    if file_format == 'GLB':
+        return write_glb(output_file, mesh, compact=compact)
+    raise ValueError(f"Unsupported mesh format: {file_format}")
@@ -0,0 +1,151 @@
+import os
+import numpy as np
+
+from . import mesh_io
+from .mesh_io import MeshBuffers, CHUNK_SIZE
+
+# Accept a simplified level whose face count is within this fraction of the target
+LOD_TOLERANCE = 0.15
+
+def grid_keys(vertices, origin, cell_size):
+    """Return one int64 key per vertex identifying its grid cell"""
+    cells = np.floor((vertices - origin) / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    dims = cells.max(axis=0) + 1
+    return (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+
+def _unique_triangles(faces, count):
+    """Return the sorted indices of the first occurrence of every distinct triangle, ignoring winding"""
+    ordered = np.sort(faces, axis=1).astype(np.int64)
+    if count < 1 << 21:
+        # Three 21-bit cluster ids pack into one int64, which sorts far faster than rows
+        keys = (ordered[:, 0] << 42) | (ordered[:, 1] << 21) | ordered[:, 2]
+        _, first = np.unique(keys, return_index=True)
+    else:
+        _, first = np.unique(ordered, axis=0, return_index=True)
+    return np.sort(first)
+
+def cluster_vertices(mesh, cell_size, origin=None, chunk_size=CHUNK_SIZE):
+    """Vertex-clustering simplification: merge all vertices that share a grid cell
+
+    Each cell is represented by the mean of its vertices (and colors);
+    triangles that collapse or become duplicates are dropped. Everything is
+    done with array operations, so the cost is a few passes over the
+    buffers regardless of mesh size. Triangles are remapped in chunks and
+    only the survivors are kept, so temporary memory stays proportional to
+    the simplified mesh rather than the input.
+    """
+    if mesh.vertex_count == 0 or cell_size <= 0:
+        return mesh
+    origin = mesh.vertices.min(axis=0) if origin is None else origin
+    keys = grid_keys(mesh.vertices, origin, cell_size)
+    unique_keys, cluster = np.unique(keys, return_inverse=True)
+    del keys
+    count = len(unique_keys)
+    cluster = cluster.reshape(-1).astype(np.uint32 if count < 1 << 32 else np.int64)
+    weights = np.bincount(cluster, minlength=count).astype(np.float64)
+
+    vertices = np.empty((count, 3), dtype=np.float32)
+    for axis in range(3):
+        vertices[:, axis] = np.bincount(cluster, mesh.vertices[:, axis], minlength=count) / weights
+
+    colors = None
+    if mesh.colors is not None:
+        colors = np.empty((count, 4), dtype=np.uint8)
+        for channel in range(4):
+            colors[:, channel] = np.round(
+                np.bincount(cluster, mesh.colors[:, channel], minlength=count) / weights
+            )
+
+    normals = None
+    if mesh.normals is not None:
+        normals = np.empty((count, 3), dtype=np.float64)
+        for axis in range(3):
+            normals[:, axis] = np.bincount(cluster, mesh.normals[:, axis], minlength=count)
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        normals = (normals / np.where(lengths > 0, lengths, 1.0)).astype(np.float32)
+
+    faces = None
+    if mesh.faces is not None:
+        kept = []
+        for start in range(0, mesh.face_count, chunk_size):
+            chunk = cluster[mesh.faces[start:start + chunk_size]]
+            keep = (chunk[:, 0] != chunk[:, 1]) & (chunk[:, 1] != chunk[:, 2]) & (chunk[:, 0] != chunk[:, 2])
+            kept.append(chunk[keep])
+        faces = np.concatenate(kept) if kept else np.empty((0, 3), dtype=cluster.dtype)
+        # Drop triangles that collapsed onto the same three clusters
+        if len(faces):
+            faces = faces[_unique_triangles(faces, count)]
+        faces = faces.astype(np.uint32)
+
+    return MeshBuffers(vertices, faces, normals, colors)
+
+def submesh(mesh, face_indices):
+    """Extract the given triangles and only the vertices they use"""
+    faces = mesh.faces[face_indices]
+    used, remapped = np.unique(faces, return_inverse=True)
+    return MeshBuffers(
+        mesh.vertices[used],
+        remapped.reshape(-1, 3).astype(np.uint32),
+        None if mesh.normals is None else mesh.normals[used],
+        None if mesh.colors is None else mesh.colors[used]
+    )
+
+def surface_area(mesh, chunk_size=CHUNK_SIZE):
+    """Total triangle area, computed in chunks"""
+    area = 0.0
+    for start in range(0, mesh.face_count, chunk_size):
+        corners = mesh.vertices[mesh.faces[start:start + chunk_size]].astype(np.float64)
+        cross = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        area += 0.5 * float(np.linalg.norm(cross, axis=1).sum())
+    return area
+
+def simplify_to_face_count(mesh, target_faces, tolerance=LOD_TOLERANCE, max_iterations=4):
+    """Vertex-cluster mesh down to roughly target_faces triangles
+
+    A surface clustered on a grid of cell size c keeps about area / c**2
+    vertices and twice as many triangles, which gives the first cell size;
+    each further pass corrects it by the square root of the miss. Returns
+    the closest result found.
+    """
+    if mesh.face_count <= target_faces:
+        return mesh
+    area = surface_area(mesh)
+    if area <= 0.0:
+        return mesh
+    cell_size = np.sqrt(2.0 * area / max(target_faces, 1))
+    best = None
+    for _ in range(max_iterations):
+        simplified = cluster_vertices(mesh, cell_size)
+        if best is None or abs(simplified.face_count - target_faces) < abs(best.face_count - target_faces):
+            best = simplified
+        if abs(simplified.face_count - target_faces) <= tolerance * target_faces:
+            break
+        cell_size *= np.sqrt(max(simplified.face_count, 1) / target_faces)
+    return best
+
+def lod_chain(mesh, levels, reduction=4.0):
+    """Yield (level, mesh) for level 1..levels, each with 1/reduction of the previous level's faces
+
+    Every level is simplified from the one before it, so the work and
+    memory shrink geometrically after the first full-resolution pass.
+    """
+    current = mesh
+    for level in range(1, levels + 1):
+        target = int(mesh.face_count / reduction ** level)
+        if target < 4:
+            break
+        current = simplify_to_face_count(current, target)
+        yield level, current
+
+def write_lods(model_file, mesh, file_format, levels, reduction=4.0, compact=False, log=print):
+    """Write simplified levels next to model_file as <name>_lod<level>.<ext> and return their paths"""
+    stem, extension = os.path.splitext(model_file)
+    files = []
+    for level, simplified in lod_chain(mesh, levels, reduction):
+        lod_file = f"{stem}_lod{level}{extension}"
+        mesh_io.write_mesh(lod_file, simplified, file_format, compact)
+        log(f"LOD {level}: {simplified.face_count} faces "
+            f"({100.0 * simplified.face_count / max(mesh.face_count, 1):.1f}%) -> {lod_file}")
+        files.append(lod_file)
+    return files
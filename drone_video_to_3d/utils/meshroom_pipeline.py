@@ -0,0 +1,245 @@
+import os
+import re
+import json
+import math
+import queue
+import shutil
+import xml.etree.ElementTree as ET
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from .process_supervisor import get_supervisor, run_tool
+
+# Environment variable that points at meshroom_batch when it is not in PATH
+MESHROOM_ENV = "DRONEVIDEO3D_MESHROOM"
+
+CACHE_NAME = "MeshroomCache"
+OUTPUT_NAME = "meshroom_output"
+GRAPH_NAME = "meshroom_project.mg"
+
+# Executable names of the batch tool, newest first
+BATCH_EXECUTABLES = ("meshroom_batch", "meshroom_photogrammetry")
+
+# Attribute links in a saved graph, e.g. "{CameraInit_1.output}"
+NODE_LINK = re.compile(r"\{(\w+)\.\w+\}")
+
+# Progress lines meshroom_compute prints for a chunk: "[1/1] DepthMap_1" when
+# it starts and " - elapsed time: 0:01:23.45" when it is done
+COMPUTE_STARTED = re.compile(r"^\s*\[(\d+)/(\d+)\]\s+(\w+)")
+COMPUTE_ELAPSED = re.compile(r"^\s*-\s*elapsed time:\s*(\S+)")
+
+# Seconds between checks for chunk progress while a node is computing
+PROGRESS_POLL_INTERVAL = 0.5
+
+def find_meshroom(configured=""):
+    """Return the meshroom_batch executable: the configured path, $DRONEVIDEO3D_MESHROOM or PATH"""
+    for candidate in (configured, os.environ.get(MESHROOM_ENV, "")):
+        if candidate:
+            return os.path.abspath(os.path.expanduser(candidate))
+    for name in BATCH_EXECUTABLES:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+def compute_executable(batch_executable):
+    """Return meshroom_compute from the same installation as meshroom_batch"""
+    directory, name = os.path.split(batch_executable)
+    for batch_name in BATCH_EXECUTABLES:
+        if name.startswith(batch_name):
+            return os.path.join(directory, "meshroom_compute" + name[len(batch_name):])
+    return os.path.join(directory, "meshroom_compute")
+
+def parse_parallelism(text, default=1):
+    """Parse 'FeatureExtraction=4, DepthMap=1, *=2' into ({node_type: workers}, default)"""
+    limits = {}
+    for item in re.split(r"[,;\s]+", text or ""):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        if name == "*":
+            default = max(1, int(value))
+        else:
+            limits[name] = max(1, int(value))
+    return limits, default
+
+def sensor_overrides(sensor_data_xml):
+    """Derive CameraInit parameter overrides from the intrinsics in sensor_data.xml
+
+    Extracted frames carry no EXIF, so without this CameraInit falls back to
+    a generic field of view for every frame.
+    """
+    if not sensor_data_xml or not os.path.exists(sensor_data_xml):
+        return []
+    view = ET.parse(sensor_data_xml).getroot().find("View")
+    if view is None:
+        return []
+    metadata = {m.get("key"): m.text for m in view.findall("metadata")}
+    try:
+        focal_length = float(metadata.get("FocalLength") or 0)
+        sensor_width = float(metadata.get("SensorWidth") or 0)
+    except ValueError:
+        return []
+    if focal_length <= 0 or sensor_width <= 0:
+        return []
+    fov = math.degrees(2.0 * math.atan(sensor_width / (2.0 * focal_length)))
+    return [f"CameraInit:defaultFieldOfView={fov:.3f}"]
+
+def build_graph(meshroom, frames_dir, photo_dir, param_overrides=(), pipeline="photogrammetry"):
+    """Create the Meshroom graph for the frames without computing it and return the graph path
+
+    The cache folder is fixed inside photo_dir, so node UIDs (and with them
+    the cached results) stay the same between runs on unchanged inputs.
+    """
+    graph_file = os.path.join(photo_dir, GRAPH_NAME)
+    cmd = [
+        meshroom,
+        "--input", frames_dir,
+        "--output", os.path.join(photo_dir, OUTPUT_NAME),
+        "--cache", os.path.join(photo_dir, CACHE_NAME),
+        "--pipeline", pipeline,
+        "--save", graph_file,
+        "--compute", "no",
+    ]
+    if param_overrides:
+        cmd += ["--paramOverrides", *param_overrides]
+    run_tool(cmd, echo=True)
+    return graph_file
+
+def _links(value):
+    """Yield the names of the nodes an attribute value refers to"""
+    if isinstance(value, str):
+        yield from NODE_LINK.findall(value)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _links(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _links(item)
+
+def load_graph(graph_file):
+    """Read a saved graph and return its nodes in dependency order as (name, node) pairs"""
+    with open(graph_file) as f:
+        nodes = json.load(f)["graph"]
+    depends = {name: {link for link in _links(node.get("inputs", {})) if link in nodes}
+               for name, node in nodes.items()}
+    ordered = []
+    done = set()
+    while len(ordered) < len(nodes):
+        ready = sorted(name for name in nodes if name not in done and depends[name] <= done)
+        if not ready:
+            raise ValueError(f"Meshroom graph {graph_file} has a dependency cycle")
+        for name in ready:
+            ordered.append((name, nodes[name]))
+            done.add(name)
+    return ordered
+
+def chunk_count(node):
+    return max(1, int(node.get("parallelization", {}).get("split", 1) or 1))
+
+def chunk_is_complete(cache_dir, node, chunk, chunks):
+    """Check the status file Meshroom keeps for a node chunk in the cache"""
+    uid = node.get("uids", {}).get("0")
+    if not uid:
+        return False
+    status_name = "status" if chunks == 1 else f"{chunk}.status"
+    status_file = os.path.join(cache_dir, node["nodeType"], uid, status_name)
+    try:
+        with open(status_file) as f:
+            return json.load(f).get("status") == "SUCCESS"
+    except (OSError, ValueError):
+        return False
+
+def parse_compute_line(line):
+    """Return ("started", None) or ("finished", elapsed) for a meshroom_compute progress line, else None"""
+    if COMPUTE_STARTED.match(line):
+        return "started", None
+    match = COMPUTE_ELAPSED.match(line)
+    if match:
+        return "finished", match.group(1)
+    return None
+
+def chunk_progress(label, messages):
+    """Return an output callback that queues progress messages of one chunk under label
+
+    Output callbacks run on the supervisor's thread, so the messages are
+    logged later by the thread waiting for the chunks.
+    """
+    def on_line(line):
+        progress = parse_compute_line(line)
+        if progress is None:
+            return
+        state, elapsed = progress
+        messages.put(f"{label}: started" if state == "started" else f"{label}: finished in {elapsed}")
+    return on_line
+
+def _log_queued(messages, log):
+    while True:
+        try:
+            log(messages.get_nowait())
+        except queue.Empty:
+            return
+
+def run_meshroom_pipeline(frames_dir, photo_dir, sensor_data_xml=None, meshroom=None, parallelism="",
+                          param_overrides=(), log=print):
+    """Run the Meshroom photogrammetry pipeline node by node and return the output directory
+
+    The graph is built once with meshroom_batch; every node chunk is then
+    computed with meshroom_compute. Chunks whose status in MeshroomCache is
+    already SUCCESS are skipped, so re-runs only compute what changed, and
+    up to the configured number of chunks of the same node run at once
+    (parallelism: 'NodeType=workers' pairs with '*' as the default).
+    Chunk start and completion are passed to log as they are printed.
+    """
+    meshroom = meshroom or find_meshroom()
+    if not meshroom:
+        raise FileNotFoundError(f"meshroom_batch not found; set ${MESHROOM_ENV} or the Meshroom path")
+    cache_dir = os.path.join(photo_dir, CACHE_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    overrides = sensor_overrides(sensor_data_xml) + list(param_overrides)
+    graph_file = build_graph(meshroom, frames_dir, photo_dir, overrides)
+    nodes = load_graph(graph_file)
+    limits, default_workers = parse_parallelism(parallelism)
+    compute = compute_executable(meshroom)
+    supervisor = get_supervisor()
+    messages = queue.Queue()
+
+    for index, (name, node) in enumerate(nodes, 1):
+        chunks = chunk_count(node)
+        pending = [c for c in range(chunks) if not chunk_is_complete(cache_dir, node, c, chunks)]
+        if not pending:
+            log(f"[{index}/{len(nodes)}] {name}: cached")
+            continue
+        workers = limits.get(node["nodeType"], default_workers)
+        log(f"[{index}/{len(nodes)}] {name}: computing {len(pending)} of {chunks} chunks, {workers} at a time")
+        # A tool class per node lets its chunks run side by side up to the node's own limit
+        tool = f"meshroom.{name}.{workers}"
+        supervisor.limits[tool] = workers
+        futures = []
+        for chunk in pending:
+            cmd = [compute, graph_file, "--node", name, "--cache", cache_dir]
+            label = f"[{index}/{len(nodes)}] {name}"
+            if chunks > 1:
+                cmd += ["--iteration", str(chunk)]
+                label += f" chunk {chunk + 1}/{chunks}"
+            futures.append(supervisor.submit(cmd, tool=tool, echo=True, on_stdout=chunk_progress(label, messages)))
+        remaining = set(futures)
+        done = 0
+        while remaining:
+            finished, remaining = wait(remaining, timeout=PROGRESS_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            _log_queued(messages, log)
+            for future in finished:
+                future.result()
+                done += 1
+                if len(futures) > 1:
+                    log(f"[{index}/{len(nodes)}] {name}: {done} of {len(futures)} chunks done")
+    return os.path.join(photo_dir, OUTPUT_NAME)
+
+def find_textured_mesh(photo_dir):
+    """Return the textured OBJ from the Meshroom output or cache, or None"""
+    for directory in (os.path.join(photo_dir, OUTPUT_NAME), os.path.join(photo_dir, CACHE_NAME, "Texturing")):
+        for root, _, files in os.walk(directory):
+            for file in sorted(files):
+                if file.endswith(".obj"):
+                    return os.path.join(root, file)
+    return None
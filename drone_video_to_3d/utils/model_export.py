@@ -0,0 +1,80 @@
+import os
+import bpy
+
+from . import mesh_io
+from . import mesh_simplify
+from . import scene_builder
+from . import tiled_export
+from . import trajectory
+from . import georeferencing
+
+MODEL_OBJECT = "DroneScan_Model"
+
+# Formats that can be exported and the file (or directory) name each one produces
+EXPORT_FORMATS = ('OBJ', 'PLY', 'GLB', 'TILES')
+
+def model_path(export_dir, file_format):
+    """Return the output path of the model in the given format"""
+    if file_format == 'TILES':
+        return os.path.join(export_dir, "drone_model_tiles")
+    return os.path.join(export_dir, f"drone_model.{file_format.lower()}")
+
+def export_model(model_obj, settings, file_format, export_dir, georeferenced=False, log=print):
+    """Write model_obj in file_format into export_dir and return the model path
+
+    OBJ goes through Blender's exporter; PLY, GLB and 3D Tiles are streamed
+    from the mesh arrays. With georeferenced=True tiles are written in the
+    local ENU frame of the flight and placed on the globe by the root
+    transform.
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+    os.makedirs(export_dir, exist_ok=True)
+    model_file = model_path(export_dir, file_format)
+
+    if file_format == 'OBJ':
+        bpy.ops.object.select_all(action='DESELECT')
+        model_obj.select_set(True)
+        bpy.ops.export_scene.obj(
+            filepath=model_file,
+            use_selection=True,
+            use_materials=settings.include_textures
+        )
+    elif file_format in ('PLY', 'GLB'):
+        # Stream the mesh arrays straight to disk instead of going through the exporter add-ons
+        mesh = scene_builder.object_mesh_buffers(model_obj)
+        mesh_io.write_mesh(model_file, mesh, file_format, settings.compact_export)
+        if settings.export_lods:
+            mesh_simplify.write_lods(model_file, mesh, file_format, settings.lod_levels,
+                                     settings.lod_reduction, settings.compact_export, log)
+    else:
+        mesh = scene_builder.object_mesh_buffers(model_obj)
+        root_transform = None
+        camera_poses = trajectory.load_camera_poses(settings.output_path) if georeferenced else None
+        if camera_poses is not None:
+            frame = georeferencing.LocalFrame.from_positions(camera_poses[1])
+            photo_dir = os.path.join(settings.output_path, "photogrammetry")
+            mesh = georeferencing.transform_mesh(mesh, frame.model_to_enu(photo_dir, camera_poses[1]))
+            root_transform = frame.enu_to_wgs84()
+        model_file = tiled_export.export_tileset(
+            mesh, model_file, settings.tile_max_faces, settings.tile_workers, root_transform,
+            settings.compact_export, log
+        )
+    return model_file
+
+def write_geo_metadata(model_obj, output_path, export_dir):
+    """Georeference the model and camera poses, writing the GeoJSON sidecar and ENU pose CSV
+
+    Returns (geojson_file, poses_file, frame, vertex_count), or None when no
+    camera poses have been extracted yet.
+    """
+    camera_poses = trajectory.load_camera_poses(output_path)
+    if camera_poses is None:
+        return None
+    names, poses, yaw, pitch, roll = camera_poses
+    vertices = scene_builder.mesh_world_vertices(model_obj)
+    photo_dir = os.path.join(output_path, "photogrammetry")
+    geojson_file, poses_file, frame = georeferencing.georeference_model(
+        vertices, names, poses, photo_dir, export_dir, yaw, pitch, roll
+    )
+    return geojson_file, poses_file, frame, len(vertices)
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+MANIFEST_NAME = "pipeline_manifest.json"
+
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+def directory_fingerprint(directory):
+    """Hash the names, sizes and mtimes of the entries directly inside a directory
+
+    Re-extracted frames usually keep their names and count, so the count
+    alone would not notice that their content changed.
+    """
+    digest = hashlib.sha1()
+    with os.scandir(directory) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            stat = entry.stat()
+            digest.update(f"{entry.name}|{stat.st_size}|{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+def fingerprint(inputs):
+    """Hash stage inputs (settings plus file and directory contents' sizes and mtimes) into a short key"""
+    normalized = {}
+    for key, value in sorted(inputs.items()):
+        if isinstance(value, str) and os.path.exists(value):
+            if os.path.isfile(value):
+                stat = os.stat(value)
+                value = [value, stat.st_size, stat.st_mtime_ns]
+            else:
+                value = [value, directory_fingerprint(value)]
+        normalized[key] = value
+    encoded = json.dumps(normalized, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()
+
+def write_json_atomic(path, data):
+    """Write JSON to a temporary file and rename it over path"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".manifest-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class StageManifest:
+    """Checkpoint records of pipeline stages, persisted atomically after every change
+
+    Each record holds the stage inputs and their fingerprint, its outputs,
+    status and elapsed time. A stage is skipped on a later run when it
+    completed with the same input fingerprint and its outputs still exist.
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self.stages = {}
+        # Stages may be recorded from several worker threads
+        self.lock = threading.RLock()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self.stages = json.load(f).get("stages", {})
+            except (ValueError, OSError) as e:
+                print(f"Error reading pipeline manifest, starting fresh: {str(e)}")
+                self.stages = {}
+
+    def save(self):
+        with self.lock:
+            write_json_atomic(self.path, {"version": 1, "stages": self.stages})
+
+    def is_complete(self, name, inputs=None):
+        """Check whether a stage completed with the same inputs and its outputs exist"""
+        record = self.stages.get(name)
+        if not record or record.get("status") != STATUS_COMPLETED:
+            return False
+        if inputs is not None and record.get("fingerprint") != fingerprint(inputs):
+            return False
+        return all(os.path.exists(path) for path in record.get("outputs", []))
+
+    def record(self, name, status, inputs=None, outputs=None, elapsed=None, error=None):
+        with self.lock:
+            entry = dict(self.stages.get(name, {}))
+            entry.update({"status": status, "updated": time.time()})
+            if inputs is not None:
+                entry["inputs"] = inputs
+                entry["fingerprint"] = fingerprint(inputs)
+            if outputs is not None:
+                entry["outputs"] = list(outputs)
+            if elapsed is not None:
+                entry["elapsed"] = round(elapsed, 3)
+            if error is not None:
+                entry["error"] = error
+            else:
+                entry.pop("error", None)
+            self.stages[name] = entry
+            self.save()
+
+    def invalidate(self, prefix):
+        """Forget every stage whose name starts with prefix"""
+        with self.lock:
+            for name in [n for n in self.stages if n.startswith(prefix)]:
+                del self.stages[name]
+            self.save()
+
+    @contextmanager
+    def stage(self, name, inputs=None, outputs=()):
+        """Run the body of a with-block as a checkpointed stage
+
+        Yields True when the body has to run and False when the stage is
+        already complete, so callers can write `if run: ...`.
+        """
+        if self.is_complete(name, inputs):
+            yield False
+            return
+        start = time.time()
+        self.record(name, STATUS_RUNNING, inputs=inputs, outputs=outputs)
+        try:
+            yield True
+        except BaseException as e:
+            self.record(name, STATUS_FAILED, elapsed=time.time() - start, error=str(e))
+            raise
+        self.record(name, STATUS_COMPLETED, outputs=outputs, elapsed=time.time() - start)
+
+    def token(self, name):
+        """Return a value that changes whenever the named stage re-runs
+
+        Downstream stages include it in their inputs so that re-running an
+        upstream stage also invalidates everything that depends on it.
+        """
+        record = self.stages.get(name, {})
+        return [record.get("fingerprint"), record.get("updated")]
+
+    def summary(self):
+        """Return (completed, total) stage counts"""
+        completed = sum(1 for r in self.stages.values() if r.get("status") == STATUS_COMPLETED)
+        return completed, len(self.stages)
+
+@contextmanager
+def optional_stage(manifest, name, inputs=None, outputs=()):
+    """Like StageManifest.stage, but always runs the body when there is no manifest"""
+    if manifest is None:
+        yield True
+        return
+    with manifest.stage(name, inputs, outputs) as run:
+        yield run
+
+def stage_token(manifest, name):
+    """StageManifest.token that tolerates a missing manifest"""
+    return manifest.token(name) if manifest is not None else None
@@ -0,0 +1,248 @@
+import os
+import threading
+import numpy as np
+
+from . import mesh_io
+from .region_of_interest import points_in_polygon, distance_to_polygon
+
+# Bump when the cached index layout changes so stale files are rebuilt
+INDEX_VERSION = 1
+
+# Octree depth; 16 levels over a 1 km cloud give 1.5 cm leaf cells
+INDEX_BITS = 16
+
+# Nodes holding at most this many points are tested point by point instead of subdivided
+LEAF_SIZE = 64
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def index_path(ply_path):
+    """Cache file of the index of a PLY file: fused.ply -> fused.index.npz"""
+    return os.path.splitext(ply_path)[0] + ".index.npz"
+
+def _compact_bits(values):
+    """Inverse of mesh_io._spread_bits: gather every third bit into the low 21 bits"""
+    values = values & np.uint64(0x1249249249249249)
+    for shift, mask in ((2, 0x10c30c30c30c30c3), (4, 0x100f00f00f00f00f), (8, 0x1f0000ff0000ff),
+                        (16, 0x1f00000000ffff), (32, 0x1fffff)):
+        values = (values ^ (values >> np.uint64(shift))) & np.uint64(mask)
+    return values
+
+class PointIndex:
+    """Linear octree over a point cloud: points sorted by Morton code plus the code array
+
+    Every octree node is a contiguous range of the sorted points, found by
+    binary search on its code prefix, so no node structure is stored.
+    Queries walk the tree one level at a time with all nodes of a level
+    classified in one array operation; nodes fully inside a query are
+    accepted as whole ranges and only points of boundary leaves are tested.
+    Query results are row numbers into the sorted arrays; order[rows] gives
+    the vertex indices of the source file.
+    """
+
+    def __init__(self, mesh, order=None, bits=INDEX_BITS):
+        vertices = mesh.vertices
+        self.bits = bits
+        self.lower = vertices.min(axis=0).astype(np.float64) if len(vertices) else np.zeros(3)
+        self.upper = vertices.max(axis=0).astype(np.float64) if len(vertices) else np.ones(3)
+        extent = self.upper - self.lower
+        self.scale = ((1 << bits) - 1) / np.where(extent > 0, extent, 1.0)
+
+        if order is None:
+            codes = mesh_io.morton_codes(vertices, self.lower, self.upper, bits)
+            order = np.argsort(codes, kind="stable")
+            self.codes = codes[order]
+        else:
+            self.codes = mesh_io.morton_codes(vertices[order], self.lower, self.upper, bits)
+        self.order = order
+        self.points = vertices[order]
+        self.normals = None if mesh.normals is None else mesh.normals[order]
+        self.colors = None if mesh.colors is None else mesh.colors[order]
+
+    def __len__(self):
+        return len(self.points)
+
+    def save(self, output_file, source_file=None):
+        """Store the sort order (the expensive part) and the bounds as an uncompressed .npz"""
+        stat = os.stat(source_file) if source_file else None
+        dtype = np.uint32 if len(self.order) < 2 ** 32 else np.int64
+        temp_file = f"{output_file}.{os.getpid()}.tmp.npz"
+        np.savez(
+            temp_file,
+            version=INDEX_VERSION,
+            bits=self.bits,
+            order=self.order.astype(dtype),
+            source=np.array([stat.st_size, stat.st_mtime_ns] if stat else [-1, -1], dtype=np.int64),
+        )
+        os.replace(temp_file, output_file)
+        return output_file
+
+    def subset(self, rows):
+        """Return the selected points as MeshBuffers, reading the sorted arrays range by range"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return mesh_io.MeshBuffers(
+            self.points[rows],
+            normals=None if self.normals is None else self.normals[rows],
+            colors=None if self.colors is None else self.colors[rows],
+        )
+
+    # Traversal
+
+    def _cell_bounds(self, prefixes, level):
+        """World-space (lower, upper) corners of the nodes with the given code prefixes"""
+        shift = np.uint64(self.bits - level)
+        cells = np.stack([_compact_bits(prefixes >> np.uint64(axis)) for axis in range(3)], axis=1)
+        lower = self.lower + (cells << shift).astype(np.float64) / self.scale
+        upper = self.lower + ((cells + np.uint64(1)) << shift).astype(np.float64) / self.scale
+        return lower, upper
+
+    def _query(self, classify, contains):
+        """Return the sorted rows of all points accepted by a query
+
+        classify(lower, upper) returns (inside, outside) masks for node boxes;
+        contains(points) is the exact per-point test used on boundary leaves.
+        """
+        ranges = []
+        tested = []
+        prefixes = np.zeros(1, dtype=np.uint64)
+        level = 0
+        while len(prefixes):
+            shift = np.uint64(3 * (self.bits - level))
+            start = np.searchsorted(self.codes, prefixes << shift)
+            end = np.searchsorted(self.codes, (prefixes + np.uint64(1)) << shift)
+            occupied = end > start
+            prefixes, start, end = prefixes[occupied], start[occupied], end[occupied]
+
+            inside, outside = classify(*self._cell_bounds(prefixes, level))
+            ranges.extend(zip(start[inside], end[inside]))
+            boundary = ~inside & ~outside
+            leaf = boundary & ((end - start <= LEAF_SIZE) | (level == self.bits))
+            tested.extend(zip(start[leaf], end[leaf]))
+
+            descend = prefixes[boundary & ~leaf]
+            prefixes = ((descend[:, None] << np.uint64(3)) | np.arange(8, dtype=np.uint64)).ravel()
+            level += 1
+
+        rows = [np.arange(s, e) for s, e in ranges]
+        if tested:
+            candidates = np.concatenate([np.arange(s, e) for s, e in tested])
+            rows.append(candidates[contains(self.points[candidates])])
+        if not rows:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate(rows))
+
+    # Queries
+
+    def query_box(self, lower, upper):
+        """Rows of the points inside an axis-aligned box"""
+        lower = np.asarray(lower, dtype=np.float64)
+        upper = np.asarray(upper, dtype=np.float64)
+        return self._query(
+            lambda lo, hi: ((lo >= lower).all(axis=1) & (hi <= upper).all(axis=1),
+                            ((hi < lower) | (lo > upper)).any(axis=1)),
+            lambda points: ((points >= lower) & (points <= upper)).all(axis=1)
+        )
+
+    def query_sphere(self, centre, radius):
+        """Rows of the points within radius of centre"""
+        centre = np.asarray(centre, dtype=np.float64)
+        radius_sq = float(radius) ** 2
+
+        def classify(lo, hi):
+            nearest = ((np.clip(centre, lo, hi) - centre) ** 2).sum(axis=1)
+            farthest = (np.maximum(np.abs(lo - centre), np.abs(hi - centre)) ** 2).sum(axis=1)
+            return farthest <= radius_sq, nearest > radius_sq
+
+        return self._query(classify, lambda points: ((points - centre) ** 2).sum(axis=1) <= radius_sq)
+
+    def query_polygon(self, polygon, z_min=-np.inf, z_max=np.inf):
+        """Rows of the points whose XY position lies inside an (M, 2) polygon, optionally within a z range
+
+        A node is accepted or rejected whole only when no polygon edge comes
+        within its circumscribed circle, so concave outlines stay exact.
+        """
+        polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+
+        def classify(lo, hi):
+            centre = (lo[:, :2] + hi[:, :2]) / 2.0
+            half_diagonal = np.linalg.norm(hi[:, :2] - lo[:, :2], axis=1) / 2.0
+            clear = distance_to_polygon(centre, polygon) > half_diagonal
+            centre_inside = points_in_polygon(centre, polygon)
+            z_inside = (lo[:, 2] >= z_min) & (hi[:, 2] <= z_max)
+            z_outside = (hi[:, 2] < z_min) | (lo[:, 2] > z_max)
+            return clear & centre_inside & z_inside, (clear & ~centre_inside) | z_outside
+
+        def contains(points):
+            return points_in_polygon(points[:, :2], polygon) & (points[:, 2] >= z_min) & (points[:, 2] <= z_max)
+
+        return self._query(classify, contains)
+
+    def nearest(self, queries, k=1):
+        """Return (rows, distances), each (Q, k), of the k nearest points to each query point
+
+        Each query grows a sphere search from the mean point spacing until it
+        holds k points, so lookups only touch the nodes around the query.
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 3)
+        k = min(int(k), len(self))
+        rows = np.zeros((len(queries), k), dtype=np.int64)
+        distances = np.zeros((len(queries), k), dtype=np.float64)
+        extent = np.maximum(self.upper - self.lower, 1e-9)
+        # Terrain clouds are closer to surfaces than volumes; take the denser of both estimates
+        largest = np.sort(extent)[1:]
+        spacing = min(float(np.prod(extent) / max(len(self), 1)) ** (1.0 / 3.0),
+                      float(np.prod(largest) / max(len(self), 1)) ** 0.5)
+        limit = float(np.linalg.norm(extent)) + float(np.linalg.norm(queries - self.lower, axis=1).max(initial=0.0))
+        for i, query in enumerate(queries):
+            radius = spacing * max(k, 1) ** 0.5
+            found = self.query_sphere(query, radius)
+            while len(found) < k and radius < limit:
+                radius *= 2.0
+                found = self.query_sphere(query, radius)
+            dist = np.linalg.norm(self.points[found] - query, axis=1)
+            nearest = np.argsort(dist)[:k]
+            rows[i] = found[nearest]
+            distances[i] = dist[nearest]
+        return rows, distances
+
+def load_or_build(ply_path, log=print):
+    """Return the PointIndex of a PLY file, reusing the cached order when the file is unchanged"""
+    mesh = mesh_io.read_ply(ply_path)
+    cache_file = index_path(ply_path)
+    stat = os.stat(ply_path)
+    try:
+        with np.load(cache_file) as cached:
+            if int(cached["version"]) == INDEX_VERSION and len(cached["order"]) == len(mesh.vertices) \
+                    and cached["source"].tolist() == [stat.st_size, stat.st_mtime_ns]:
+                return PointIndex(mesh, cached["order"].astype(np.int64), int(cached["bits"]))
+    except (OSError, KeyError, ValueError):
+        pass
+
+    log(f"Building spatial index of {len(mesh.vertices)} points...")
+    index = PointIndex(mesh)
+    try:
+        index.save(cache_file, ply_path)
+    except OSError as e:
+        log(f"Could not cache the spatial index: {e}")
+    return index
+
+def get_index(ply_path, log=print):
+    """Return the index of a PLY file, kept in memory while the file is unchanged"""
+    path = os.path.abspath(ply_path)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    with _indexes_lock:
+        index = _indexes.get(key)
+    if index is None:
+        index = load_or_build(path, log)
+        with _indexes_lock:
+            # Only the current version of each file is kept
+            for stale in [k for k in _indexes if k[0] == path]:
+                del _indexes[stale]
+            _indexes[key] = index
+    return index
+
+def clear_indexes():
+    with _indexes_lock:
+        _indexes.clear()
@@ -0,0 +1,205 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import subprocess
+from collections import deque
+
+# Concurrent processes allowed per tool class; anything else shares "default"
+TOOL_LIMITS = {
+    "ffmpeg": 2,
+    "ffprobe": 4,
+    "exiftool": 4,
+    "colmap": max(1, os.cpu_count() or 1),
+    "meshroom": 1,
+    "blender": max(1, (os.cpu_count() or 2) // 2),
+    "default": 4,
+}
+
+# Bytes read from a pipe at a time and the longest line passed to a callback
+READ_CHUNK_SIZE = 64 * 1024
+MAX_LINE_LENGTH = 64 * 1024
+
+# Number of trailing stderr lines kept for error messages
+TAIL_LINES = 50
+
+class ProcessResult:
+    """Outcome of a supervised process: return code, elapsed time and the last stderr lines"""
+
+    def __init__(self, args, returncode, elapsed, stderr_tail):
+        self.args = args
+        self.returncode = returncode
+        self.elapsed = elapsed
+        self.stderr_tail = stderr_tail
+
+    def check_returncode(self):
+        if self.returncode != 0:
+            raise subprocess.CalledProcessError(self.returncode, self.args, stderr="\n".join(self.stderr_tail))
+
+def tool_class(cmd):
+    """Derive the tool class of a command from its executable name"""
+    name = os.path.splitext(os.path.basename(str(cmd[0])))[0].lower()
+    for tool in TOOL_LIMITS:
+        if name.startswith(tool):
+            return tool
+    return "default"
+
+async def _pump(stream, callback, tail=None, echo=None, copy=None):
+    """Split a pipe into lines (on \\n or \\r) and hand each one to callback
+
+    Only the current partial line is buffered, and overlong lines are cut at
+    MAX_LINE_LENGTH, so memory stays bounded whatever the process prints.
+    copy, a binary file, receives the bytes exactly as they were read.
+    """
+    pending = b""
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        if copy is not None:
+            copy.write(chunk)
+        pending += chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        *lines, pending = pending.split(b"\n")
+        if len(pending) > MAX_LINE_LENGTH:
+            lines.append(pending[:MAX_LINE_LENGTH])
+            pending = b""
+        for raw in lines:
+            _emit(raw, callback, tail, echo)
+    if pending:
+        _emit(pending, callback, tail, echo)
+
+def _emit(raw, callback, tail, echo):
+    line = raw[:MAX_LINE_LENGTH].decode("utf-8", errors="replace")
+    if tail is not None:
+        tail.append(line)
+    if echo is not None:
+        echo.write(line + "\n")
+    if callback is not None:
+        callback(line)
+
+class ProcessSupervisor:
+    """Runs external tools on a private asyncio loop with per-tool concurrency limits
+
+    Output is streamed line by line into callbacks instead of being buffered,
+    every process can have a timeout, and cancel_all() terminates everything
+    that is still running. The blocking run() can be called from any thread,
+    including Blender's UI thread and worker threads.
+    """
+
+    def __init__(self, limits=None):
+        self.limits = dict(TOOL_LIMITS)
+        self.limits.update(limits or {})
+        self.loop = asyncio.new_event_loop()
+        self.semaphores = {}
+        self.processes = set()
+        self.thread = threading.Thread(target=self._run_loop, name="dronevideo3d-supervisor", daemon=True)
+        self.thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _semaphore(self, tool):
+        # Only touched from the loop thread
+        if tool not in self.semaphores:
+            self.semaphores[tool] = asyncio.Semaphore(self.limits.get(tool, self.limits["default"]))
+        return self.semaphores[tool]
+
+    async def run_async(self, cmd, tool=None, timeout=None, on_stdout=None, on_stderr=None, echo=False,
+                        cwd=None, env=None, check=True, stdin_data=None, stdout_raw=None):
+        """Run cmd once a slot for its tool class is free and stream its output
+
+        stdout_raw, a binary file, gets an unaltered copy of stdout next to
+        the line callbacks.
+        """
+        cmd = [str(c) for c in cmd]
+        tool = tool or tool_class(cmd)
+        async with self._semaphore(tool):
+            start = time.time()
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=subprocess.PIPE if stdin_data is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=cwd,
+                env=env
+            )
+            self.processes.add(process)
+            tail = deque(maxlen=TAIL_LINES)
+            try:
+                if stdin_data is not None:
+                    process.stdin.write(stdin_data)
+                    await process.stdin.drain()
+                    process.stdin.close()
+                pumps = asyncio.gather(
+                    _pump(process.stdout, on_stdout, echo=sys.stdout if echo else None, copy=stdout_raw),
+                    _pump(process.stderr, on_stderr, tail, echo=sys.stderr if echo else None),
+                    process.wait()
+                )
+                try:
+                    await asyncio.wait_for(pumps, timeout)
+                except asyncio.TimeoutError:
+                    raise subprocess.TimeoutExpired(cmd, timeout, stderr="\n".join(tail))
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                self.processes.discard(process)
+
+        result = ProcessResult(cmd, process.returncode, time.time() - start, list(tail))
+        if check:
+            result.check_returncode()
+        return result
+
+    def submit(self, cmd, **kwargs):
+        """Start cmd without blocking and return a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(self.run_async(cmd, **kwargs), self.loop)
+
+    def run(self, cmd, **kwargs):
+        """Run cmd and block until it finishes; accepts the same options as run_async"""
+        return self.submit(cmd, **kwargs).result()
+
+    def cancel_all(self):
+        """Terminate every process that is currently running"""
+        def terminate():
+            for process in list(self.processes):
+                if process.returncode is None:
+                    process.terminate()
+        self.loop.call_soon_threadsafe(terminate)
+
+    def shutdown(self):
+        self.cancel_all()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5.0)
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+def get_supervisor():
+    """Return the process supervisor shared by the add-on and headless runs"""
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = ProcessSupervisor()
+        return _supervisor
+
+def run_tool(cmd, **kwargs):
+    """Run an external tool through the shared supervisor (see ProcessSupervisor.run_async)"""
+    return get_supervisor().run(cmd, **kwargs)
+
+def tool_available(cmd, timeout=30.0):
+    """Check that a tool starts and exits successfully, e.g. tool_available(["exiftool", "-ver"])"""
+    try:
+        run_tool(cmd, timeout=timeout)
+        return True
+    except (subprocess.SubprocessError, OSError):
+        return False
+
+def shutdown_supervisor():
+    """Stop the shared supervisor and terminate its processes"""
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is not None:
+            _supervisor.shutdown()
+            _supervisor = None
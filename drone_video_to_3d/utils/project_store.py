@@ -0,0 +1,338 @@
+import os
+import csv
+import json
+import time
+import sqlite3
+import numpy as np
+
+from . import gps_utils
+
+PROJECT_DATABASE = "project.db"
+TIMESTAMPS_CSV = "timestamps.csv"
+
+GPS_RAW = "raw"
+GPS_SMOOTHED = "smoothed"
+
+TELEMETRY_FIELDS = ("time", "latitude", "longitude", "altitude", "speed", "roll", "pitch", "yaw")
+GPS_FIELDS = ("latitude", "longitude", "altitude", "speed", "roll", "pitch", "yaw", "x", "y", "z")
+
+CREATE_TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS frames (
+    frame_id INTEGER PRIMARY KEY NOT NULL,
+    name TEXT NOT NULL UNIQUE,
+    timestamp REAL,
+    quality REAL);
+CREATE INDEX IF NOT EXISTS frames_timestamp ON frames(timestamp);
+CREATE TABLE IF NOT EXISTS telemetry (
+    sample_id INTEGER PRIMARY KEY NOT NULL,
+    time REAL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    altitude REAL,
+    speed REAL,
+    roll REAL,
+    pitch REAL,
+    yaw REAL);
+CREATE INDEX IF NOT EXISTS telemetry_time ON telemetry(time);
+CREATE TABLE IF NOT EXISTS gps (
+    kind TEXT NOT NULL,
+    frame_id INTEGER NOT NULL REFERENCES frames(frame_id) ON DELETE CASCADE,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    altitude REAL NOT NULL,
+    speed REAL,
+    roll REAL,
+    pitch REAL,
+    yaw REAL,
+    x REAL,
+    y REAL,
+    z REAL,
+    PRIMARY KEY (kind, frame_id));
+CREATE INDEX IF NOT EXISTS gps_position ON gps(kind, latitude, longitude);
+CREATE TABLE IF NOT EXISTS stage_metadata (
+    stage TEXT PRIMARY KEY NOT NULL,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL);
+"""
+
+# Spatial index over GPS rows; only created when SQLite has the R*Tree module
+CREATE_RTREE_SQL = "CREATE VIRTUAL TABLE IF NOT EXISTS gps_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+
+def _nullable(values):
+    """Turn a float array into a list with None where the value is NaN"""
+    return [None if np.isnan(v) else float(v) for v in values]
+
+def _float_array(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+class ProjectStore:
+    """Indexed SQLite store for the per-project data produced by the pipeline stages
+
+    Holds extracted frames with timestamps and quality scores, raw telemetry
+    samples, raw and smoothed per-frame GPS, and free-form stage metadata.
+    The text formats consumed by external tools (timestamps.csv,
+    gps_poses.csv, sensor_data.xml) are written from here on demand.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, PROJECT_DATABASE)
+        self.connection = sqlite3.connect(self.path, timeout=60.0)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(CREATE_TABLES_SQL)
+        # Stores written by versions without per-frame quality lack the column
+        frame_columns = {row[1] for row in self.connection.execute("PRAGMA table_info(frames)")}
+        if "quality" not in frame_columns:
+            self.connection.execute("ALTER TABLE frames ADD COLUMN quality REAL")
+        try:
+            self.connection.execute(CREATE_RTREE_SQL)
+            self.has_rtree = True
+        except sqlite3.OperationalError:
+            self.has_rtree = False
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Frames
+
+    def write_frames(self, names, timestamps=None):
+        """Replace the frame list, dropping GPS rows of frames that no longer exist"""
+        if timestamps is None:
+            timestamps = [None] * len(names)
+        with self.connection:
+            self.connection.execute("DELETE FROM frames WHERE name NOT IN (SELECT value FROM json_each(?))",
+                                    (json.dumps(list(names)),))
+            self.connection.executemany(
+                "INSERT INTO frames (name, timestamp) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET timestamp = excluded.timestamp",
+                ((name, None if t is None or np.isnan(t) else float(t)) for name, t in zip(names, timestamps))
+            )
+            if self.has_rtree:
+                self.connection.execute("DELETE FROM gps_rtree WHERE id NOT IN (SELECT rowid FROM gps)")
+
+    def append_frames(self, names, timestamps=None):
+        """Add frames or update their timestamps, keeping every frame already stored"""
+        if timestamps is None:
+            timestamps = [None] * len(names)
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO frames (name, timestamp) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET timestamp = excluded.timestamp",
+                ((name, None if t is None or np.isnan(t) else float(t)) for name, t in zip(names, timestamps))
+            )
+
+    def frame_ids(self):
+        """Return a frame name -> frame id mapping"""
+        return dict(self.connection.execute("SELECT name, frame_id FROM frames"))
+
+    def read_frames(self):
+        """Return frame names and timestamps (NaN where unknown) ordered by name"""
+        rows = self.connection.execute("SELECT name, timestamp FROM frames ORDER BY name").fetchall()
+        return [row[0] for row in rows], _float_array([row[1] for row in rows])
+
+    def write_quality(self, scores):
+        """Store per-frame quality scores given as a frame name -> score mapping"""
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE frames SET quality = ? WHERE name = ?",
+                ((float(score), name) for name, score in scores.items())
+            )
+
+    def read_quality(self):
+        return dict(self.connection.execute("SELECT name, quality FROM frames WHERE quality IS NOT NULL"))
+
+    def frames_in_time_range(self, start, end):
+        """Return the names of frames with start <= timestamp <= end"""
+        return [row[0] for row in self.connection.execute(
+            "SELECT name FROM frames WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp", (start, end)
+        )]
+
+    # Telemetry
+
+    def write_telemetry(self, samples):
+        """Replace the raw telemetry samples (a field name -> array mapping)"""
+        columns = [_nullable(samples[field]) for field in TELEMETRY_FIELDS]
+        with self.connection:
+            self.connection.execute("DELETE FROM telemetry")
+            self.connection.executemany(
+                f"INSERT INTO telemetry ({', '.join(TELEMETRY_FIELDS)}) VALUES ({', '.join('?' * len(TELEMETRY_FIELDS))})",
+                zip(*columns)
+            )
+
+    def append_telemetry(self, samples):
+        """Add the samples that are newer than the last stored one
+
+        Meant for telemetry re-read from a file that is still growing: the
+        samples already stored are skipped by time. Samples without a time
+        can't be told apart and are only added while the table is empty.
+        """
+        last_time, count = self.connection.execute("SELECT MAX(time), COUNT(*) FROM telemetry").fetchone()
+        times = np.asarray(samples["time"], dtype=np.float64)
+        if last_time is not None:
+            keep = ~np.isnan(times) & (times > last_time)
+        elif count:
+            keep = np.zeros(len(times), dtype=bool)
+        else:
+            keep = np.ones(len(times), dtype=bool)
+        columns = [_nullable(np.asarray(samples[field], dtype=np.float64)[keep]) for field in TELEMETRY_FIELDS]
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO telemetry ({', '.join(TELEMETRY_FIELDS)}) VALUES ({', '.join('?' * len(TELEMETRY_FIELDS))})",
+                zip(*columns)
+            )
+        return int(np.count_nonzero(keep))
+
+    def read_telemetry(self, start=None, end=None):
+        """Return telemetry samples, optionally limited to a time range, as a field name -> array mapping"""
+        query = f"SELECT {', '.join(TELEMETRY_FIELDS)} FROM telemetry"
+        params = ()
+        if start is not None and end is not None:
+            query += " WHERE time BETWEEN ? AND ?"
+            params = (start, end)
+        query += " ORDER BY sample_id"
+        rows = self.connection.execute(query, params).fetchall()
+        table = np.array(rows, dtype=np.float64).reshape(-1, len(TELEMETRY_FIELDS))
+        return {field: table[:, i] for i, field in enumerate(TELEMETRY_FIELDS)}
+
+    # Per-frame GPS
+
+    def write_gps(self, gps_data, kind=GPS_RAW, replace=True):
+        """Replace the per-frame GPS of one kind from a gps_utils style gps_data dict
+
+        With replace=False only the GPS of the frames in gps_data is replaced
+        and that of other frames is kept.
+        """
+        names = sorted(gps_data)
+        values = {
+            field: np.array([gps_data[name]["gps"].get(field, 0.0) for name in names], dtype=np.float64)
+            for field in GPS_FIELDS[:7]
+        }
+        if names:
+            x, y, z = gps_utils.convert_to_cartesian(values["latitude"], values["longitude"], values["altitude"])
+            values["x"], values["y"], values["z"] = (np.broadcast_to(np.asarray(c, dtype=np.float64), len(names))
+                                                     for c in (x, y, z))
+        else:
+            values["x"] = values["y"] = values["z"] = np.zeros(0)
+
+        with self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO frames (name) VALUES (?)", ((name,) for name in names))
+            frame_ids = self.frame_ids()
+            if replace:
+                condition, params = "kind = ?", (kind,)
+            else:
+                condition = "kind = ? AND frame_id IN (SELECT value FROM json_each(?))"
+                params = (kind, json.dumps([frame_ids[name] for name in names]))
+            if self.has_rtree:
+                self.connection.execute(f"DELETE FROM gps_rtree WHERE id IN (SELECT rowid FROM gps WHERE {condition})",
+                                        params)
+            self.connection.execute(f"DELETE FROM gps WHERE {condition}", params)
+            self.connection.executemany(
+                f"INSERT INTO gps (kind, frame_id, {', '.join(GPS_FIELDS)}) VALUES (?, ?, {', '.join('?' * len(GPS_FIELDS))})",
+                ((kind, frame_ids[name]) + tuple(float(values[field][i]) for field in GPS_FIELDS)
+                 for i, name in enumerate(names))
+            )
+            if self.has_rtree:
+                self.connection.execute(
+                    "INSERT INTO gps_rtree SELECT rowid, latitude, latitude, longitude, longitude "
+                    f"FROM gps WHERE {condition}",
+                    params
+                )
+
+    def gps_kinds(self):
+        return {row[0] for row in self.connection.execute("SELECT DISTINCT kind FROM gps")}
+
+    def preferred_gps_kind(self):
+        """Smoothed GPS when present, raw otherwise"""
+        return GPS_SMOOTHED if GPS_SMOOTHED in self.gps_kinds() else GPS_RAW
+
+    def read_gps(self, kind=None):
+        """Return (frame names, field name -> array mapping) ordered by frame name"""
+        kind = kind or self.preferred_gps_kind()
+        rows = self.connection.execute(
+            f"SELECT frames.name, {', '.join('gps.' + field for field in GPS_FIELDS)} "
+            "FROM gps JOIN frames ON frames.frame_id = gps.frame_id WHERE gps.kind = ? ORDER BY frames.name",
+            (kind,)
+        ).fetchall()
+        names = [row[0] for row in rows]
+        table = _float_array([v for row in rows for v in row[1:]]).reshape(-1, len(GPS_FIELDS))
+        return names, {field: table[:, i] for i, field in enumerate(GPS_FIELDS)}
+
+    def frames_in_bbox(self, min_lat, min_lon, max_lat, max_lon, kind=None):
+        """Return the names of frames whose GPS position lies inside a lat/lon box"""
+        kind = kind or self.preferred_gps_kind()
+        if self.has_rtree:
+            query = ("SELECT frames.name FROM gps_rtree "
+                     "JOIN gps ON gps.rowid = gps_rtree.id JOIN frames ON frames.frame_id = gps.frame_id "
+                     "WHERE gps_rtree.min_lat >= ? AND gps_rtree.max_lat <= ? "
+                     "AND gps_rtree.min_lon >= ? AND gps_rtree.max_lon <= ? AND gps.kind = ? ORDER BY frames.name")
+        else:
+            query = ("SELECT frames.name FROM gps JOIN frames ON frames.frame_id = gps.frame_id "
+                     "WHERE gps.latitude BETWEEN ? AND ? AND gps.longitude BETWEEN ? AND ? AND gps.kind = ? "
+                     "ORDER BY frames.name")
+        return [row[0] for row in self.connection.execute(query, (min_lat, max_lat, min_lon, max_lon, kind))]
+
+    def to_gps_data(self, kind=None):
+        """Rebuild the gps_data dict used by gps_utils from the stored GPS"""
+        names, values = self.read_gps(kind)
+        camera = self.get_stage_metadata("camera", {})
+        camera_info = {
+            "focal_length": camera.get("focal_length", 24.0),
+            "aperture": camera.get("aperture", 2.8),
+            "sensor_width": camera.get("sensor_width", 13.2),
+        }
+        return {
+            name: {
+                "gps": {field: float(values[field][i]) for field in GPS_FIELDS[:7]},
+                "camera": dict(camera_info)
+            }
+            for i, name in enumerate(names)
+        }
+
+    # Stage metadata
+
+    def set_stage_metadata(self, stage, data):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO stage_metadata (stage, data, updated) VALUES (?, ?, ?)",
+                (stage, json.dumps(data, sort_keys=True, default=str), time.time())
+            )
+
+    def get_stage_metadata(self, stage, default=None):
+        row = self.connection.execute("SELECT data FROM stage_metadata WHERE stage = ?", (stage,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    # On-demand text exports
+
+    def export_timestamps_csv(self, output_file):
+        """Write frame,timestamp rows"""
+        names, timestamps = self.read_frames()
+        with open(output_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "timestamp"])
+            for name, timestamp in zip(names, timestamps):
+                writer.writerow([name, "" if np.isnan(timestamp) else repr(float(timestamp))])
+        return output_file
+
+    def export_gps_poses_csv(self, output_file, kind=None):
+        """Write the ECEF pose CSV read by the photogrammetry stages"""
+        names, values = self.read_gps(kind)
+        with open(output_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "x", "y", "z", "roll", "pitch", "yaw"])
+            for i, name in enumerate(names):
+                writer.writerow([name] + [float(values[field][i]) for field in ("x", "y", "z", "roll", "pitch", "yaw")])
+        return output_file
+
+    def export_sensor_data_xml(self, output_file, kind=None):
+        """Write the sensor_data.xml file read by Meshroom/AliceVision"""
+        gps_utils.generate_meshroom_sensor_data(self.to_gps_data(kind), output_file)
+        return output_file
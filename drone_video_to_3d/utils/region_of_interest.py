@@ -0,0 +1,163 @@
+import os
+import json
+import numpy as np
+
+from . import trajectory
+
+# Horizontal field of view assumed when the camera metadata has no focal length
+DEFAULT_FOV_DEG = 84.0
+
+# Cameras looking closer to the horizon than this are treated as seeing up to MAX_VIEW_DISTANCE
+MIN_DEPRESSION_DEG = 5.0
+MAX_VIEW_DISTANCE = 500.0
+
+def parse_polygon(text):
+    """Read a lat/lon polygon from a GeoJSON file or a 'lat, lon; lat, lon; ...' string
+
+    Returns (lat, lon) arrays without a repeated closing vertex.
+    """
+    text = text.strip()
+    if os.path.isfile(text):
+        with open(text) as f:
+            geojson = json.load(f)
+        geometry = geojson
+        if geojson.get("type") == "FeatureCollection":
+            geometry = geojson["features"][0]["geometry"]
+        elif geojson.get("type") == "Feature":
+            geometry = geojson["geometry"]
+        ring = geometry["coordinates"][0]
+        if geometry["type"] == "MultiPolygon":
+            ring = ring[0]
+        lon, lat = np.asarray(ring, dtype=np.float64)[:, :2].T
+    else:
+        pairs = [p for p in text.replace("\n", ";").split(";") if p.strip()]
+        lat, lon = np.asarray([[float(v) for v in p.replace(",", " ").split()] for p in pairs],
+                              dtype=np.float64).reshape(-1, 2).T
+    if len(lat) > 1 and lat[0] == lat[-1] and lon[0] == lon[-1]:
+        lat, lon = lat[:-1], lon[:-1]
+    if len(lat) < 3:
+        raise ValueError("A region of interest needs at least three vertices")
+    return lat, lon
+
+def _local_metres(lat, lon, lat0, lon0):
+    """Project lat/lon onto an equirectangular plane in metres around (lat0, lon0)"""
+    east = np.radians(np.asarray(lon) - lon0) * trajectory.WGS84_A * np.cos(np.radians(lat0))
+    north = np.radians(np.asarray(lat) - lat0) * trajectory.WGS84_A
+    return np.stack([east, north], axis=-1)
+
+def points_in_polygon(points, polygon):
+    """Even-odd test of (N, 2) points against an (M, 2) polygon, vectorized over both"""
+    x, y = points[:, 0:1], points[:, 1:2]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    crosses = (y1 > y) != (y2 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return np.count_nonzero(crosses & (x < x_cross), axis=1) % 2 == 1
+
+def distance_to_polygon(points, polygon):
+    """Distance of (N, 2) points to the nearest edge of an (M, 2) polygon"""
+    start = polygon[None, :, :]
+    edge = np.roll(polygon, -1, axis=0)[None, :, :] - start
+    offset = points[:, None, :] - start
+    length = np.maximum((edge ** 2).sum(axis=2), 1e-12)
+    t = np.clip((offset * edge).sum(axis=2) / length, 0.0, 1.0)
+    nearest = start + t[:, :, None] * edge
+    return np.sqrt(((points[:, None, :] - nearest) ** 2).sum(axis=2)).min(axis=1)
+
+def field_of_view(camera):
+    """Horizontal field of view in degrees from focal length and sensor width metadata"""
+    try:
+        focal_length = float(camera.get("focal_length") or 0.0)
+        sensor_width = float(camera.get("sensor_width") or 0.0)
+    except (AttributeError, TypeError, ValueError):
+        return DEFAULT_FOV_DEG
+    if focal_length <= 0.0 or sensor_width <= 0.0:
+        return DEFAULT_FOV_DEG
+    return float(np.degrees(2.0 * np.arctan(sensor_width / (2.0 * focal_length))))
+
+def view_footprints(east_north, altitude, yaw, ground_altitude, camera_pitch=-90.0, fov_deg=DEFAULT_FOV_DEG):
+    """Return the ground centre (N, 2) and radius (N,) of the area each camera sees
+
+    The optical axis follows the flight heading (yaw, degrees clockwise from
+    north) tilted by camera_pitch (negative looks down) and is intersected
+    with a flat ground at ground_altitude. The footprint is approximated by
+    a circle that grows with the slant distance to the ground.
+    """
+    height = np.maximum(np.asarray(altitude, dtype=np.float64) - ground_altitude, 1.0)
+    depression = np.radians(max(-float(camera_pitch), MIN_DEPRESSION_DEG))
+    reach = np.minimum(height / np.tan(depression), MAX_VIEW_DISTANCE) if depression < np.pi / 2 else 0.0 * height
+    heading = np.radians(np.nan_to_num(np.asarray(yaw, dtype=np.float64)))
+    centre = east_north + np.stack([np.sin(heading), np.cos(heading)], axis=1) * np.reshape(reach, (-1, 1))
+    slant = np.sqrt(height ** 2 + reach ** 2)
+    radius = slant * np.tan(np.radians(fov_deg) / 2.0)
+    return centre, radius
+
+def select_frames(store, polygon_lat, polygon_lon, ground_altitude=None, camera_pitch=-90.0, margin=10.0,
+                  kind=None):
+    """Return the frame names whose view of the ground overlaps the polygon
+
+    Candidates come from the store's spatial index, limited to the polygon's
+    bounding box grown by the widest footprint any frame of the flight can
+    have; the exact footprint test then runs on those only. ground_altitude
+    defaults to the lowest recorded altitude, which is the take-off point
+    for flights recorded from the ground.
+    """
+    names, gps = store.read_gps(kind)
+    if not names:
+        return []
+    valid = ~np.isnan(gps["latitude"]) & ~np.isnan(gps["longitude"]) & ~np.isnan(gps["altitude"])
+    if ground_altitude is None:
+        ground_altitude = float(np.nanmin(gps["altitude"]))
+    fov_deg = field_of_view(store.get_stage_metadata("camera", {}))
+
+    lat0, lon0 = float(np.mean(polygon_lat)), float(np.mean(polygon_lon))
+    polygon = _local_metres(polygon_lat, polygon_lon, lat0, lon0)
+
+    # Widest reach plus footprint of the highest frame bounds the candidate search
+    centre, radius = view_footprints(np.zeros((1, 2)), [np.nanmax(gps["altitude"][valid])], [0.0],
+                                     ground_altitude, camera_pitch, fov_deg)
+    search_radius = float(np.linalg.norm(centre[0]) + radius[0]) + margin
+    dlat = np.degrees(search_radius / trajectory.WGS84_A)
+    dlon = dlat / max(np.cos(np.radians(lat0)), 1e-6)
+    candidates = set(store.frames_in_bbox(polygon_lat.min() - dlat, polygon_lon.min() - dlon,
+                                          polygon_lat.max() + dlat, polygon_lon.max() + dlon, kind))
+    index = np.array([i for i, name in enumerate(names) if name in candidates and valid[i]], dtype=np.int64)
+    if len(index) == 0:
+        return []
+
+    positions = _local_metres(gps["latitude"][index], gps["longitude"][index], lat0, lon0)
+    centre, radius = view_footprints(positions, gps["altitude"][index], gps["yaw"][index],
+                                     ground_altitude, camera_pitch, fov_deg)
+    overlaps = points_in_polygon(centre, polygon) | (distance_to_polygon(centre, polygon) <= radius + margin)
+    return [names[i] for i in index[overlaps]]
+
+def write_image_list(output_file, frame_names):
+    with open(output_file, 'w') as f:
+        f.write("\n".join(frame_names) + "\n")
+    return output_file
+
+def bounding_box(polygon_lat, polygon_lon, bottom, top, origin, margin=10.0):
+    """Axis-aligned box of the polygon prism between two altitudes, in ECEF offset by origin
+
+    The corners are converted the same way as the GPS poses the model origin
+    comes from (see trajectory.geodetic_to_cartesian); mixing Earth models
+    would shift the box by kilometres.
+    """
+    lat0 = float(np.mean(polygon_lat))
+    dlat = np.degrees(margin / trajectory.WGS84_A)
+    dlon = dlat / max(np.cos(np.radians(lat0)), 1e-6)
+    lat = np.concatenate([polygon_lat - dlat, polygon_lat + dlat, polygon_lat - dlat, polygon_lat + dlat])
+    lon = np.concatenate([polygon_lon - dlon, polygon_lon + dlon, polygon_lon + dlon, polygon_lon - dlon])
+    corners = []
+    for altitude in (bottom - margin, top + margin):
+        corners.append(np.stack(trajectory.geodetic_to_cartesian(lat, lon, np.full(len(lat), altitude)), axis=1))
+    corners = np.concatenate(corners) - np.asarray(origin, dtype=np.float64)
+    return corners.min(axis=0), corners.max(axis=0)
+
+def write_bbox(output_file, lower, upper):
+    """Write a box in the 'min_x min_y min_z / max_x max_y max_z' format of stereo_fusion --bbox_path"""
+    with open(output_file, 'w') as f:
+        f.write(" ".join(f"{v:.6f}" for v in lower) + "\n")
+        f.write(" ".join(f"{v:.6f}" for v in upper) + "\n")
+    return output_file
@@ -0,0 +1,201 @@
+import bpy
+import numpy as np
+
+from . import mesh_io
+
+FLIGHT_COLLECTION = "DroneScan_Flight"
+
+# Camera marker in body axes (x right, y forward, z up): apex at the camera and
+# a 4:3 image rectangle one unit ahead
+MARKER_VERTICES = np.array([
+    [0.0, 0.0, 0.0],
+    [-0.5, 1.0, -0.375],
+    [0.5, 1.0, -0.375],
+    [0.5, 1.0, 0.375],
+    [-0.5, 1.0, 0.375],
+])
+MARKER_EDGES = np.array([[0, 1], [0, 2], [0, 3], [0, 4], [1, 2], [2, 3], [3, 4], [4, 1]])
+
+def attitude_matrices(yaw, pitch, roll):
+    """Return (N, 3, 3) body-to-ENU rotations from heading, pitch and roll in degrees
+
+    Heading is clockwise from north, pitch is nose up and roll is right wing
+    down, as reported by drone flight controllers.
+    """
+    yaw = np.radians(-np.asarray(yaw, dtype=np.float64))
+    pitch = np.radians(np.asarray(pitch, dtype=np.float64))
+    roll = np.radians(np.asarray(roll, dtype=np.float64))
+    count = len(yaw)
+    zeros, ones = np.zeros(count), np.ones(count)
+    rz = np.stack([np.cos(yaw), -np.sin(yaw), zeros,
+                   np.sin(yaw), np.cos(yaw), zeros,
+                   zeros, zeros, ones], axis=1).reshape(-1, 3, 3)
+    rx = np.stack([ones, zeros, zeros,
+                   zeros, np.cos(pitch), -np.sin(pitch),
+                   zeros, np.sin(pitch), np.cos(pitch)], axis=1).reshape(-1, 3, 3)
+    ry = np.stack([np.cos(roll), zeros, np.sin(roll),
+                   zeros, ones, zeros,
+                   -np.sin(roll), zeros, np.cos(roll)], axis=1).reshape(-1, 3, 3)
+    return rz @ rx @ ry
+
+def camera_marker_geometry(positions, body_to_frame, size=1.0):
+    """Bake one camera marker per pose into shared vertex and edge arrays
+
+    positions is (N, 3) and body_to_frame (N, 3, 3); returns ((5N, 3)
+    vertices, (8N, 2) edges).
+    """
+    offsets = np.einsum('nij,kj->nki', body_to_frame, MARKER_VERTICES * size)
+    vertices = (positions[:, None, :] + offsets).reshape(-1, 3)
+    base = np.arange(len(positions))[:, None, None] * len(MARKER_VERTICES)
+    edges = (MARKER_EDGES[None, :, :] + base).reshape(-1, 2)
+    return vertices, edges
+
+def flight_collection(context):
+    """Return the collection holding flight visualization objects, creating it if needed"""
+    collection = bpy.data.collections.get(FLIGHT_COLLECTION)
+    if collection is None:
+        collection = bpy.data.collections.new(FLIGHT_COLLECTION)
+    if collection.name not in context.scene.collection.children:
+        context.scene.collection.children.link(collection)
+    return collection
+
+def replace_mesh_object(name, vertices, edges, collection):
+    """Create or rebuild a single edge mesh object from numpy arrays with foreach_set
+
+    The previous mesh of the same name is removed so repeated runs do not
+    leave orphaned datablocks behind.
+    """
+    obj = bpy.data.objects.get(name)
+    old_mesh = obj.data if obj is not None else bpy.data.meshes.get(name)
+
+    mesh = bpy.data.meshes.new(name)
+    vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+    edges = np.ascontiguousarray(edges, dtype=np.int32)
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set("co", vertices.ravel())
+    mesh.edges.add(len(edges))
+    mesh.edges.foreach_set("vertices", edges.ravel())
+    mesh.update()
+    mesh.validate()
+
+    if obj is None:
+        obj = bpy.data.objects.new(name, mesh)
+        collection.objects.link(obj)
+    else:
+        obj.data = mesh
+    if old_mesh is not None and old_mesh.users == 0:
+        bpy.data.meshes.remove(old_mesh)
+    mesh.name = name
+    return obj
+
+def mesh_world_vertices(obj):
+    """Return the world-space vertex positions of a mesh object as an (N, 3) float64 array"""
+    mesh = obj.data
+    vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", vertices)
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    return vertices.reshape(-1, 3).astype(np.float64) @ matrix[:3, :3].T + matrix[:3, 3]
+
+def _has_srgb_access(layer):
+    """Whether the items of a color attribute expose color_srgb (Blender 3.4+)"""
+    return "color_srgb" in layer.bl_rna.properties["data"].fixed_type.properties
+
+def _vertex_colors(mesh):
+    """Return per-vertex sRGB RGBA bytes from the active color attribute, or None"""
+    attributes = getattr(mesh, "color_attributes", None)
+    layer = attributes.active_color if attributes is not None else None
+    # Legacy vertex color layers hold sRGB values; color attributes (Blender 3.2+) read as linear
+    linear = layer is not None
+    if layer is None and getattr(mesh, "vertex_colors", None):
+        layer = mesh.vertex_colors.active
+    if layer is None:
+        return None
+
+    values = np.empty(len(layer.data) * 4, dtype=np.float32)
+    if linear and _has_srgb_access(layer):
+        layer.data.foreach_get("color_srgb", values)
+        linear = False
+    else:
+        layer.data.foreach_get("color", values)
+    values = values.reshape(-1, 4)
+    if linear:
+        values[:, :3] = mesh_io.linear_to_srgb(values[:, :3])
+    if len(layer.data) != len(mesh.vertices):
+        # Face corner colors: scatter to vertices through the loop vertex indices
+        loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", loop_vertices)
+        per_vertex = np.ones((len(mesh.vertices), 4), dtype=np.float32)
+        per_vertex[loop_vertices] = values
+        values = per_vertex
+    return np.clip(np.round(values * 255.0), 0, 255).astype(np.uint8)
+
+def object_mesh_buffers(obj, world=True):
+    """Pull the triangulated geometry of a mesh object into numpy arrays with foreach_get
+
+    Returns mesh_io.MeshBuffers with world-space positions and normals
+    unless world is False.
+    """
+    mesh = obj.data
+    count = len(mesh.vertices)
+    vertices = np.empty(count * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", vertices)
+    vertices = vertices.reshape(-1, 3)
+
+    mesh.calc_loop_triangles()
+    faces = np.empty(len(mesh.loop_triangles) * 3, dtype=np.uint32)
+    mesh.loop_triangles.foreach_get("vertices", faces)
+
+    normals = None
+    if len(mesh.loop_triangles):
+        normals = np.empty(count * 3, dtype=np.float32)
+        if hasattr(mesh, "vertex_normals"):
+            mesh.vertex_normals.foreach_get("vector", normals)
+        else:
+            mesh.vertices.foreach_get("normal", normals)
+        normals = normals.reshape(-1, 3)
+
+    if world:
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        vertices = (vertices @ matrix[:3, :3].T + matrix[:3, 3]).astype(np.float32)
+        if normals is not None:
+            normal_matrix = np.linalg.inv(matrix[:3, :3]).T
+            normals = normals @ normal_matrix.T
+            lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+            normals = (normals / np.where(lengths > 0, lengths, 1.0)).astype(np.float32)
+
+    return mesh_io.MeshBuffers(vertices, faces, normals, _vertex_colors(mesh))
+
+def point_cloud_object(name, points, collection, matrix_world=None):
+    """Create or rebuild a vertex-only mesh object from mesh_io.MeshBuffers with foreach_set
+
+    Colors go into a point color attribute where the Blender version has
+    them; the sRGB bytes are written as sRGB, not as linear values.
+    """
+    obj = bpy.data.objects.get(name)
+    old_mesh = obj.data if obj is not None else bpy.data.meshes.get(name)
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(points.vertices))
+    mesh.vertices.foreach_set("co", np.ascontiguousarray(points.vertices, dtype=np.float32).ravel())
+    if points.colors is not None and hasattr(mesh, "color_attributes"):
+        layer = mesh.color_attributes.new("Col", 'BYTE_COLOR', 'POINT')
+        colors = points.colors.astype(np.float32) / 255.0
+        if _has_srgb_access(layer):
+            layer.data.foreach_set("color_srgb", colors.ravel())
+        else:
+            # color is linear on color attributes; PLY bytes are sRGB, alpha is not
+            colors[:, :3] = mesh_io.srgb_to_linear(colors[:, :3])
+            layer.data.foreach_set("color", colors.ravel())
+    mesh.update()
+
+    if obj is None:
+        obj = bpy.data.objects.new(name, mesh)
+        collection.objects.link(obj)
+    else:
+        obj.data = mesh
+    if matrix_world is not None:
+        obj.matrix_world = matrix_world
+    if old_mesh is not None and old_mesh.users == 0:
+        bpy.data.meshes.remove(old_mesh)
+    mesh.name = name
+    return obj
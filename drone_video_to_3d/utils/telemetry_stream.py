@@ -0,0 +1,178 @@
+import re
+import numpy as np
+
+from .process_supervisor import run_tool
+
+# ExifTool prints one tag per line in its JSON output. With -G3 every tag is
+# prefixed by its document ("Main" or "Doc<N>" for embedded telemetry samples).
+TAG_LINE = re.compile(r'^\s*"(?:(?P<doc>Main|Doc\d+)(?:-[\w-]+)?:)?(?P<tag>[A-Za-z0-9]+)"\s*:\s*(?P<value>.*?),?\s*$')
+
+# Telemetry fields collected per sample and the ExifTool tags that feed them
+SAMPLE_FIELDS = {
+    "time": ("SampleTime",),
+    "latitude": ("GPSLatitude",),
+    "longitude": ("GPSLongitude",),
+    "altitude": ("GPSAltitude", "AbsoluteAltitude"),
+    "speed": ("GPSSpeed",),
+    "roll": ("Roll", "DroneRoll", "FlightRollDegree"),
+    "pitch": ("Pitch", "DronePitch", "FlightPitchDegree"),
+    "yaw": ("Yaw", "DroneYaw", "FlightYawDegree"),
+}
+TAG_TO_FIELD = {tag: field for field, tags in SAMPLE_FIELDS.items() for tag in tags}
+
+# Per-file camera tags taken from the main document
+CAMERA_TAGS = {
+    "FocalLength": "focal_length",
+    "Aperture": "aperture",
+    "SensorWidth": "sensor_width",
+}
+
+def exiftool_command(video_path):
+    """ExifTool invocation producing flat, numeric, per-sample JSON lines"""
+    return ["exiftool", "-json", "-ee", "-n", "-G3", video_path]
+
+def _number(text):
+    text = text.strip().strip('"')
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+class TelemetryBuffer:
+    """Growable column arrays for telemetry samples
+
+    Capacity starts at a size hint and doubles when full, so appending costs
+    amortized O(1) and memory is proportional to the number of samples rather
+    than to the size of the JSON text.
+    """
+
+    def __init__(self, capacity=4096):
+        self.size = 0
+        self.columns = {field: np.full(capacity, np.nan) for field in SAMPLE_FIELDS}
+
+    def append(self, sample):
+        capacity = len(self.columns["latitude"])
+        if self.size == capacity:
+            for field, column in self.columns.items():
+                grown = np.full(capacity * 2, np.nan)
+                grown[:capacity] = column
+                self.columns[field] = grown
+        for field, value in sample.items():
+            self.columns[field][self.size] = value
+        self.size += 1
+
+    def arrays(self):
+        """Return trimmed views of the filled part of every column"""
+        return {field: column[:self.size] for field, column in self.columns.items()}
+
+class TelemetryParser:
+    """Incremental parser for ExifTool -json -ee -n -G3 output fed one line at a time"""
+
+    def __init__(self, capacity=4096):
+        self.buffer = TelemetryBuffer(capacity)
+        self.camera = {}
+        self.current_doc = None
+        self.current = {}
+
+    def feed_line(self, line):
+        match = TAG_LINE.match(line)
+        if not match:
+            return
+        doc = match.group("doc") or "Main"
+        tag = match.group("tag")
+        if doc != self.current_doc:
+            self._commit()
+            self.current_doc = doc
+
+        if tag in TAG_TO_FIELD:
+            value = _number(match.group("value"))
+            field = TAG_TO_FIELD[tag]
+            # The first of several alias tags wins
+            if value is not None and field not in self.current:
+                self.current[field] = value
+        elif doc == "Main" and tag in CAMERA_TAGS:
+            value = _number(match.group("value"))
+            if value is not None:
+                self.camera[CAMERA_TAGS[tag]] = value
+
+    def _commit(self):
+        if "latitude" in self.current and "longitude" in self.current:
+            self.buffer.append(self.current)
+        self.current = {}
+
+    def finish(self):
+        """Flush the last sample and return (samples, camera)"""
+        self._commit()
+        return self.buffer.arrays(), dict(self.camera)
+
+def stream_exiftool_telemetry(video_path, raw_output_path=None, capacity=4096):
+    """Run ExifTool and parse its telemetry while tee-ing its unaltered JSON output to disk
+
+    Returns (samples, camera) where samples maps field names to float arrays
+    (NaN where a sample lacks a field).
+    """
+    parser = TelemetryParser(capacity)
+    raw = open(raw_output_path, 'wb') if raw_output_path else None
+    try:
+        run_tool(exiftool_command(video_path), on_stdout=parser.feed_line, stdout_raw=raw)
+    finally:
+        if raw is not None:
+            raw.close()
+    return parser.finish()
+
+def parse_telemetry_file(json_path, capacity=4096):
+    """Parse a tee'd ExifTool JSON file line by line"""
+    parser = TelemetryParser(capacity)
+    with open(json_path, 'r') as f:
+        for line in f:
+            parser.feed_line(line)
+    return parser.finish()
+
+def telemetry_to_gps_data(samples, camera, frame_names=None, frame_times=None):
+    """Resample telemetry at the extracted frames and build the gps_data dict used by gps_utils
+
+    When sample times and frame timestamps are both known, every field is
+    linearly interpolated at each frame's timestamp. Otherwise samples are
+    assigned to frames in order.
+    """
+    valid = ~(np.isnan(samples["latitude"]) | np.isnan(samples["longitude"]))
+    samples = {field: values[valid] for field, values in samples.items()}
+    if not len(samples["latitude"]):
+        return {}
+
+    camera_info = {
+        "focal_length": camera.get("focal_length", 24.0),
+        "aperture": camera.get("aperture", 2.8),
+        "sensor_width": camera.get("sensor_width", 13.2),
+    }
+
+    sample_times = samples["time"]
+    if (frame_names and frame_times is not None and not np.isnan(frame_times).any()
+            and not np.isnan(sample_times).any()):
+        order = np.argsort(sample_times, kind='stable')
+        resampled = {}
+        for field, values in samples.items():
+            known = ~np.isnan(values[order])
+            if known.any():
+                resampled[field] = np.interp(frame_times, sample_times[order][known], values[order][known])
+            else:
+                resampled[field] = np.zeros(len(frame_times))
+    else:
+        frame_names = [f"frame_{i + 1:04d}.png" for i in range(len(samples["latitude"]))]
+        resampled = {field: np.nan_to_num(values) for field, values in samples.items()}
+
+    gps_data = {}
+    for i, frame_name in enumerate(frame_names):
+        gps_data[frame_name] = {
+            "gps": {
+                "latitude": float(resampled["latitude"][i]),
+                "longitude": float(resampled["longitude"][i]),
+                "altitude": float(resampled["altitude"][i]),
+                "speed": float(resampled["speed"][i]),
+                "roll": float(resampled["roll"][i]),
+                "pitch": float(resampled["pitch"][i]),
+                "yaw": float(resampled["yaw"][i]),
+            },
+            "camera": dict(camera_info)
+        }
+    return gps_data
@@ -0,0 +1,226 @@
+import os
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from . import mesh_io
+from . import mesh_simplify
+
+TILESET_NAME = "tileset.json"
+ARRAYS_NAME = "mesh_arrays"
+
+# Grid cells along the longest edge of a parent tile when simplifying it
+PARENT_GRID_RESOLUTION = 128
+
+def face_centroids(mesh, chunk_size=mesh_io.CHUNK_SIZE):
+    """Return (M, 3) triangle centroids, computed in chunks to bound temporary memory"""
+    centroids = np.empty((mesh.face_count, 3), dtype=np.float32)
+    for start in range(0, mesh.face_count, chunk_size):
+        centroids[start:start + chunk_size] = mesh.vertices[mesh.faces[start:start + chunk_size]].mean(axis=1)
+    return centroids
+
+def build_octree(centroids, bounds_min, bounds_max, max_faces_per_tile, max_depth=10):
+    """Split triangles by centroid into an octree whose leaves hold at most max_faces_per_tile
+
+    Only axes along which the node is at least half as long as its longest
+    edge are split, so flat survey scans become quadtrees. Returns a list of
+    nodes (dicts with id, level, bounds, faces for leaves and children for
+    internal nodes); node 0 is the root.
+    """
+    nodes = []
+
+    def add(faces, lower, upper, level):
+        node = {"id": len(nodes), "level": level, "min": lower, "max": upper, "children": []}
+        nodes.append(node)
+        if len(faces) <= max_faces_per_tile or level >= max_depth:
+            node["faces"] = faces
+            return node["id"]
+
+        extent = upper - lower
+        split_axes = np.flatnonzero(extent >= 0.5 * extent.max())
+        centre = (lower + upper) / 2.0
+        octant = np.zeros(len(faces), dtype=np.int64)
+        for bit, axis in enumerate(split_axes):
+            octant |= (centroids[faces, axis] >= centre[axis]).astype(np.int64) << bit
+        for code in range(1 << len(split_axes)):
+            members = faces[octant == code]
+            if not len(members):
+                continue
+            child_lower, child_upper = lower.copy(), upper.copy()
+            for bit, axis in enumerate(split_axes):
+                if code >> bit & 1:
+                    child_lower[axis] = centre[axis]
+                else:
+                    child_upper[axis] = centre[axis]
+            node["children"].append(add(members, child_lower, child_upper, level + 1))
+        return node["id"]
+
+    add(np.arange(len(centroids)), np.asarray(bounds_min, dtype=np.float64),
+        np.asarray(bounds_max, dtype=np.float64), 0)
+    return nodes
+
+def collect_faces(nodes, node_id):
+    """Return the face indices of every leaf below a node"""
+    node = nodes[node_id]
+    if "faces" in node:
+        return node["faces"]
+    return np.concatenate([collect_faces(nodes, child) for child in node["children"]])
+
+def point_subset(mesh, vertex_indices):
+    """Return the points of a vertex-only mesh at the given indices"""
+    vertex_indices = np.asarray(vertex_indices)
+    return mesh_io.MeshBuffers(
+        mesh.vertices[vertex_indices], None,
+        None if mesh.normals is None else mesh.normals[vertex_indices],
+        None if mesh.colors is None else mesh.colors[vertex_indices]
+    )
+
+def build_tile(arrays_path, output_file, face_indices, cell_size, compact=False):
+    """Write one tile: the given triangles, simplified when cell_size is positive
+
+    For a point cloud (no faces in arrays_path) face_indices are vertex
+    indices and the tile holds those points. With compact=True positions are quantized relative to the tile's own
+    bounds, so 16 bits resolve far finer detail than across the whole model.
+
+    Runs in a worker process; the mesh arrays are memory-mapped from
+    arrays_path instead of being copied into every worker.
+    """
+    arrays = _ArrayDirectory(arrays_path)
+    mesh = mesh_io.MeshBuffers(
+        arrays["vertices"], arrays["faces"] if "faces" in arrays else None,
+        arrays["normals"] if "normals" in arrays else None,
+        arrays["colors"] if "colors" in arrays else None
+    )
+    if mesh.faces is None:
+        tile = point_subset(mesh, face_indices)
+    else:
+        tile = mesh_simplify.submesh(mesh, face_indices)
+    if cell_size > 0:
+        tile = mesh_simplify.cluster_vertices(tile, cell_size)
+    mesh_io.write_glb(output_file, tile, name=os.path.splitext(os.path.basename(output_file))[0],
+                      compact=compact)
+    return tile.vertex_count, tile.face_count
+
+def save_arrays(arrays_path, mesh):
+    """Store mesh buffers uncompressed so workers can memory-map them"""
+    arrays = {"vertices": mesh.vertices}
+    if mesh.faces is not None:
+        arrays["faces"] = mesh.faces
+    if mesh.normals is not None:
+        arrays["normals"] = mesh.normals
+    if mesh.colors is not None:
+        arrays["colors"] = mesh.colors
+    # np.load can only memory-map plain .npy files, so write one per array
+    os.makedirs(arrays_path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(arrays_path, f"{name}.npy"), np.ascontiguousarray(array))
+    return arrays_path
+
+class _ArrayDirectory:
+    """Mapping over the .npy files written by save_arrays, memory-mapped on access"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __contains__(self, name):
+        return os.path.exists(os.path.join(self.directory, f"{name}.npy"))
+
+    def __getitem__(self, name):
+        return np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode='r')
+
+def _box(lower, upper):
+    """3D Tiles box bounding volume: centre followed by the three half-axes"""
+    centre = (lower + upper) / 2.0
+    half = (upper - lower) / 2.0
+    return [float(centre[0]), float(centre[1]), float(centre[2]),
+            float(half[0]), 0.0, 0.0,
+            0.0, float(half[1]), 0.0,
+            0.0, 0.0, float(half[2])]
+
+def tileset_json(nodes, errors, root_transform=None):
+    """Build the tileset document from the octree and per-node geometric errors"""
+
+    def tile(node_id):
+        node = nodes[node_id]
+        entry = {
+            "boundingVolume": {"box": _box(node["min"], node["max"])},
+            "geometricError": errors[node_id],
+            "refine": "REPLACE",
+            "content": {"uri": f"tiles/{node_id}.glb"},
+        }
+        if node["children"]:
+            entry["children"] = [tile(child) for child in node["children"]]
+        return entry
+
+    root = tile(0)
+    if root_transform is not None:
+        # 3D Tiles matrices are column-major
+        root["transform"] = np.asarray(root_transform, dtype=np.float64).T.ravel().tolist()
+    return {
+        "asset": {"version": "1.1", "generator": "Drone Video to 3D"},
+        "geometricError": float(np.linalg.norm(nodes[0]["max"] - nodes[0]["min"])),
+        "root": root,
+    }
+
+def export_tileset(mesh, output_dir, max_faces_per_tile=100000, workers=0, root_transform=None, compact=False,
+                   log=print):
+    """Write a 3D Tiles tileset of mesh into output_dir and return the tileset path
+
+    Leaves hold the full-resolution triangles of their octree cell and every
+    parent holds a vertex-clustered version of its whole cell with a
+    geometric error equal to the clustering cell diagonal. Bounding volumes
+    are in the mesh's Z-up axes; the Y-up glTF content is rotated back by
+    3D Tiles viewers. Tiles are built in parallel worker processes.
+    root_transform, if given, is the 4x4 matrix from mesh coordinates to
+    WGS84 ECEF (for example LocalFrame.enu_to_wgs84()). compact writes
+    quantized tiles (see mesh_io.write_glb). A mesh without faces, such as
+    a dense point cloud, is split by its vertices and written as point tiles.
+    """
+    if mesh.vertex_count == 0:
+        raise ValueError("Tiled export needs a mesh with vertices")
+    tiles_dir = os.path.join(output_dir, "tiles")
+    os.makedirs(tiles_dir, exist_ok=True)
+
+    if mesh.face_count:
+        centroids = face_centroids(mesh)
+    else:
+        # Point clouds are split by the points themselves
+        centroids = mesh.vertices
+        mesh = mesh_io.MeshBuffers(mesh.vertices, None, mesh.normals, mesh.colors)
+    nodes = build_octree(centroids, mesh.vertices.min(axis=0), mesh.vertices.max(axis=0), max_faces_per_tile)
+
+    arrays_dir = save_arrays(os.path.join(output_dir, ARRAYS_NAME), mesh)
+    errors = {}
+    jobs = []
+    for node in nodes:
+        if "faces" in node:
+            errors[node["id"]] = 0.0
+            jobs.append((node["id"], node["faces"], 0.0))
+        else:
+            cell_size = float((node["max"] - node["min"]).max()) / PARENT_GRID_RESOLUTION
+            errors[node["id"]] = cell_size * float(np.sqrt(3.0))
+            jobs.append((node["id"], collect_faces(nodes, node["id"]), cell_size))
+
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    log(f"Building {len(jobs)} tiles with {workers} worker processes")
+    # Spawned workers never inherit the host application's state (Blender included)
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [
+                executor.submit(build_tile, arrays_dir, os.path.join(tiles_dir, f"{node_id}.glb"), faces, cell_size,
+                                compact)
+                for node_id, faces, cell_size in jobs
+            ]
+            for future in futures:
+                future.result()
+    finally:
+        for name in os.listdir(arrays_dir):
+            os.remove(os.path.join(arrays_dir, name))
+        os.rmdir(arrays_dir)
+
+    tileset_file = os.path.join(output_dir, TILESET_NAME)
+    with open(tileset_file, 'w') as f:
+        json.dump(tileset_json(nodes, errors, root_transform), f, indent=2)
+    return tileset_file
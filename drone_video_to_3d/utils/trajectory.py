@@ -0,0 +1,393 @@
+import os
+import json
+import numpy as np
+
+from . import gps_utils
+from . import colmap_db
+from .project_store import ProjectStore, PROJECT_DATABASE
+
+# WGS84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1.0 / 298.257223563
+WGS84_E2 = WGS84_F * (2.0 - WGS84_F)
+WGS84_B = WGS84_A * (1.0 - WGS84_F)
+WGS84_EP2 = (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+
+# Radius of the sphere used by gps_utils.convert_to_cartesian without pyproj
+SPHERE_RADIUS = 6378137.0
+
+# Written next to a GPS-aligned model: the ECEF position of its coordinate origin
+MODEL_ORIGIN_FILE = "chunk_origin.txt"
+
+def geodetic_to_ecef(lat, lon, alt):
+    """Convert WGS84 latitude/longitude (degrees) and ellipsoidal height to ECEF metres"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    alt = np.asarray(alt, dtype=np.float64)
+    sin_lat = np.sin(lat)
+    n = WGS84_A / np.sqrt(1.0 - WGS84_E2 * sin_lat ** 2)
+    x = (n + alt) * np.cos(lat) * np.cos(lon)
+    y = (n + alt) * np.cos(lat) * np.sin(lon)
+    z = (n * (1.0 - WGS84_E2) + alt) * sin_lat
+    return x, y, z
+
+def ecef_to_geodetic(x, y, z):
+    """Convert ECEF metres to WGS84 latitude/longitude (degrees) and height
+
+    Uses Bowring's closed-form approximation followed by one refinement
+    step, which is accurate to well below a millimetre near the surface.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    z = np.asarray(z, dtype=np.float64)
+    lon = np.arctan2(y, x)
+    p = np.hypot(x, y)
+    theta = np.arctan2(z * WGS84_A, p * WGS84_B)
+    lat = np.arctan2(z + WGS84_EP2 * WGS84_B * np.sin(theta) ** 3,
+                     p - WGS84_E2 * WGS84_A * np.cos(theta) ** 3)
+    # Refine once with the latitude-dependent reduced latitude
+    theta = np.arctan2((1.0 - WGS84_F) * np.sin(lat), np.cos(lat))
+    lat = np.arctan2(z + WGS84_EP2 * WGS84_B * np.sin(theta) ** 3,
+                     p - WGS84_E2 * WGS84_A * np.cos(theta) ** 3)
+    sin_lat = np.sin(lat)
+    n = WGS84_A / np.sqrt(1.0 - WGS84_E2 * sin_lat ** 2)
+    # Height from whichever formula is well conditioned at this latitude
+    cos_lat = np.cos(lat)
+    near_pole = np.abs(cos_lat) < 1e-10
+    alt = np.where(near_pole,
+                   np.abs(z) / np.where(near_pole, np.abs(sin_lat), 1.0) - n * (1.0 - WGS84_E2),
+                   p / np.where(near_pole, 1.0, cos_lat) - n)
+    return np.degrees(lat), np.degrees(lon), alt
+
+def spherical_to_geodetic(x, y, z):
+    """Invert the spherical fallback of gps_utils.convert_to_cartesian"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    z = np.asarray(z, dtype=np.float64)
+    r = np.sqrt(x * x + y * y + z * z)
+    lat = np.degrees(np.arcsin(z / r))
+    lon = np.degrees(np.arctan2(y, x))
+    return lat, lon, r - SPHERE_RADIUS
+
+def cartesian_to_geodetic(x, y, z):
+    """Invert gps_utils.convert_to_cartesian, whichever model it used"""
+    if gps_utils.pyproj is None:
+        return spherical_to_geodetic(x, y, z)
+    return ecef_to_geodetic(x, y, z)
+
+def geodetic_to_spherical(lat, lon, alt):
+    """The spherical fallback of gps_utils.convert_to_cartesian, vectorized"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    r = SPHERE_RADIUS + np.asarray(alt, dtype=np.float64)
+    return r * np.cos(lat) * np.cos(lon), r * np.cos(lat) * np.sin(lon), r * np.sin(lat)
+
+def geodetic_to_cartesian(lat, lon, alt):
+    """Convert like gps_utils.convert_to_cartesian, so results share the frame of the stored poses"""
+    if gps_utils.pyproj is None:
+        return geodetic_to_spherical(lat, lon, alt)
+    return geodetic_to_ecef(lat, lon, alt)
+
+def enu_rotation(lat0, lon0):
+    """Rotation matrix whose rows are the east, north and up axes at lat0/lon0 (degrees) in ECEF"""
+    lat0 = np.radians(float(lat0))
+    lon0 = np.radians(float(lon0))
+    sin_lat, cos_lat = np.sin(lat0), np.cos(lat0)
+    sin_lon, cos_lon = np.sin(lon0), np.cos(lon0)
+    return np.array([
+        [-sin_lon, cos_lon, 0.0],
+        [-sin_lat * cos_lon, -sin_lat * sin_lon, cos_lat],
+        [cos_lat * cos_lon, cos_lat * sin_lon, sin_lat],
+    ])
+
+def ecef_to_enu(points, origin, rotation):
+    """Express (N, 3) ECEF points in the local frame given by origin and rotation"""
+    return (np.asarray(points, dtype=np.float64) - origin) @ rotation.T
+
+def enu_to_ecef(points, origin, rotation):
+    """Inverse of ecef_to_enu"""
+    return np.asarray(points, dtype=np.float64) @ rotation + origin
+
+def write_model_origin(directory, origin):
+    """Record the ECEF origin of a GPS-aligned model in directory/MODEL_ORIGIN_FILE"""
+    with open(os.path.join(directory, MODEL_ORIGIN_FILE), 'w') as f:
+        f.write(f"{origin[0]:.6f} {origin[1]:.6f} {origin[2]:.6f}\n")
+
+def read_model_origin(directory):
+    """Return the recorded ECEF origin of the model in directory, or None when it is not GPS-aligned"""
+    try:
+        with open(os.path.join(directory, MODEL_ORIGIN_FILE), 'r') as f:
+            return np.array([float(v) for v in f.read().split()[:3]])
+    except (OSError, ValueError):
+        return None
+
+def model_frame(photo_dir, reference_ecef, require_alignment=False):
+    """Return (origin, rotation) of the local frame the reconstructed model lives in
+
+    GPS-aligned models (see chunked_reconstruction.align_model) are in ECEF
+    offset by the origin in chunk_origin.txt, so their rotation is the
+    identity. Other models keep COLMAP's arbitrary scale and orientation;
+    with require_alignment they raise ValueError, otherwise an east-north-up
+    frame centred on the reference positions stands in for them. Points map
+    into the frame with ecef_to_enu.
+    """
+    origin = read_model_origin(photo_dir)
+    if origin is not None:
+        return origin, np.eye(3)
+    if require_alignment:
+        raise ValueError("The model is not aligned to GPS; run photogrammetry with GPS metadata to georeference it")
+    origin = np.asarray(reference_ecef, dtype=np.float64).reshape(-1, 3).mean(axis=0)
+    lat0, lon0, _ = cartesian_to_geodetic(*origin)
+    return origin, enu_rotation(lat0, lon0)
+
+def enu_to_frame(origin, rotation):
+    """Return the rotation that maps east-north-up vectors at origin into a model frame"""
+    lat0, lon0, _ = cartesian_to_geodetic(*origin)
+    return rotation @ enu_rotation(lat0, lon0).T
+
+def local_metres(lat, lon):
+    """Project latitude/longitude to a local equirectangular plane in metres"""
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    lat0 = np.radians(np.mean(lat)) if len(lat) else 0.0
+    east = np.radians(lon - (lon[0] if len(lon) else 0.0)) * WGS84_A * np.cos(lat0)
+    north = np.radians(lat - (lat[0] if len(lat) else 0.0)) * WGS84_A
+    return np.stack([east, north], axis=1)
+
+def douglas_peucker_ranks(points):
+    """Rank every point by the Douglas-Peucker tolerance at which it is kept
+
+    A point's rank is the largest tolerance for which simplification still
+    keeps it; the endpoints rank infinite. Keeping the N highest ranked
+    points gives the Douglas-Peucker result for the tolerance that yields N
+    points, so any point budget can be met from one pass. All segments of
+    one recursion level are split together as a single array operation.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    count = len(points)
+    ranks = np.zeros(count)
+    if count == 0:
+        return ranks
+    ranks[0] = ranks[-1] = np.inf
+
+    starts = np.array([0], dtype=np.int64)
+    ends = np.array([count - 1], dtype=np.int64)
+    parents = np.array([np.inf])
+    while True:
+        inner = ends - starts - 1
+        active = inner > 0
+        starts, ends, parents, inner = starts[active], ends[active], parents[active], inner[active]
+        if not len(starts):
+            break
+
+        # Flatten the inner points of every segment with their segment number
+        offsets = np.concatenate([[0], np.cumsum(inner)[:-1]])
+        segment = np.repeat(np.arange(len(starts)), inner)
+        index = starts[segment] + 1 + (np.arange(len(segment)) - offsets[segment])
+
+        # Distance of each inner point from its segment
+        a = points[starts[segment]]
+        ab = points[ends[segment]] - a
+        ap = points[index] - a
+        length2 = np.einsum('ij,ij->i', ab, ab)
+        t = np.clip(np.einsum('ij,ij->i', ap, ab) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+        distances = np.linalg.norm(ap - t[:, None] * ab, axis=1)
+
+        # Farthest point per segment: sort by segment, then by descending distance
+        order = np.lexsort((-distances, segment))
+        farthest = order[offsets]
+        split = index[farthest]
+        # Ranks never exceed the parent's so the kept set is always a valid simplification
+        rank = np.minimum(parents, distances[farthest])
+        ranks[split] = rank
+
+        starts, ends, parents = (np.concatenate([starts, split]), np.concatenate([split, ends]),
+                                 np.concatenate([rank, rank]))
+    return ranks
+
+def simplify_to_budget(points, max_points, tolerance=0.0):
+    """Return sorted indices of at most max_points points kept by Douglas-Peucker
+
+    Points whose rank does not exceed tolerance are dropped as well.
+    """
+    ranks = douglas_peucker_ranks(points)
+    candidates = np.flatnonzero(ranks > tolerance) if tolerance > 0.0 else np.arange(len(ranks))
+    if len(candidates) > max_points:
+        order = np.argsort(-ranks[candidates], kind='stable')
+        candidates = candidates[order[:max(2, int(max_points))]]
+    return np.sort(candidates)
+
+def encode_polyline(lat, lon, precision=5):
+    """Encode coordinates with the Google encoded polyline algorithm"""
+    factor = 10 ** precision
+    values = np.stack([np.round(np.asarray(lat) * factor), np.round(np.asarray(lon) * factor)], axis=1).astype(np.int64)
+    deltas = np.diff(values, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    # Zig-zag encode signs so small negative deltas stay short
+    deltas = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+    chunks = []
+    for value in deltas.tolist():
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+def decode_polyline(encoded, precision=5):
+    """Decode an encoded polyline back to (lat, lon) arrays"""
+    values = []
+    value = shift = 0
+    for char in encoded:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    coords = np.cumsum(np.asarray(values, dtype=np.int64).reshape(-1, 2), axis=0) / float(10 ** precision)
+    return coords[:, 0], coords[:, 1]
+
+def trajectory_geojson(lat, lon, alt=None, properties=None):
+    """Build a GeoJSON Feature with the trajectory as a LineString"""
+    columns = [np.round(lon, 7), np.round(lat, 7)]
+    if alt is not None:
+        columns.append(np.round(alt, 2))
+    return {
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": np.stack(columns, axis=1).tolist()},
+        "properties": properties or {}
+    }
+
+def write_trajectory_geojson(output_file, lat, lon, alt=None, properties=None):
+    with open(output_file, 'w') as f:
+        json.dump({"type": "FeatureCollection", "features": [trajectory_geojson(lat, lon, alt, properties)]},
+                  f, separators=(',', ':'))
+    return output_file
+
+MAP_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <title>Drone GPS Path</title>
+  <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+  <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+  <style>
+    html, body, #map { height: 100%; margin: 0; }
+    .info { background: white; padding: 6px 8px; font: 12px Arial, sans-serif; }
+  </style>
+</head>
+<body>
+  <div id="map"></div>
+  <script>
+    var track = __TRACK__;
+    function decode(str, precision) {
+      var coords = [], lat = 0, lon = 0, i = 0, factor = Math.pow(10, precision);
+      while (i < str.length) {
+        var result = 0, shift = 0, b;
+        do { b = str.charCodeAt(i++) - 63; result |= (b & 0x1f) << shift; shift += 5; } while (b >= 0x20);
+        lat += (result & 1) ? ~(result >> 1) : (result >> 1);
+        result = 0; shift = 0;
+        do { b = str.charCodeAt(i++) - 63; result |= (b & 0x1f) << shift; shift += 5; } while (b >= 0x20);
+        lon += (result & 1) ? ~(result >> 1) : (result >> 1);
+        coords.push([lat / factor, lon / factor]);
+      }
+      return coords;
+    }
+    var map = L.map('map');
+    L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+      maxZoom: 19, attribution: '&copy; OpenStreetMap contributors'
+    }).addTo(map);
+    var points = decode(track.polyline, track.precision);
+    var line = L.polyline(points, {color: '#e4572e', weight: 3}).addTo(map);
+    L.circleMarker(points[0], {radius: 6, color: '#29bf12'}).addTo(map).bindTooltip('Start');
+    L.circleMarker(points[points.length - 1], {radius: 6, color: '#3f88c5'}).addTo(map).bindTooltip('End');
+    map.fitBounds(line.getBounds());
+    var info = L.control({position: 'topright'});
+    info.onAdd = function () {
+      var div = L.DomUtil.create('div', 'info');
+      div.innerHTML = 'Drone GPS path<br>' + track.kept + ' of ' + track.total + ' points';
+      return div;
+    };
+    info.addTo(map);
+  </script>
+</body>
+</html>
+"""
+
+def write_map_html(output_file, lat, lon, total=None, precision=5):
+    """Write a Leaflet page drawing the trajectory from an embedded encoded polyline"""
+    track = {
+        "polyline": encode_polyline(lat, lon, precision),
+        "precision": precision,
+        "kept": int(len(lat)),
+        "total": int(total if total is not None else len(lat)),
+    }
+    with open(output_file, 'w') as f:
+        f.write(MAP_TEMPLATE.replace("__TRACK__", json.dumps(track)))
+    return output_file
+
+def export_trajectory(lat, lon, alt, output_dir, max_points=2000, tolerance_m=0.0):
+    """Simplify a full trajectory to a point budget and write the map page and GeoJSON
+
+    Returns (map_file, geojson_file, kept, total).
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    alt = np.asarray(alt, dtype=np.float64)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    lat, lon, alt = lat[valid], lon[valid], np.nan_to_num(alt[valid])
+
+    keep = simplify_to_budget(local_metres(lat, lon), max_points, tolerance_m)
+    properties = {
+        "points": int(len(keep)),
+        "source_points": int(len(lat)),
+        "encoded_polyline": encode_polyline(lat[keep], lon[keep])
+    }
+    geojson_file = write_trajectory_geojson(os.path.join(output_dir, "gps_trajectory.geojson"),
+                                            lat[keep], lon[keep], alt[keep], properties)
+    map_file = write_map_html(os.path.join(output_dir, "gps_map.html"), lat[keep], lon[keep], total=len(lat))
+    return map_file, geojson_file, len(keep), len(lat)
+
+def load_trajectory(output_dir):
+    """Return (lat, lon, alt, source) for the most detailed track available
+
+    Prefers the raw telemetry samples in the project store, then its
+    per-frame GPS, and finally inverts the ECEF coordinates of a legacy
+    gps_poses.csv. Returns None when no track exists.
+    """
+    if os.path.exists(os.path.join(output_dir, PROJECT_DATABASE)):
+        with ProjectStore(output_dir) as store:
+            samples = store.read_telemetry()
+            if len(samples["latitude"]) >= 2:
+                return samples["latitude"], samples["longitude"], samples["altitude"], "telemetry"
+            names, gps = store.read_gps()
+            if names:
+                return gps["latitude"], gps["longitude"], gps["altitude"], "frames"
+
+    gps_csv = os.path.join(output_dir, "gps_poses.csv")
+    if os.path.exists(gps_csv):
+        names, positions = colmap_db.read_gps_poses_csv(gps_csv)
+        if names:
+            lat, lon, alt = cartesian_to_geodetic(positions[:, 0], positions[:, 1], positions[:, 2])
+            return lat, lon, alt, "gps_poses.csv"
+    return None
+
+def load_camera_poses(output_dir):
+    """Return (names, (N, 3) ECEF positions, yaw, pitch, roll) of the per-frame poses
+
+    Reads the project store, falling back to gps_poses.csv (without
+    attitude). Returns None when neither has poses.
+    """
+    if os.path.exists(os.path.join(output_dir, PROJECT_DATABASE)):
+        with ProjectStore(output_dir) as store:
+            names, gps = store.read_gps()
+        if names:
+            positions = np.stack([gps["x"], gps["y"], gps["z"]], axis=1)
+            return names, positions, gps["yaw"], gps["pitch"], gps["roll"]
+
+    gps_csv = os.path.join(output_dir, "gps_poses.csv")
+    if os.path.exists(gps_csv):
+        names, positions = colmap_db.read_gps_poses_csv(gps_csv)
+        if names:
+            zeros = np.zeros(len(names))
+            return names, positions, zeros, zeros, zeros
+    return None
@@ -1,8 +1,18 @@
 import os
-import subprocess
-import json
+import struct
+import numpy as np
 from pathlib import Path
 
+from .process_supervisor import run_tool, tool_available
+from .telemetry_stream import stream_exiftool_telemetry
+from .media_probe import probe_media
+from .project_store import ProjectStore, TIMESTAMPS_CSV
+
+# Width frames are scaled down to before measuring sharpness; ample to rank blur
+SHARPNESS_WIDTH = 640
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
 def check_dependencies():
     """Check if required external dependencies are available"""
     dependencies = {
@@ -14,51 +24,28 @@ def check_dependencies():
     }
     
     # Check FFmpeg
-    try:
-        subprocess.run(["ffmpeg", "-version"], capture_output=True, check=True)
-        dependencies["ffmpeg"] = True
-    except (subprocess.SubprocessError, FileNotFoundError):
-        pass
+    dependencies["ffmpeg"] = tool_available(["ffmpeg", "-version"])
         
     # Check ExifTool
-    try:
-        subprocess.run(["exiftool", "-ver"], capture_output=True, check=True)
-        dependencies["exiftool"] = True
-    except (subprocess.SubprocessError, FileNotFoundError):
-        pass
+    dependencies["exiftool"] = tool_available(["exiftool", "-ver"])
         
     # Check COLMAP
-    try:
-        subprocess.run(["colmap", "-h"], capture_output=True, check=True)
-        dependencies["colmap"] = True
-    except (subprocess.SubprocessError, FileNotFoundError):
-        pass
+    dependencies["colmap"] = tool_available(["colmap", "-h"])
         
     # Check Meshroom (this check might not work for all installations)
-    try:
-        meshroom_paths = [
-            "meshroom",  # If in PATH
-            "Meshroom",  # Alternate capitalization
-            os.path.join(os.path.expanduser("~"), "Meshroom", "meshroom"),  # Common install location
-        ]
-        
-        for path in meshroom_paths:
-            try:
-                subprocess.run([path, "-h"], capture_output=True, check=True)
-                dependencies["meshroom"] = True
-                break
-            except (subprocess.SubprocessError, FileNotFoundError):
-                continue
-    except:
-        pass
+    meshroom_paths = [
+        "meshroom",  # If in PATH
+        "Meshroom",  # Alternate capitalization
+        os.path.join(os.path.expanduser("~"), "Meshroom", "meshroom"),  # Common install location
+    ]
+    
+    for path in meshroom_paths:
+        if tool_available([path, "-h"]):
+            dependencies["meshroom"] = True
+            break
         
-    # Check CUDA
-    try:
-        # Try to check for CUDA using nvidia-smi
-        result = subprocess.run(["nvidia-smi"], capture_output=True, check=True)
-        dependencies["cuda"] = True
-    except (subprocess.SubprocessError, FileNotFoundError):
-        pass
+    # Check CUDA using nvidia-smi
+    dependencies["cuda"] = tool_available(["nvidia-smi"])
         
     return dependencies
 
@@ -86,113 +73,125 @@ def extract_frames(video_path, output_dir, frame_rate=1, quality="HIGH"):
         ]
         
         # Execute FFmpeg
-        subprocess.run(ffmpeg_cmd, check=True)
+        run_tool(ffmpeg_cmd, echo=True)
         
-        # Generate timestamps file using FFmpeg
-        timestamp_file = os.path.join(output_dir, "timestamps.csv")
-        ffmpeg_timestamp_cmd = [
-            "ffmpeg", "-i", video_path,
-            "-vf", f"select=not(mod(n\\,{frame_rate})),showinfo",
-            "-f", "null", "-"
-        ]
-        
-        # Capture showinfo output for timestamps
-        process = subprocess.Popen(ffmpeg_timestamp_cmd, stderr=subprocess.PIPE, universal_newlines=True)
-        output, _ = process.communicate()
-        
-        # Parse timestamps from showinfo output and save to file
-        with open(timestamp_file, 'w') as f:
-            f.write("frame,timestamp\n")
-            for line in output.split('\n'):
-                if "pts_time:" in line:
-                    pts_time = line.split("pts_time:")[1].split()[0]
-                    frame_num = line.split("n:")[1].split()[0]
-                    f.write(f"frame_{int(frame_num):04d}.png,{pts_time}\n")
+        # Record frame timestamps in the project store
+        names, timestamps = extract_timestamps(video_path, frame_rate=frame_rate)
+        with ProjectStore(output_dir) as store:
+            store.write_frames(names, timestamps)
+            store.write_quality(frame_sharpness(frames_dir, names))
+            store.export_timestamps_csv(os.path.join(output_dir, TIMESTAMPS_CSV))
         
         return True, frames_dir
     except Exception as e:
         return False, str(e)
 
+def extract_timestamps(video_path, timestamp_file=None, frame_rate=1):
+    """Collect frame names and timestamps of the selected frames by streaming FFmpeg showinfo output
+
+    Returns (names, timestamps); the frame,timestamp CSV is only written when
+    timestamp_file is given.
+    """
+    ffmpeg_timestamp_cmd = [
+        "ffmpeg", "-nostats", "-i", video_path,
+        "-vf", f"select=not(mod(n\\,{frame_rate})),showinfo",
+        "-f", "null", "-"
+    ]
+    
+    names = []
+    timestamps = []
+    
+    # Parse timestamps from showinfo output as each line arrives
+    def on_line(line):
+        if "pts_time:" in line:
+            pts_time = line.split("pts_time:")[1].split()[0]
+            frame_num = line.split("n:")[1].split()[0]
+            # showinfo counts from 0 while the image2 muxer numbers files from 1
+            names.append(f"frame_{int(frame_num) + 1:04d}.png")
+            timestamps.append(float(pts_time))
+    
+    run_tool(ffmpeg_timestamp_cmd, on_stderr=on_line)
+    
+    if timestamp_file:
+        with open(timestamp_file, 'w') as f:
+            f.write("frame,timestamp\n")
+            for name, timestamp in zip(names, timestamps):
+                f.write(f"{name},{timestamp}\n")
+    return names, np.asarray(timestamps, dtype=np.float64)
+
+def png_size(path):
+    """Read (width, height) from a PNG header"""
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    if len(header) < 24 or header[:8] != PNG_SIGNATURE:
+        raise ValueError(f"Not a PNG file: {path}")
+    return struct.unpack(">II", header[16:24])
+
+def laplacian_variance(image):
+    """Variance of the 4-neighbour Laplacian of a grayscale image; blurred frames score low"""
+    image = np.asarray(image, dtype=np.float32)
+    laplacian = (image[1:-1, 2:] + image[1:-1, :-2] + image[2:, 1:-1] + image[:-2, 1:-1]
+                 - 4.0 * image[1:-1, 1:-1])
+    return float(laplacian.var())
+
+class _SharpnessSink:
+    """Binary file stand-in that cuts a raw grayscale video stream into frames and scores each one"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.pending = bytearray()
+        self.scores = []
+
+    def write(self, chunk):
+        self.pending += chunk
+        frame_size = self.width * self.height
+        while len(self.pending) >= frame_size:
+            frame = np.frombuffer(bytes(self.pending[:frame_size]), dtype=np.uint8)
+            del self.pending[:frame_size]
+            self.scores.append(laplacian_variance(frame.reshape(self.height, self.width)))
+
+def frame_sharpness(frames_dir, names):
+    """Return a frame name -> sharpness mapping for consecutively numbered extracted frames
+
+    FFmpeg decodes the PNGs scaled down to SHARPNESS_WIDTH in grayscale and
+    streams them as raw pixels, so the frames are never held in memory at
+    full resolution. The score is the Laplacian variance.
+    """
+    names = sorted(names)
+    if not names:
+        return {}
+    width, height = png_size(os.path.join(frames_dir, names[0]))
+    scaled_width = max(2, min(SHARPNESS_WIDTH, width) // 2 * 2)
+    scaled_height = max(2, int(round(height * scaled_width / width / 2.0)) * 2)
+    first = int(os.path.splitext(names[0])[0].rsplit("_", 1)[-1])
+    sink = _SharpnessSink(scaled_width, scaled_height)
+    run_tool([
+        "ffmpeg", "-nostats",
+        "-start_number", str(first),
+        "-i", os.path.join(frames_dir, "frame_%04d.png"),
+        "-frames:v", str(len(names)),
+        "-vf", f"scale={scaled_width}:{scaled_height},format=gray",
+        "-f", "rawvideo", "-pix_fmt", "gray", "-"
+    ], stdout_raw=sink)
+    return dict(zip(names, sink.scores))
+
 def extract_gps_metadata_from_video(video_path, output_dir):
     """Extract GPS metadata from a video file using ExifTool"""
     try:
         metadata_file = os.path.join(output_dir, "gps_metadata.json")
         
-        # Extract metadata using ExifTool
-        exiftool_cmd = [
-            "exiftool", "-json", "-g", video_path
-        ]
-        
-        result = subprocess.run(exiftool_cmd, capture_output=True, check=True, text=True)
-        
-        # Save the metadata to file
-        with open(metadata_file, 'w') as f:
-            f.write(result.stdout)
+        # Stream the metadata straight to file, parsing telemetry on the way
+        stream_exiftool_telemetry(video_path, metadata_file)
             
         return True, metadata_file
     except Exception as e:
         return False, str(e)
 
-def analyze_video(video_path):
-    """Get information about a video file"""
+def analyze_video(video_path, use_cache=True):
+    """Get information about a video file (see media_probe.probe_media)"""
     try:
-        # Use FFprobe to get video information
-        ffprobe_cmd = [
-            "ffprobe", "-v", "quiet", "-print_format", "json",
-            "-show_format", "-show_streams", video_path
-        ]
-        
-        result = subprocess.run(ffprobe_cmd, capture_output=True, check=True, text=True)
-        video_info = json.loads(result.stdout)
-        
-        # Check for GPS stream or metadata
-        has_gps = False
-        
-        # Try to detect GPS metadata using ExifTool
-        try:
-            exiftool_cmd = [
-                "exiftool", "-json", "-g", "-a", video_path
-            ]
-            
-            result = subprocess.run(exiftool_cmd, capture_output=True, check=True, text=True)
-            exif_data = json.loads(result.stdout)
-            
-            # Check for GPS metadata
-            for entry in exif_data:
-                if "GPS" in entry:
-                    has_gps = True
-                    break
-        except:
-            pass
-        
-        # Extract video details
-        video_details = {
-            "has_gps": has_gps,
-            "duration": None,
-            "width": None,
-            "height": None,
-            "fps": None,
-            "codec": None
-        }
-        
-        for stream in video_info.get("streams", []):
-            if stream.get("codec_type") == "video":
-                video_details["width"] = stream.get("width")
-                video_details["height"] = stream.get("height")
-                
-                # Get FPS
-                if "avg_frame_rate" in stream:
-                    fps_parts = stream["avg_frame_rate"].split('/')
-                    if len(fps_parts) == 2 and int(fps_parts[1]) != 0:
-                        video_details["fps"] = round(int(fps_parts[0]) / int(fps_parts[1]), 2)
-                
-                video_details["codec"] = stream.get("codec_name")
-                break
-        
-        if "format" in video_info:
-            video_details["duration"] = float(video_info["format"].get("duration", 0))
-        
-        return video_details
+        return probe_media(video_path, use_cache=use_cache)
     except Exception as e:
         print(f"Error analyzing video: {str(e)}")
         return None
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Run the Drone Video to 3D pipeline without the Blender UI
+
+Usage:
+    blender --background --python headless_run.py -- --video flight.mp4 --output /data/flight
+
+Re-running the same command continues from the last completed stage: frame
+and GPS extraction are skipped when their outputs exist, and photogrammetry
+resumes from the checkpoints in photogrammetry/pipeline_manifest.json.
+"""
+
+import os
+import sys
+import argparse
+
+import bpy
+
+def parse_args():
+    """Parse the arguments after Blender's '--' separator"""
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="Headless Drone Video to 3D pipeline")
+    parser.add_argument("--video", required=True, help="Path to the drone video file")
+    parser.add_argument("--output", required=True, help="Output directory")
+    parser.add_argument("--pipeline", default="COLMAP", choices=["COLMAP", "MESHROOM"])
+    parser.add_argument("--mode", default="SINGLE", choices=["SINGLE", "CHUNKED"],
+                        help="Sparse reconstruction mode")
+    parser.add_argument("--rate", type=int, default=1, help="Extract 1 frame every N frames")
+    parser.add_argument("--quality", default="HIGH", choices=["HIGH", "MEDIUM", "LOW"])
+    parser.add_argument("--no-gps", action="store_true", help="Ignore GPS metadata")
+    parser.add_argument("--no-cuda", action="store_true", help="Disable GPU acceleration")
+    parser.add_argument("--no-dense", action="store_true", help="Stop after the sparse model")
+    parser.add_argument("--force", action="store_true", help="Re-run frame and GPS extraction")
+    return parser.parse_args(argv)
+
+def register_addon():
+    """Import and register the add-on from this checkout"""
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    if repo_dir not in sys.path:
+        sys.path.insert(0, repo_dir)
+    import drone_video_to_3d
+    drone_video_to_3d.register()
+
+def run_step(name, operator):
+    """Run an add-on operator and stop the process if it did not finish"""
+    print(f"=== {name} ===")
+    result = operator()
+    if 'FINISHED' not in result:
+        print(f"{name} failed")
+        sys.exit(1)
+
+def main():
+    args = parse_args()
+    register_addon()
+
+    settings = bpy.context.scene.drone_video_3d
+    settings.video_path = os.path.abspath(args.video)
+    settings.output_path = os.path.abspath(args.output)
+    settings.photogrammetry_pipeline = args.pipeline
+    settings.reconstruction_mode = args.mode
+    settings.frame_extraction_rate = args.rate
+    settings.frame_extraction_quality = args.quality
+    settings.use_gps_metadata = not args.no_gps
+    settings.use_cuda = not args.no_cuda
+    settings.run_dense_reconstruction = not args.no_dense
+
+    from drone_video_to_3d.utils.project_store import ProjectStore
+
+    frames_dir = os.path.join(settings.output_path, "frames")
+    with ProjectStore(settings.output_path) as store:
+        frames_recorded = store.get_stage_metadata("extract_frames") is not None
+    if args.force or not (os.path.isdir(frames_dir) and os.listdir(frames_dir) and frames_recorded):
+        run_step("Extract frames", bpy.ops.dronevideo3d.extract_frames)
+
+    gps_csv = os.path.join(settings.output_path, "gps_poses.csv")
+    if settings.use_gps_metadata and (args.force or not os.path.exists(gps_csv)):
+        run_step("Extract GPS metadata", bpy.ops.dronevideo3d.extract_gps)
+
+    run_step("Run photogrammetry", bpy.ops.dronevideo3d.run_photogrammetry)
+
+if __name__ == "__main__":
+    main()
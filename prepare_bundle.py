@@ -1,7 +1,22 @@
 #!/usr/bin/env python
 
+"""Bundle the add-on with its Python dependencies into drone_video_to_3d.zip
+
+Usage:
+    python prepare_bundle.py --python /path/to/blender/3.6/python/bin/python3.10
+
+Dependencies are installed with the target Python (Blender's interpreter),
+stripped of submodules the add-on never imports and precompiled to
+bytecode for that interpreter. Native libraries are stored uncompressed.
+A report of bundle sizes and per-module import times is written next to
+the ZIP.
+"""
+
 import os
+import re
 import sys
+import json
+import argparse
 import subprocess
 import shutil
 import zipfile
@@ -16,9 +31,32 @@ DEPENDENCIES = [
     "numpy",
 ]
 
+# Subpackages of bundled dependencies the add-on never imports
+STRIP_SUBMODULES = {
+    "numpy": ["f2py", "distutils", "_pyinstaller", "doc", "typing", "testing/_private/extbuild.py"],
+    "pyproj": ["__main__.py", "sync.py"],
+}
+
+# Files that are already compressed or must be mapped by the loader are stored as-is
+STORED_EXTENSIONS = ('.so', '.pyd', '.dll', '.dylib', '.whl', '.zip', '.gz', '.db')
+
+# Modules imported when measuring import time in the bundled lib directory
+IMPORT_REPORT_MODULES = ["numpy", "pyproj"]
+
+# Number of slowest modules listed in the import time report
+IMPORT_REPORT_TOP = 25
+
+TARGET_PYTHON = sys.executable
+
 def get_python_executable():
-    """Get the current Python executable path"""
-    return sys.executable
+    """Get the Python executable the bundle is built for (Blender's Python by default via --python)"""
+    return TARGET_PYTHON
+
+def target_cache_tag(python_exe):
+    """Return the bytecode cache tag of the target Python, e.g. 'cpython-310'"""
+    return subprocess.check_output(
+        [python_exe, "-c", "import sys; print(sys.implementation.cache_tag)"], text=True
+    ).strip()
 
 def create_lib_directory():
     """Create lib directory if it doesn't exist"""
@@ -114,8 +152,67 @@ def remove_unnecessary_files(lib_dir):
                 except Exception as e:
                     print(f"Error removing file {file_path}: {e}")
 
-def create_addon_zip():
-    """Create a ZIP file with the addon and bundled dependencies"""
+def strip_unused_submodules(lib_dir):
+    """Remove subpackages of bundled dependencies that the add-on never imports"""
+    for package, entries in STRIP_SUBMODULES.items():
+        for entry in entries:
+            path = os.path.join(lib_dir, package, *entry.split("/"))
+            if os.path.isdir(path):
+                print(f"Stripping: {os.path.relpath(path, lib_dir)}")
+                shutil.rmtree(path)
+            elif os.path.isfile(path):
+                print(f"Stripping: {os.path.relpath(path, lib_dir)}")
+                os.remove(path)
+
+def precompile_bytecode(addon_dir, python_exe):
+    """Compile every module for the target Python
+
+    Unchecked-hash pycs stay valid however the files' modification times
+    change when Blender extracts the ZIP, so nothing is recompiled on the
+    first import on a render node. -f rewrites pycs already in __pycache__,
+    which would otherwise be kept and packed with their timestamp checks.
+    """
+    print(f"Precompiling bytecode with {python_exe}")
+    subprocess.check_call([
+        python_exe, "-m", "compileall", "-q", "-f", "-j", "0",
+        "--invalidation-mode", "unchecked-hash", addon_dir
+    ])
+
+def import_time_report(lib_dir, python_exe, modules=IMPORT_REPORT_MODULES, top=IMPORT_REPORT_TOP):
+    """Import modules from the bundled lib directory with -X importtime and return the slowest ones"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = lib_dir
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    result = subprocess.run(
+        [python_exe, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        env=env, capture_output=True, text=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)", line)
+        if match:
+            entries.append({
+                "module": match.group(4),
+                "self_us": int(match.group(1)),
+                "cumulative_us": int(match.group(2)),
+                "depth": len(match.group(3)) // 2,
+            })
+    top_level = [e for e in entries if e["depth"] == 0]
+    return {
+        "modules": modules,
+        "ok": result.returncode == 0,
+        "total_us": sum(e["cumulative_us"] for e in top_level),
+        "slowest": sorted(entries, key=lambda e: e["self_us"], reverse=True)[:top],
+        "top_level": sorted(top_level, key=lambda e: e["cumulative_us"], reverse=True),
+    }
+
+def create_addon_zip(cache_tag=None):
+    """Create a ZIP file with the addon and bundled dependencies
+
+    Only bytecode compiled for cache_tag is included, native libraries are
+    stored uncompressed so they are written out without inflating, and
+    everything else is deflated. Returns (zip_name, per-package size table).
+    """
     current_dir = os.path.dirname(os.path.abspath(__file__))
     addon_dir = os.path.join(current_dir, 'drone_video_to_3d')
     zip_name = os.path.join(current_dir, 'drone_video_to_3d.zip')
@@ -126,31 +223,85 @@ def create_addon_zip():
     if os.path.exists(zip_name):
         os.remove(zip_name)
     
+    sizes = {}
     # Create the ZIP file
     with zipfile.ZipFile(zip_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
         for root, dirs, files in os.walk(addon_dir):
             for file in files:
                 file_path = os.path.join(root, file)
+                if file.endswith('.pyc') and cache_tag and f".{cache_tag}." not in file:
+                    continue  # Bytecode of other interpreters
                 # Calculate the relative path for the file in the ZIP
                 rel_path = os.path.relpath(file_path, os.path.dirname(addon_dir))
-                print(f"Adding: {rel_path}")
-                zipf.write(file_path, rel_path)
+                compression = zipfile.ZIP_STORED if file.lower().endswith(STORED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+                zipf.write(file_path, rel_path, compress_type=compression)
+        
+        for info in zipf.infolist():
+            parts = info.filename.split("/")
+            group = "/".join(parts[:3]) if len(parts) > 3 and parts[1] == "lib" else "/".join(parts[:2])
+            entry = sizes.setdefault(group, {"files": 0, "size": 0, "compressed": 0})
+            entry["files"] += 1
+            entry["size"] += info.file_size
+            entry["compressed"] += info.compress_size
     
     print(f"Addon ZIP created: {zip_name}")
-    return zip_name
+    return zip_name, sizes
+
+def write_report(zip_name, sizes, imports):
+    """Write bundle_report.json next to the ZIP and print a summary"""
+    report = {
+        "zip": zip_name,
+        "zip_size": os.path.getsize(zip_name),
+        "packages": dict(sorted(sizes.items(), key=lambda item: item[1]["compressed"], reverse=True)),
+        "import_time": imports,
+    }
+    report_file = os.path.join(os.path.dirname(zip_name), "bundle_report.json")
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    
+    print(f"\nBundle size: {report['zip_size'] / 1024 ** 2:.1f} MB")
+    for group, entry in list(report["packages"].items())[:10]:
+        print(f"  {group:<45} {entry['compressed'] / 1024 ** 2:8.1f} MB ({entry['size'] / 1024 ** 2:.1f} MB unpacked)")
+    if imports and not imports["ok"]:
+        print(f"Warning: importing {', '.join(imports['modules'])} from the bundle failed")
+    if imports:
+        print(f"Import time of {', '.join(imports['modules'])}: {imports['total_us'] / 1000:.1f} ms")
+        for entry in imports["slowest"][:10]:
+            print(f"  {entry['module']:<45} {entry['self_us'] / 1000:8.1f} ms")
+    print(f"Report written to {report_file}")
+    return report_file
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bundle the add-on with precompiled dependencies")
+    parser.add_argument("--python", default=sys.executable,
+                        help="Target Python (Blender's bundled interpreter) used to install and compile")
+    parser.add_argument("--skip-install", action="store_true", help="Reuse the existing lib directory")
+    parser.add_argument("--no-report", action="store_true", help="Skip the import time measurement")
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
+    TARGET_PYTHON = args.python
+    
     # Create the lib directory
     lib_dir = create_lib_directory()
     
     # Install dependencies
-    install_dependencies(lib_dir)
+    if not args.skip_install:
+        install_dependencies(lib_dir)
     
     # Remove unnecessary files to reduce size
     remove_unnecessary_files(lib_dir)
+    strip_unused_submodules(lib_dir)
+    
+    # Compile bytecode for the target interpreter
+    addon_dir = os.path.dirname(lib_dir)
+    precompile_bytecode(addon_dir, TARGET_PYTHON)
     
     # Create the addon ZIP
-    zip_file = create_addon_zip()
+    zip_file, sizes = create_addon_zip(target_cache_tag(TARGET_PYTHON))
+    imports = None if args.no_report else import_time_report(lib_dir, TARGET_PYTHON)
+    write_report(zip_file, sizes, imports)
     
     print("\nDone! The addon is now bundled with its dependencies.")
     print(f"Install the addon in Blender using the file: {zip_file}")
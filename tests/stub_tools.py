@@ -0,0 +1,21 @@
+"""Write small Python scripts as executables that stand in for external tools in tests"""
+
+import os
+import sys
+
+def create_stub(directory, name, source):
+    """Write source as a script and an executable launcher called name; return the launcher path"""
+    os.makedirs(directory, exist_ok=True)
+    script = os.path.join(directory, f"{name}_stub.py")
+    with open(script, 'w') as f:
+        f.write(source)
+    if os.name == "nt":
+        launcher = os.path.join(directory, f"{name}.cmd")
+        with open(launcher, 'w') as f:
+            f.write(f'@"{sys.executable}" "{script}" %*\n')
+    else:
+        launcher = os.path.join(directory, name)
+        with open(launcher, 'w') as f:
+            f.write(f"#!/bin/sh\nexec \"{sys.executable}\" \"{script}\" \"$@\"\n")
+        os.chmod(launcher, 0o755)
+    return launcher
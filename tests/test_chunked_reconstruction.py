@@ -0,0 +1,106 @@
+"""Merging chunked sub-models against a stub colmap model_merger
+
+Run from the repository root with: python -m unittest discover tests
+"""
+
+import os
+import struct
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from drone_video_to_3d.utils import chunked_reconstruction
+from tests.stub_tools import create_stub
+
+# colmap stand-in: model_merger fails without common images, otherwise writes the union of both models
+COLMAP_STUB = '''import os
+import sys
+import struct
+
+def read_names(model_dir):
+    with open(os.path.join(model_dir, "images.bin"), "rb") as f:
+        data = f.read()
+    names, offset = [], 8
+    for _ in range(struct.unpack_from("<Q", data)[0]):
+        offset += 64
+        end = data.index(b"\\0", offset)
+        names.append(data[offset:end].decode())
+        offset = end + 1 + 8 + struct.unpack_from("<Q", data, end + 1)[0] * 24
+    return names
+
+args = sys.argv[1:]
+options = dict(zip(args[1::2], args[2::2]))
+first, second = read_names(options["--input_path1"]), read_names(options["--input_path2"])
+if not set(first) & set(second):
+    sys.exit("Failed to merge models")
+names = first + [name for name in second if name not in first]
+with open(os.path.join(options["--output_path"], "images.bin"), "wb") as f:
+    f.write(struct.pack("<Q", len(names)))
+    for i, name in enumerate(names, start=1):
+        f.write(struct.pack("<i7di", i, 1.0, 0, 0, 0, 0, 0, 0, 1) + name.encode() + b"\\0" + struct.pack("<Q", 0))
+'''
+
+def write_model(model_dir, names, points_per_image=2):
+    """Write an images.bin registering names, each with a few 2D points"""
+    os.makedirs(model_dir, exist_ok=True)
+    with open(os.path.join(model_dir, "images.bin"), 'wb') as f:
+        f.write(struct.pack("<Q", len(names)))
+        for i, name in enumerate(names, start=1):
+            f.write(struct.pack("<i7di", i, 1.0, 0, 0, 0, 0, 0, 0, 1) + name.encode() + b"\0")
+            f.write(struct.pack("<Q", points_per_image))
+            f.write(struct.pack("<ddq", 1.0, 2.0, -1) * points_per_image)
+    return model_dir
+
+class MergeModelsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="dronevideo3d-test-")
+        self.bin_dir = os.path.join(self.work_dir, "bin")
+        create_stub(self.bin_dir, "colmap", COLMAP_STUB)
+        self.messages = []
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def model(self, name, first, last):
+        return write_model(os.path.join(self.work_dir, name), [f"frame_{i:04d}.png" for i in range(first, last)])
+
+    def merge(self, model_dirs):
+        output_dir = os.path.join(self.work_dir, "sparse", "0")
+        with mock.patch.dict(os.environ, {"PATH": self.bin_dir + os.pathsep + os.environ.get("PATH", "")}):
+            chunked_reconstruction.merge_models(model_dirs, output_dir, self.work_dir, self.messages.append)
+        return chunked_reconstruction.registered_images(output_dir)
+
+    def test_registered_images(self):
+        model_dir = self.model("tile_000", 1, 4)
+        self.assertEqual(chunked_reconstruction.registered_images(model_dir),
+                         {"frame_0001.png", "frame_0002.png", "frame_0003.png"})
+
+    def test_chained_tiles_merge_into_one_model(self):
+        names = self.merge([self.model("tile_000", 1, 12), self.model("tile_001", 10, 22),
+                            self.model("tile_002", 20, 32)])
+        self.assertEqual(len(names), 31)
+        self.assertEqual(self.messages, [])
+
+    def test_missing_middle_tile_keeps_the_largest_group(self):
+        # Tile 1 failed, so tiles 0 and 2 share no images
+        names = self.merge([self.model("tile_000", 1, 12), self.model("tile_002", 20, 40)])
+        self.assertEqual(names, {f"frame_{i:04d}.png" for i in range(20, 40)})
+        self.assertEqual(len(self.messages), 1)
+        self.assertIn("share no images", self.messages[0])
+
+    def test_tiles_out_of_order_are_merged_through_their_neighbours(self):
+        names = self.merge([self.model("tile_000", 1, 12), self.model("tile_002", 20, 32),
+                            self.model("tile_001", 10, 22)])
+        self.assertEqual(len(names), 31)
+
+    def test_plan_workers_scales_with_frame_size(self):
+        tiles = [list(range(400))] * 8
+        workers_1080p, _ = chunked_reconstruction.plan_workers(tiles, 16.0, cpu_count=16, megapixels=2.0)
+        workers_4k, _ = chunked_reconstruction.plan_workers(tiles, 16.0, cpu_count=16, megapixels=8.0)
+        self.assertEqual(workers_1080p, 5)
+        self.assertEqual(workers_4k, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""COLMAP database layouts of different COLMAP versions, created by a stub database_creator
+
+Run from the repository root with: python -m unittest discover tests
+"""
+
+import os
+import struct
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from drone_video_to_3d.utils import colmap_db
+from tests.stub_tools import create_stub
+
+# Tables shared by the COLMAP 3.8 to 3.12 layouts, without the images table
+COMMON_TABLES_SQL = """
+CREATE TABLE cameras (camera_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, model INTEGER NOT NULL,
+    width INTEGER NOT NULL, height INTEGER NOT NULL, params BLOB, prior_focal_length INTEGER NOT NULL);
+CREATE TABLE keypoints (image_id INTEGER PRIMARY KEY NOT NULL, rows INTEGER NOT NULL, cols INTEGER NOT NULL, data BLOB);
+CREATE TABLE descriptors (image_id INTEGER PRIMARY KEY NOT NULL, rows INTEGER NOT NULL, cols INTEGER NOT NULL,
+    data BLOB);
+CREATE TABLE matches (pair_id INTEGER PRIMARY KEY NOT NULL, rows INTEGER NOT NULL, cols INTEGER NOT NULL, data BLOB);
+CREATE TABLE two_view_geometries (pair_id INTEGER PRIMARY KEY NOT NULL, rows INTEGER NOT NULL,
+    cols INTEGER NOT NULL, data BLOB, config INTEGER NOT NULL, F BLOB, E BLOB, H BLOB, qvec BLOB, tvec BLOB);
+"""
+
+# COLMAP 3.8/3.9: position priors are columns of the images table
+COLMAP_39_SQL = COMMON_TABLES_SQL + """
+CREATE TABLE images (image_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, name TEXT NOT NULL UNIQUE,
+    camera_id INTEGER NOT NULL, prior_qw REAL, prior_qx REAL, prior_qy REAL, prior_qz REAL,
+    prior_tx REAL, prior_ty REAL, prior_tz REAL);
+"""
+
+# COLMAP 3.12: rigs and frames
+COLMAP_312_SQL = COMMON_TABLES_SQL + """
+CREATE TABLE images (image_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, name TEXT NOT NULL UNIQUE,
+    camera_id INTEGER NOT NULL);
+CREATE TABLE rigs (rig_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, ref_sensor_id INTEGER NOT NULL,
+    ref_sensor_type INTEGER NOT NULL);
+CREATE TABLE frames (frame_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, rig_id INTEGER NOT NULL);
+"""
+
+# colmap stand-in: database_creator writes the schema in schema.sql next to the stub
+COLMAP_STUB = '''import os
+import sys
+import sqlite3
+
+args = sys.argv[1:]
+assert args[0] == "database_creator"
+options = dict(zip(args[1::2], args[2::2]))
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")) as f:
+    schema = f.read()
+connection = sqlite3.connect(options["--database_path"])
+connection.executescript(schema)
+connection.close()
+'''
+
+class ColmapDatabaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="dronevideo3d-test-")
+        self.bin_dir = os.path.join(self.work_dir, "bin")
+        create_stub(self.bin_dir, "colmap", COLMAP_STUB)
+        self.db_path = os.path.join(self.work_dir, "database.db")
+        self.frames_dir = os.path.join(self.work_dir, "frames")
+        os.makedirs(self.frames_dir)
+        self.names = [f"frame_{i:04d}.png" for i in range(1, 4)]
+        for name in self.names:
+            with open(os.path.join(self.frames_dir, name), 'wb') as f:
+                f.write(b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", 1920, 1080))
+        self.gps_csv = os.path.join(self.work_dir, "gps_poses.csv")
+        with open(self.gps_csv, 'w') as f:
+            f.write("frame,x,y,z\n")
+            for i, name in enumerate(self.names):
+                f.write(f"{name},{i}.5,{i + 10}.0,{i + 20}.0\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def prepare(self, schema):
+        with open(os.path.join(self.bin_dir, "schema.sql"), 'w') as f:
+            f.write(schema)
+        with mock.patch.dict(os.environ, {"PATH": self.bin_dir + os.pathsep + os.environ.get("PATH", "")}):
+            return colmap_db.prepare_database(self.db_path, self.frames_dir, self.gps_csv)
+
+    def query(self, sql):
+        connection = sqlite3.connect(self.db_path)
+        try:
+            return connection.execute(sql).fetchall()
+        finally:
+            connection.close()
+
+    def test_pose_priors_table(self):
+        self.assertTrue(self.prepare(colmap_db.CREATE_TABLES_SQL))
+        rows = self.query("SELECT image_id, position, coordinate_system FROM pose_priors ORDER BY image_id")
+        self.assertEqual([image_id for image_id, _, _ in rows], [1, 2, 3])
+        np.testing.assert_array_equal(np.frombuffer(rows[1][1]), [1.5, 11.0, 21.0])
+        self.assertEqual(rows[0][2], colmap_db.COORDINATE_SYSTEM_CARTESIAN)
+
+    def test_priors_in_images_table(self):
+        self.assertTrue(self.prepare(COLMAP_39_SQL))
+        self.assertEqual(self.query("SELECT prior_tx, prior_ty, prior_tz FROM images ORDER BY image_id"),
+                         [(0.5, 10.0, 20.0), (1.5, 11.0, 21.0), (2.5, 12.0, 22.0)])
+        self.assertEqual(self.query("SELECT name FROM sqlite_master WHERE name = 'pose_priors'"), [])
+
+    def test_rig_layout_is_refused(self):
+        self.assertFalse(self.prepare(COLMAP_312_SQL))
+        with self.assertRaisesRegex(RuntimeError, "COLMAP 3.12 or newer"):
+            colmap_db.connect(self.db_path)
+
+    def test_empty_database_gets_default_layout(self):
+        connection = colmap_db.connect(self.db_path)
+        try:
+            self.assertEqual(colmap_db.table_columns(connection, "pose_priors"), colmap_db.POSE_PRIOR_COLUMNS)
+        finally:
+            connection.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""Distributed matching on one machine: several local workers and a stub COLMAP
+
+Run from the repository root with: python -m unittest discover tests
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from drone_video_to_3d.utils import colmap_db
+from drone_video_to_3d.utils import distributed_matching
+from drone_video_to_3d.utils.match_worker import job_paths
+from tests.stub_tools import create_stub
+
+# matches_importer stand-in: writes one match per listed pair and fails on frames named *fail*
+MATCHES_IMPORTER_STUB = '''import sys
+import sqlite3
+
+args = sys.argv[2:]
+options = dict(zip(args[0::2], args[1::2]))
+with open(options["--match_list_path"]) as f:
+    pairs = [line.split() for line in f if line.strip()]
+if any("fail" in name for pair in pairs for name in pair):
+    sys.exit(1)
+connection = sqlite3.connect(options["--database_path"])
+image_ids = dict(connection.execute("SELECT name, image_id FROM images"))
+with connection:
+    for name1, name2 in pairs:
+        low, high = sorted((image_ids[name1], image_ids[name2]))
+        pair_id = low * 2147483647 + high
+        connection.execute("INSERT OR REPLACE INTO matches VALUES (?, 1, 2, ?)", (pair_id, bytes(8)))
+        connection.execute("INSERT OR REPLACE INTO two_view_geometries (pair_id, rows, cols, data, config) "
+                           "VALUES (?, 1, 2, ?, 2)", (pair_id, bytes(8)))
+connection.close()
+'''
+
+class DistributedMatchingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="dronevideo3d-test-")
+        self.colmap = create_stub(os.path.join(self.work_dir, "bin"), "colmap", MATCHES_IMPORTER_STUB)
+        self.job_dir = os.path.join(self.work_dir, "match_jobs")
+        self.db_path = os.path.join(self.work_dir, "database.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def create_database(self, names):
+        connection = colmap_db.connect(self.db_path)
+        try:
+            with connection:
+                colmap_db.insert_images(connection, names, 1)
+        finally:
+            connection.close()
+
+    def run_matching(self, **kwargs):
+        options = dict(num_local_workers=3, unit_size=10, use_gpu=False, poll_interval=0.1,
+                       colmap=self.colmap, log=lambda message: None)
+        options.update(kwargs)
+        return distributed_matching.run_distributed_matching(self.db_path, self.job_dir, **options)
+
+    def test_local_workers_match_every_pair(self):
+        self.create_database([f"frame_{i:04d}.png" for i in range(12)])
+        self.assertEqual(self.run_matching(), 7)
+        image_ids1, _, _ = colmap_db.read_match_counts(self.db_path, verified=True)
+        self.assertEqual(len(image_ids1), 66)
+
+    def test_failing_unit_is_given_up(self):
+        self.create_database([f"frame_{i:04d}.png" for i in range(5)] + ["frame_fail.png"])
+        start = time.time()
+        with self.assertRaisesRegex(RuntimeError, "failed 3 times"):
+            self.run_matching(timeout=60.0)
+        self.assertLess(time.time() - start, 30.0)
+
+    def test_no_workers_is_an_error(self):
+        self.create_database([f"frame_{i:04d}.png" for i in range(4)])
+        with self.assertRaisesRegex(RuntimeError, "No matching worker"):
+            self.run_matching(num_local_workers=0, join_timeout=1.0)
+
+    def test_abandoned_claim_is_retried(self):
+        self.create_database([f"frame_{i:04d}.png" for i in range(6)])
+        pairs = distributed_matching.exhaustive_pairs(range(1, 7))
+        num_units = distributed_matching.write_job(self.job_dir, self.db_path, pairs, 5, use_gpu=False,
+                                                   colmap=self.colmap)
+        # A worker that died holding unit 0: its claim stops being refreshed
+        paths = job_paths(self.job_dir)
+        claim_path = os.path.join(paths["claimed"], "unit_000000.dead-worker.txt")
+        os.rename(os.path.join(paths["pending"], "unit_000000.txt"), claim_path)
+        os.utime(claim_path, (time.time() - 60, time.time() - 60))
+
+        workers = distributed_matching.start_local_workers(self.job_dir, 1)
+        try:
+            merged = distributed_matching.gather_results(self.db_path, self.job_dir, num_units, workers,
+                                                         poll_interval=0.1, stale_after=2.0, timeout=60.0,
+                                                         log=lambda message: None)
+        finally:
+            with open(paths["closed"], 'w') as f:
+                f.write("closed\n")
+            for worker in workers:
+                worker.wait(timeout=10)
+        self.assertEqual(merged, num_units)
+        self.assertEqual(len(colmap_db.read_match_counts(self.db_path)[0]), len(pairs))
+
+if __name__ == "__main__":
+    unittest.main()
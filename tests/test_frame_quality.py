@@ -0,0 +1,71 @@
+"""Per-frame sharpness scores from a stub FFmpeg that streams raw grayscale frames
+
+Run from the repository root with: python -m unittest discover tests
+"""
+
+import os
+import struct
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from drone_video_to_3d.utils import video_utils
+from drone_video_to_3d.utils.project_store import ProjectStore
+from tests.stub_tools import create_stub
+
+# FFmpeg stand-in: one noisy (sharp) frame, one flat (blurred) frame and one gradient, at the requested scale
+FFMPEG_STUB = '''import sys
+import random
+
+args = sys.argv[1:]
+width, height = (int(v) for v in args[args.index("-vf") + 1].split(",")[0][len("scale="):].split(":"))
+random.seed(1)
+sys.stdout.buffer.write(bytes(random.randrange(256) for _ in range(width * height)))
+sys.stdout.buffer.write(bytes([128]) * (width * height))
+sys.stdout.buffer.write(bytes(x * 255 // width for _ in range(height) for x in range(width)))
+'''
+
+def write_png_header(path, width, height):
+    """Just enough of a PNG for png_size: signature and IHDR"""
+    with open(path, 'wb') as f:
+        f.write(video_utils.PNG_SIGNATURE + struct.pack(">I4sII", 13, b"IHDR", width, height))
+
+class FrameQualityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="dronevideo3d-test-")
+        self.bin_dir = os.path.join(self.work_dir, "bin")
+        create_stub(self.bin_dir, "ffmpeg", FFMPEG_STUB)
+        self.frames_dir = os.path.join(self.work_dir, "frames")
+        os.makedirs(self.frames_dir)
+        self.names = [f"frame_{i:04d}.png" for i in range(1, 4)]
+        for name in self.names:
+            write_png_header(os.path.join(self.frames_dir, name), 1920, 1080)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_sharp_frames_score_higher(self):
+        with mock.patch.dict(os.environ, {"PATH": self.bin_dir + os.pathsep + os.environ.get("PATH", "")}):
+            scores = video_utils.frame_sharpness(self.frames_dir, self.names)
+        self.assertEqual(sorted(scores), self.names)
+        self.assertGreater(scores["frame_0001.png"], scores["frame_0003.png"])
+        self.assertGreaterEqual(scores["frame_0003.png"], scores["frame_0002.png"])
+        self.assertEqual(scores["frame_0002.png"], 0.0)
+
+    def test_scores_are_stored_per_frame(self):
+        with ProjectStore(self.work_dir) as store:
+            store.write_frames(self.names, np.array([0.0, 1.0, 2.0]))
+            store.write_quality({"frame_0001.png": 12.5, "frame_0003.png": 3.0})
+            self.assertEqual(store.read_quality(), {"frame_0001.png": 12.5, "frame_0003.png": 3.0})
+
+    def test_laplacian_variance(self):
+        self.assertEqual(video_utils.laplacian_variance(np.full((8, 8), 50)), 0.0)
+        checkerboard = np.indices((8, 8)).sum(axis=0) % 2 * 255
+        self.assertGreater(video_utils.laplacian_variance(checkerboard), 0.0)
+
+if __name__ == "__main__":
+    unittest.main()
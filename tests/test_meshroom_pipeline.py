@@ -0,0 +1,116 @@
+"""Node-by-node Meshroom runs against stub meshroom_batch and meshroom_compute tools
+
+Run from the repository root with: python -m unittest discover tests
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from drone_video_to_3d.utils import meshroom_pipeline
+from tests.stub_tools import create_stub
+
+# meshroom_batch stand-in: saves a three node graph whose middle node is split into chunks
+MESHROOM_BATCH_STUB = '''import sys
+import json
+
+args = sys.argv[1:]
+options = dict(zip(args[0::2], args[1::2]))
+graph = {
+    "CameraInit_1": {"nodeType": "CameraInit", "uids": {"0": "uid-camera"}, "inputs": {}},
+    "FeatureExtraction_1": {
+        "nodeType": "FeatureExtraction", "uids": {"0": "uid-features"},
+        "parallelization": {"split": 3}, "inputs": {"input": "{CameraInit_1.output}"},
+    },
+    "Meshing_1": {"nodeType": "Meshing", "uids": {"0": "uid-meshing"},
+                  "inputs": {"input": "{FeatureExtraction_1.output}"}},
+}
+with open(options["--save"], "w") as f:
+    json.dump({"graph": graph}, f)
+'''
+
+# meshroom_compute stand-in: records its call, prints Meshroom's progress lines and marks the chunk done
+MESHROOM_COMPUTE_STUB = '''import os
+import sys
+import json
+
+graph_file, args = sys.argv[1], sys.argv[2:]
+options = dict(zip(args[0::2], args[1::2]))
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "compute_calls.txt"), "a") as f:
+    f.write(" ".join(args) + "\\n")
+with open(graph_file) as f:
+    node = json.load(f)["graph"][options["--node"]]
+print("[1/1] " + options["--node"])
+node_dir = os.path.join(options["--cache"], node["nodeType"], node["uids"]["0"])
+os.makedirs(node_dir, exist_ok=True)
+status_name = options["--iteration"] + ".status" if "--iteration" in options else "status"
+with open(os.path.join(node_dir, status_name), "w") as f:
+    json.dump({"status": "SUCCESS"}, f)
+print(" - elapsed time: 0:00:00.01")
+'''
+
+class MeshroomPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="dronevideo3d-test-")
+        bin_dir = os.path.join(self.work_dir, "bin")
+        self.meshroom = create_stub(bin_dir, "meshroom_batch", MESHROOM_BATCH_STUB)
+        create_stub(bin_dir, "meshroom_compute", MESHROOM_COMPUTE_STUB)
+        self.calls_file = os.path.join(bin_dir, "compute_calls.txt")
+        self.photo_dir = os.path.join(self.work_dir, "photogrammetry")
+        os.makedirs(self.photo_dir)
+        self.messages = []
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def run_pipeline(self):
+        self.messages = []
+        meshroom_pipeline.run_meshroom_pipeline(
+            os.path.join(self.work_dir, "frames"), self.photo_dir, meshroom=self.meshroom,
+            parallelism="*=2", log=self.messages.append
+        )
+
+    def compute_calls(self):
+        if not os.path.exists(self.calls_file):
+            return []
+        with open(self.calls_file) as f:
+            return f.read().splitlines()
+
+    def test_every_chunk_is_computed_once(self):
+        self.run_pipeline()
+        calls = self.compute_calls()
+        self.assertEqual(len(calls), 5)
+        cache_dir = os.path.join(self.photo_dir, "MeshroomCache")
+        self.assertEqual(sorted(call for call in calls if "--iteration" in call),
+                         [f"--node FeatureExtraction_1 --cache {cache_dir} --iteration {i}" for i in range(3)])
+
+    def test_rerun_skips_cached_nodes(self):
+        self.run_pipeline()
+        self.run_pipeline()
+        self.assertEqual(len(self.compute_calls()), 5)
+        self.assertEqual(sum(message.endswith(": cached") for message in self.messages), 3)
+
+    def test_rerun_computes_only_missing_chunks(self):
+        self.run_pipeline()
+        os.remove(os.path.join(self.photo_dir, "MeshroomCache", "FeatureExtraction", "uid-features", "1.status"))
+        self.run_pipeline()
+        calls = self.compute_calls()
+        self.assertEqual(len(calls), 6)
+        self.assertTrue(calls[-1].endswith("--iteration 1"))
+
+    def test_chunk_progress_is_logged(self):
+        self.run_pipeline()
+        self.assertIn("[2/3] FeatureExtraction_1 chunk 2/3: started", self.messages)
+        self.assertIn("[2/3] FeatureExtraction_1 chunk 2/3: finished in 0:00:00.01", self.messages)
+        self.assertIn("[3/3] Meshing_1: finished in 0:00:00.01", self.messages)
+
+    def test_parse_compute_line(self):
+        self.assertEqual(meshroom_pipeline.parse_compute_line("[1/1] DepthMap_1"), ("started", None))
+        self.assertEqual(meshroom_pipeline.parse_compute_line(" - elapsed time: 0:01:23.45"),
+                         ("finished", "0:01:23.45"))
+        self.assertIsNone(meshroom_pipeline.parse_compute_line(" - commandLine: aliceVision_depthMapEstimation"))
+
+if __name__ == "__main__":
+    unittest.main()
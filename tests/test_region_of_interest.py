@@ -0,0 +1,45 @@
+"""Region of interest crop box against model origins from the stored GPS poses
+
+Run from the repository root with: python -m unittest discover tests
+"""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from drone_video_to_3d.utils import gps_utils
+from drone_video_to_3d.utils import region_of_interest
+
+class BoundingBoxTest(unittest.TestCase):
+
+    def flight_origin(self, lat, lon, alt):
+        """Model origin the way align_model derives it: the mean of the pose ECEF"""
+        x, y, z = gps_utils.convert_to_cartesian(lat, lon, alt)
+        return np.stack([x, y, z], axis=1).mean(axis=0)
+
+    def check_polygon_around_flight(self):
+        # A ~200 m square at 45N 10E flown at 60-80 m above take-off
+        flight_lat = np.linspace(44.9995, 45.0005, 20)
+        flight_lon = np.linspace(9.9993, 10.0007, 20)
+        flight_alt = np.linspace(160.0, 180.0, 20)
+        origin = self.flight_origin(flight_lat, flight_lon, flight_alt)
+
+        polygon_lat = np.array([44.9991, 44.9991, 45.0009, 45.0009])
+        polygon_lon = np.array([9.9987, 10.0013, 10.0013, 9.9987])
+        lower, upper = region_of_interest.bounding_box(polygon_lat, polygon_lon, 100.0, 200.0, origin)
+
+        self.assertTrue(np.all(lower < 0.0) and np.all(upper > 0.0), f"{lower} .. {upper}")
+        # The prism is a few hundred metres across, not kilometres away
+        self.assertLess(np.abs(np.concatenate([lower, upper])).max(), 500.0)
+
+    def test_box_contains_origin_with_spherical_poses(self):
+        with mock.patch.object(gps_utils, "pyproj", None):
+            self.check_polygon_around_flight()
+
+    @unittest.skipIf(gps_utils.pyproj is None, "pyproj is not installed")
+    def test_box_contains_origin_with_ellipsoidal_poses(self):
+        self.check_polygon_around_flight()
+
+if __name__ == "__main__":
+    unittest.main()